@@ -0,0 +1,61 @@
+"""
+Loading -XX:+PrintFlagsFinal dumps of many images: parsing every dump, reading parsed tables from the disk
+cache (as a fresh process would) and reusing tables kept in memory.
+
+Run from the root folder: python -m benchmarks.bench_flags
+"""
+import os
+import tempfile
+import time
+
+from encoders import jvm
+
+DUMPS = 50
+FLAGS = 850
+
+TYPES = ('bool', 'intx', 'uintx', 'size_t', 'double', 'ccstr')
+VALUES = {'bool': 'true', 'intx': '-1', 'uintx': '20', 'size_t': '4294967296', 'double': '25.000000', 'ccstr': ''}
+
+
+def make_dump(seed):
+    lines = ['[Global flags]']
+    for i in range(FLAGS):
+        flag_type = TYPES[(i + seed) % len(TYPES)]
+        lines.append('{:>9} {:<45} = {:<40} {{product}} {{default}}'.format(
+            flag_type, 'Flag{}'.format(i), VALUES[flag_type]))
+    return '\n'.join(lines) + '\n'
+
+
+def run(paths, cache_dir, clear):
+    start = time.perf_counter()
+    for path in paths:
+        if clear:
+            jvm._flag_tables.clear()
+        jvm.load_flags(path, cache_dir)
+    return (time.perf_counter() - start) / len(paths)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        paths = []
+        for seed in range(DUMPS):
+            path = os.path.join(root, 'flags-{}.txt'.format(seed))
+            with open(path, 'w') as f:
+                f.write(make_dump(seed))
+            paths.append(path)
+        cache_dir = os.path.join(root, 'cache')
+        os.mkdir(cache_dir)
+
+        parse = run(paths, None, True)
+        run(paths, cache_dir, True)
+        disk = run(paths, cache_dir, True)
+        run(paths, cache_dir, False)
+        memory = run(paths, cache_dir, False)
+
+    print('{} dumps of {} flags, per dump'.format(DUMPS, FLAGS))
+    for label, timing in (('parse', parse), ('disk cache', disk), ('memory', memory)):
+        print('{:>12} {:>10.3f}ms'.format(label, timing * 1e3))
+
+
+if __name__ == '__main__':
+    main()
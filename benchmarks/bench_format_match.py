@@ -0,0 +1,56 @@
+"""
+Per-token cost of matching setting formats on a 500-token command line: the legacy matcher building
+and matching a fresh pattern for every format against the compiled, cached alternation.
+
+Run from the root folder: python -m benchmarks.bench_format_match
+"""
+import re
+import timeit
+
+from encoders.jvm import get_setting_class
+
+TOKENS = 500
+REPEAT = 5
+NUMBER = 20
+
+
+def legacy_get_format_match(setting, value):
+    for format_idx, _ in enumerate(setting.formats):
+        pattern = r'^{}$'.format(setting.format_value('(.*)', format_idx))
+        match = re.match(pattern, value)
+        if match:
+            return match
+    return None
+
+
+def command_line(size):
+    data = ['java', '-server', '-XX:MaxHeapSize=4096m', '-XX:GCTimeRatio=19', '-XX:+AlwaysPreTouch']
+    data.extend('-Dproperty{}=value{}'.format(i, i) for i in range(size - len(data) - 2))
+    data.extend(['-jar', '/app.jar'])
+    return data
+
+
+def measure(match, settings, data):
+    def run():
+        for setting in settings:
+            for option in data:
+                match(setting, option)
+
+    best = min(timeit.repeat(run, repeat=REPEAT, number=NUMBER))
+    return best / NUMBER / (len(settings) * len(data))
+
+
+def main():
+    settings = [get_setting_class('MaxHeapSize')({'min': 1, 'max': 6, 'step': 1}),
+                get_setting_class('GCTimeRatio')(), get_setting_class('AlwaysPreTouch')()]
+    data = command_line(TOKENS)
+    legacy = measure(legacy_get_format_match, settings, data)
+    compiled = measure(lambda setting, option: setting.get_format_match(option), settings, data)
+    print('Command line of {} tokens, {} settings'.format(len(data), len(settings)))
+    print('legacy:   {:8.3f} us/token'.format(legacy * 1e6))
+    print('compiled: {:8.3f} us/token'.format(compiled * 1e6))
+    print('speedup:  {:8.1f}x'.format(legacy / compiled))
+
+
+if __name__ == '__main__':
+    main()
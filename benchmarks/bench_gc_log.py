@@ -0,0 +1,76 @@
+"""
+Analysis of GC logs: throughput of `load_gc_log` over unified and legacy logs of growing sizes, against reading
+the log into memory, and peak Python allocations, which stay flat as the log is memory-mapped.
+
+Run from the root folder: python -m benchmarks.bench_gc_log
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+
+from encoders.jvm import load_gc_log
+
+SIZES = (1, 10, 50)
+REPEAT = 3
+
+UNIFIED_EVENT = (
+    '[{uptime:.3f}s][info][gc,start    ] GC({n}) Pause Young (Normal) (G1 Evacuation Pause)\n'
+    '[{uptime:.3f}s][info][gc,phases   ] GC({n})   Evacuate Collection Set: {pause:.1f}ms\n'
+    '[{uptime:.3f}s][info][gc,heap     ] GC({n}) Eden regions: 25->0(24)\n'
+    '[{uptime:.3f}s][info][gc          ] GC({n}) Pause Young (Normal) (G1 Evacuation Pause) 120M->20M(256M) '
+    '{pause:.3f}ms\n'
+    '[{uptime:.3f}s][info][gc,cpu      ] GC({n}) User=0.01s Sys=0.00s Real=0.01s\n'
+)
+
+LEGACY_EVENT = (
+    '2023-01-01T00:00:00.000+0000: {uptime:.3f}: [GC (Allocation Failure) [PSYoungGen: 65536K->10720K(76288K)] '
+    '122880K->68064K(251392K), {seconds:.7f} secs] [Times: user=0.01 sys=0.00, real=0.01 secs]\n'
+)
+
+
+def write_log(f, template, size):
+    n = 0
+    while f.tell() < size * 1024 * 1024:
+        pause = 1 + n % 50
+        f.write(template.format(n=n, uptime=n * .5, pause=pause, seconds=pause / 1e3).encode())
+        n += 1
+    return n
+
+
+def measure(path):
+    durations = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        load_gc_log(path)
+        durations.append(time.perf_counter() - start)
+    tracemalloc.start()
+    load_gc_log(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(durations), peak
+
+
+def read(path):
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        f.read()
+    return time.perf_counter() - start
+
+
+def main():
+    print('{:>8} {:>6} {:>10} {:>12} {:>12} {:>12}'.format('format', 'MiB', 'events', 'load_gc_log', 'read', 'peak'))
+    for label, template in (('unified', UNIFIED_EVENT), ('legacy', LEGACY_EVENT)):
+        for size in SIZES:
+            with tempfile.NamedTemporaryFile(suffix='.log') as f:
+                events = write_log(f, template, size)
+                f.flush()
+                duration, peak = measure(f.name)
+                read_duration = read(f.name)
+                mib = os.path.getsize(f.name) / 1024 / 1024
+            print('{:>8} {:>6} {:>10} {:>8.1f}MB/s {:>8.0f}MB/s {:>10.1f}KB'.format(
+                label, size, events, mib / duration, mib / read_duration, peak / 1024))
+
+
+if __name__ == '__main__':
+    main()
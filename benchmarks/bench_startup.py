@@ -0,0 +1,63 @@
+"""
+Adjust step startup: fresh processes importing the encoder and creating it from a config with all the
+supported settings, cold against loading validated settings from a snapshot.
+
+Run from the root folder: python -m benchmarks.bench_startup
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.configs import get_setting_config, get_setting_names
+
+RUNS = 20
+
+SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+from encoders.jvm import Encoder
+imported = time.perf_counter()
+Encoder(json.loads(sys.argv[1]))
+created = time.perf_counter()
+print(json.dumps([imported - started, created - imported]))
+'''
+
+
+def make_config(snapshot_dir=None):
+    settings = {name: get_setting_config(name) for name in get_setting_names()}
+    config = {'name': 'jvm', 'settings': settings}
+    if snapshot_dir:
+        config['snapshot_dir'] = snapshot_dir
+    return config
+
+
+def run(config):
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        output = subprocess.check_output([sys.executable, '-c', SCRIPT, json.dumps(config)],
+                                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        process_time = time.perf_counter() - start
+        import_time, create_time = json.loads(output.decode())
+        timings.append((process_time, import_time, create_time))
+    return [sorted(column)[len(column) // 2] for column in zip(*timings)]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        cold = run(make_config())
+        snapshot_config = make_config(snapshot_dir)
+        run(snapshot_config)
+        snapshot = run(snapshot_config)
+    print('Median of {} processes, {} settings'.format(RUNS, len(make_config()['settings'])))
+    print('{:>10} {:>12} {:>12} {:>12}'.format('', 'process', 'import', 'create'))
+    for label, (process_time, import_time, create_time) in (('cold', cold), ('snapshot', snapshot)):
+        print('{:>10} {:>10.2f}ms {:>10.2f}ms {:>10.3f}ms'.format(
+            label, process_time * 1e3, import_time * 1e3, create_time * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Throughput, latency percentiles and peak allocations of describe, encode_multi and decode_multi over
+the number of configured settings, command line length, list or string input and GCType with and without
+`disable_others`. Results are printed as JSON to compare between versions.
+
+Run from the root folder: python -m benchmarks.bench_suite [--output results.json] [--quick]
+"""
+import argparse
+import itertools
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from benchmarks.configs import get_setting_config, get_setting_names
+from encoders.jvm import Encoder, quote_args
+
+SETTING_COUNTS = (1, 5, 12, None)
+COMMAND_LINE_SIZES = (10, 100, 500, 2000)
+INPUT_TYPES = ('list', 'str')
+OPERATIONS = ('describe', 'encode_multi', 'decode_multi')
+PERCENTILES = (50, 90, 99)
+
+
+def settings_config(count, disable_others):
+    names = get_setting_names()
+    if count is not None:
+        names = names[:count]
+    config = {name: get_setting_config(name) for name in names}
+    config['GCType'] = {'disable_others': disable_others}
+    return config
+
+
+def make_case(count, size, disable_others):
+    config = {'name': 'jvm', 'settings': settings_config(count, disable_others)}
+    encoder = Encoder(dict(config, constraints='repair'))
+    values = {}
+    for name, setting in encoder.settings.items():
+        values[name] = setting.get_lattice_value(setting.get_lattice_size() // 2)
+    values = encoder.apply_constraints(values)
+    options = encoder.encode_multi(values, list)
+    before = ['java', '-server']
+    after = ['-cp', '/app/lib/*', '-jar', '/app.jar']
+    padding = max(0, size - len(before) - len(options) - len(after))
+    before.extend('-Dproperty{}=value {}'.format(i, i) for i in range(padding))
+    config['before'] = before
+    config['after'] = after
+    return config, values, before + options + after
+
+
+def make_call(operation, config, values, data, input_type):
+    encoder = Encoder(config)
+
+    def describe():
+        # Mirrors describe of servo: the encoder is created anew on every call
+        describing_encoder = Encoder(config)
+        descriptor = describing_encoder.describe()
+        for name, value in describing_encoder.decode_multi(data).items():
+            descriptor[name]['value'] = value
+        return descriptor
+
+    def encode_multi():
+        return encoder.encode_multi(values, input_type)
+
+    def decode_multi():
+        return encoder.decode_multi(data)
+
+    return {'describe': describe, 'encode_multi': encode_multi, 'decode_multi': decode_multi}[operation]
+
+
+def percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(call, iterations):
+    call()
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        'throughput_per_sec': iterations / elapsed,
+        'latency_mean_us': elapsed / iterations * 1e6,
+        'peak_alloc_bytes': peak,
+    }
+    for percent in PERCENTILES:
+        result['latency_p{}_us'.format(percent)] = percentile(latencies, percent) * 1e6
+    return result
+
+
+def run(iterations, setting_counts, sizes):
+    results = []
+    cases = itertools.product(setting_counts, sizes, INPUT_TYPES, (False, True))
+    for count, size, input_type, disable_others in cases:
+        config, values, data = make_case(count, size, disable_others)
+        if input_type == 'str':
+            data = quote_args(data)
+        for operation in OPERATIONS:
+            result = {
+                'operation': operation,
+                'settings': len(config['settings']),
+                'command_line_size': size,
+                'input_type': input_type,
+                'disable_others': disable_others,
+            }
+            result.update(measure(make_call(operation, config, values, data, input_type), iterations))
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200, help='Number of timed calls per case')
+    parser.add_argument('--quick', action='store_true', help='Run a reduced set of cases')
+    parser.add_argument('--output', help='File to write JSON results to instead of stdout')
+    args = parser.parse_args()
+
+    setting_counts = (1, None) if args.quick else SETTING_COUNTS
+    sizes = (10, 500) if args.quick else COMMAND_LINE_SIZES
+    report = {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'iterations': args.iterations,
+        'results': run(args.iterations, setting_counts, sizes),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+Splitting long command lines into arguments: `iter_args` against `shlex.split`.
+
+Run from the root folder: python -m benchmarks.bench_tokenize
+"""
+import io
+import shlex
+import timeit
+
+from encoders.jvm import iter_args, quote_args
+
+SIZES = (100, 1000, 10000)
+REPEAT = 5
+
+
+def command_line(size):
+    args = ['java', '-server', '-Xmx4096m', '-XX:+UseG1GC', '-Dapp.name=my app', "-Dapp.owner=it's me"]
+    args.extend('-Dproperty{}=value{}'.format(i, i) for i in range(size - len(args) - 4))
+    args.extend(['-cp', '/app/lib/*:/app/conf', '-jar', '/app.jar'])
+    return quote_args(args)
+
+
+def measure(func, number):
+    return min(timeit.repeat(func, repeat=REPEAT, number=number)) / number
+
+
+def main():
+    print('{:>8} {:>14} {:>14} {:>14} {:>8}'.format('args', 'shlex.split', 'iter_args', 'iter_args io', 'speedup'))
+    for size in SIZES:
+        data = command_line(size)
+        assert list(iter_args(data)) == shlex.split(data)
+        number = max(1, 10000 // size)
+        shlex_time = measure(lambda: shlex.split(data), number)
+        iter_time = measure(lambda: list(iter_args(data)), number)
+        stream_time = measure(lambda: list(iter_args(io.StringIO(data), 4096)), number)
+        print('{:>8} {:>12.3f}ms {:>12.3f}ms {:>12.3f}ms {:>7.1f}x'.format(
+            size, shlex_time * 1e3, iter_time * 1e3, stream_time * 1e3, shlex_time / iter_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+"""
+Settings configs shared by the benchmarks.
+"""
+from encoders.jvm import HEAP_PERCENTAGE_SETTINGS, SETTINGS, get_setting_class
+
+HEAP_CONFIG = {'min': .5, 'max': 16, 'step': .125}
+COUNT_CONFIG = {'min': 1, 'max': 16, 'step': 1}
+
+
+def get_setting_names():
+    """
+    Returns names of the supported settings, which can be configured together, GCType first.
+    """
+    # Percentage heap sizes are mutually exclusive with the absolute ones
+    return ['GCType'] + sorted(name for name in SETTINGS if name != 'GCType' and name not in HEAP_PERCENTAGE_SETTINGS)
+
+
+def get_setting_config(name):
+    """
+    Returns config of the setting, which bounds it when it has no max of its own.
+    """
+    setting_class = get_setting_class(name)
+    if setting_class.max is not None:
+        return None
+    return dict(HEAP_CONFIG if setting_class.unit == 'GiB' else COUNT_CONFIG)
@@ -1,6 +1,14 @@
 # noinspection PyUnresolvedReferences
+import linecache
+import marshal
+import math
+import os
 import re
+import shlex
+import zlib
 from abc import ABC
+from collections import OrderedDict
+from functools import lru_cache
 
 # noinspection PyUnresolvedReferences
 from encoders.base import Encoder as BaseEncoder, RangeSetting as BaseRangeSetting, \
@@ -8,37 +16,198 @@ from encoders.base import Encoder as BaseEncoder, RangeSetting as BaseRangeSetti
     SettingConfigException, SettingRuntimeException, q
 
 
-class IntToGbValueEncoder:
+def import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise EncoderRuntimeException('NumPy is required to encode arrays of values in jvm encoder.')
+    return numpy
+
+
+# Multipliers of the suffixes of JVM size values, which are in bytes without one
+SIZE_SUFFIXES = {'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3, 't': 1024 ** 4}
+
+
+class SizeValueEncoder:
+    """
+    Encodes sizes in units of the setting into JVM size values with the given suffix and decodes them
+    from values with any of the k, m, g and t suffixes or in bytes, ex. `4g`, `512K` or `1048576`.
+    """
+    flag_kind = 'int'
+
+    def __init__(self, unit, suffix, flag_unit=None):
+        """
+        :param unit: Bytes in a unit of the setting
+        :param suffix: Suffix to encode values with, empty to encode them in bytes
+        :param flag_unit: Value of the JVM flag of a unit of the setting, bytes by default
+        """
+        self.unit = unit
+        self.suffix = suffix
+        self.flag_unit = unit if flag_unit is None else flag_unit
+        scale = unit / SIZE_SUFFIXES.get(suffix, 1)
+        self.scale = int(scale) if scale == int(scale) else scale
+
+    def encode(self, value):
+        return '{}{}'.format(int(round(value * self.scale)), self.suffix)
+
+    def encode_array(self, values):
+        np = import_numpy()
+        return np.char.add(np.rint(values * self.scale).astype(np.int64).astype(str), self.suffix)
+
+    def encode_source(self, var):
+        return 'str(int(round({} * {!r}))) + {!r}'.format(var, self.scale, self.suffix)
+
+    def decode(self, data):
+        val = data.lower()
+        multiplier = SIZE_SUFFIXES.get(val[-1:])
+        if multiplier is not None:
+            val = val[:-1]
+        elif not val[-1:].isdigit():
+            raise ValueError('Invalid size value {}, expected a number of bytes optionally followed by '
+                             'one of the suffixes: {}.'.format(q(data), ', '.join(SIZE_SUFFIXES)))
+        return int(val) * (multiplier or 1) / self.unit
+
+
+def format_size(size):
+    """
+    Returns JVM size value of a size in bytes with the largest suffix it is a whole multiple of, ex. `2m`.
+    """
+    for suffix, multiplier in sorted(SIZE_SUFFIXES.items(), key=lambda item: -item[1]):
+        if size and size % multiplier == 0:
+            return '{}{}'.format(size // multiplier, suffix)
+    return str(size)
+
+
+class SizeToStrValueEncoder:
+    """
+    Keeps sizes as JVM size values in the canonical form of `format_size`, so that sizes decoded from any of
+    their forms, ex. `2M` or `2097152`, match values of enum settings.
+    """
+    flag_kind = 'int'
+    flag_unit = 1
+    bytes_encoder = SizeValueEncoder(1, '')
 
     @staticmethod
     def encode(value):
-        return '{}m'.format(int(round(value * 1024)))
+        return value
 
     @staticmethod
-    def decode(data):
-        val = data.lower()
-        if val[-1] != 'm':
-            raise ValueError('Invalid value {} to decode from megabytes to gigabytes.'.format(q(data)))
-        return int(val[:-1]) / 1024
+    def encode_source(var):
+        return var
+
+    @classmethod
+    def decode(cls, data):
+        return format_size(int(cls.bytes_encoder.decode(data)))
+
+
+class IntToGbValueEncoder(SizeValueEncoder):
+    # Heap sizes are in GiB and encoded in megabytes
+
+    def __init__(self):
+        super().__init__(1024 ** 3, 'm')
 
 
 class IntToStrValueEncoder:
+    flag_kind = 'int'
+    flag_unit = 1
 
     @staticmethod
     def encode(value):
         return str(int(value))
 
+    @staticmethod
+    def encode_array(values):
+        np = import_numpy()
+        return values.astype(np.int64).astype(str)
+
+    @staticmethod
+    def encode_source(var):
+        return 'str(int({}))'.format(var)
+
     @staticmethod
     def decode(data):
         return int(data)
 
 
+class FloatToStrValueEncoder:
+    flag_kind = 'float'
+    flag_unit = 1
+
+    @staticmethod
+    def encode(value):
+        # 10 significant digits drop the noise of stepping over the lattice, ex. 1.3 for 1 + 3 * .1
+        return '{:.10g}'.format(value)
+
+    @staticmethod
+    def encode_array(values):
+        np = import_numpy()
+        return np.char.mod('%.10g', values)
+
+    @staticmethod
+    def encode_source(var):
+        return "'{{:.10g}}'.format({})".format(var)
+
+    @staticmethod
+    def decode(data):
+        return float(data)
+
+
+class FloatToDecimalStrValueEncoder:
+    # Some JDKs reject values of floating point flags without a decimal point, ex. -XX:MaxRAMPercentage=75
+    flag_kind = 'float'
+    flag_unit = 1
+
+    @staticmethod
+    def encode(value):
+        encoded = '{:.10g}'.format(value)
+        return encoded if '.' in encoded or 'e' in encoded else encoded + '.0'
+
+    @staticmethod
+    def encode_array(values):
+        np = import_numpy()
+        encoded = np.char.mod('%.10g', values)
+        integral = (np.char.find(encoded, '.') < 0) & (np.char.find(encoded, 'e') < 0)
+        return np.where(integral, np.char.add(encoded, '.0'), encoded)
+
+    @staticmethod
+    def decode(data):
+        return float(data)
+
+
+class StrValueEncoder:
+    flag_kind = 'str'
+    flag_unit = 1
+
+    @staticmethod
+    def encode(value):
+        return value
+
+    @staticmethod
+    def encode_source(var):
+        return var
+
+    @staticmethod
+    def decode(data):
+        return data
+
+
 class IntToPlusMinusValueEncoder:
+    flag_kind = 'bool'
+    flag_unit = 1
 
     @staticmethod
     def encode(value):
         return '+' if value else '-'
 
+    @staticmethod
+    def encode_array(values):
+        np = import_numpy()
+        return np.where(values != 0, '+', '-')
+
+    @staticmethod
+    def encode_source(var):
+        return "('+' if {} else '-')".format(var)
+
     @staticmethod
     def decode(data):
         if data == '+' or data == '':
@@ -47,11 +216,281 @@ class IntToPlusMinusValueEncoder:
             return 0
 
 
+X_SHORTHANDS = ('mx', 'ms', 'mn', 'ss')
+
+
+def option_key(option):
+    """
+    Returns the key JVM option is indexed by: flag name for `-XX:` options and shorthand for `-X` ones.
+
+    :param option: Single command line argument
+    :return: Tuple key or None if the argument is not a recognized JVM option
+    """
+    if option.startswith('-XX:'):
+        name = option[4:].split('=', 1)[0]
+        if name[:1] in ('+', '-'):
+            name = name[1:]
+        return 'XX', name
+    if option.startswith('-X'):
+        for shorthand in X_SHORTHANDS:
+            if option.startswith(shorthand, 2):
+                return 'X', shorthand
+    return None
+
+
+# Arguments are separated by unquoted blanks. A run of characters which can't start a complete argument
+# (an unterminated quote or a trailing backslash) is captured by the second group.
+ARG_PATTERN = re.compile(r'''((?:[^ \t\r\n'"\\]+|'[^']*'|"(?:[^"\\]|\\.)*"|\\.)+)|(['"\\])''', re.S)
+ARG_PART_PATTERN = re.compile(r'''([^'"\\]+)|'([^']*)'|"((?:[^"\\]|\\.)*)"|\\(.)''', re.S)
+DOUBLE_QUOTED_ESCAPE_PATTERN = re.compile(r'\\([$`"\\\n])')
+# Escaped newlines are removed by the shell, so arguments made of them alone are no arguments
+LINE_CONTINUATIONS_PATTERN = re.compile(r'(?:\\\n)+')
+ARG_BLANKS = (' ', '\t', '\r', '\n')
+ARGS_CHUNK_SIZE = 64 * 1024
+
+
+def _unescape_double_quoted(match):
+    char = match.group(1)
+    return '' if char == '\n' else char
+
+
+def unquote_arg(arg):
+    """
+    Removes POSIX shell quoting and escapes from a single argument.
+
+    :param arg: Argument as it was found in the command line
+    :return: Argument value
+    """
+    if "'" not in arg and '"' not in arg and '\\' not in arg:
+        return arg
+    parts = []
+    for match in ARG_PART_PATTERN.finditer(arg):
+        kind = match.lastindex
+        part = match.group(kind)
+        if kind == 3:
+            part = DOUBLE_QUOTED_ESCAPE_PATTERN.sub(_unescape_double_quoted, part)
+        elif kind == 4 and part == '\n':
+            part = ''
+        parts.append(part)
+    return ''.join(parts)
+
+
+def _iter_arg_matches(data, final=True):
+    # Unless the data is final, an argument is complete only when followed by a blank
+    for match in ARG_PATTERN.finditer(data):
+        if match.lastindex == 2 or (not final and data[match.end():match.end() + 1] not in ARG_BLANKS):
+            if final:
+                raise ValueError('No closing quotation or escaped character found '
+                                 'at position {} of the command line.'.format(match.start()))
+            return
+        if match.group(1)[0] == '\\' and LINE_CONTINUATIONS_PATTERN.fullmatch(match.group(1)):
+            continue
+        yield match
+
+
+def _iter_stream_args(stream, chunk_size):
+    buffer = ''
+    while True:
+        chunk = stream.read(chunk_size)
+        final = not chunk
+        buffer += chunk
+        consumed = 0
+        for match in _iter_arg_matches(buffer, final):
+            yield unquote_arg(match.group(1))
+            consumed = match.end()
+        if final:
+            return
+        buffer = buffer[consumed:]
+
+
+def iter_args(data, chunk_size=ARGS_CHUNK_SIZE):
+    """
+    Lazily splits a command line into arguments following POSIX shell quoting and escaping rules.
+
+    :param data: Command line string or a text stream to read it from in chunks
+    :param chunk_size: Number of characters to read from the stream at once
+    :return: Iterator over the arguments
+    :raises ValueError: On unterminated quotes or a trailing backslash
+    """
+    if isinstance(data, str):
+        return (unquote_arg(match.group(1)) for match in _iter_arg_matches(data))
+    return _iter_stream_args(data, chunk_size)
+
+
+def quote_args(args):
+    """
+    Joins arguments into a command line, quoting them for POSIX shell where necessary, so that
+    `iter_args` splits it back into the same arguments.
+
+    :param args: List of arguments
+    :return: Command line string
+    """
+    return ' '.join(map(shlex.quote, args))
+
+
+@lru_cache(maxsize=None)
+def compile_formats(formats, name, shorthand):
+    """
+    Compiles setting formats into a single anchored alternation with one value group per format. Compiled
+    patterns are cached, so all instances of a setting class share the same one.
+
+    :param formats: Tuple of setting formats in the order of precedence
+    :param name: Setting name
+    :param shorthand: Setting shorthand
+    :return: Compiled regular expression
+    """
+    alternatives = []
+    for setting_format in formats:
+        parts = ('-' + setting_format).split('{value}')
+        alternatives.append('(.*)'.join(re.escape(part.format(name=name, shorthand=shorthand)) for part in parts))
+    return re.compile('^(?:{})$'.format('|'.join(alternatives)))
+
+
+@lru_cache(maxsize=None)
+def compile_gc_pattern(values):
+    """
+    Compiles pattern matching options enabling or disabling any of the given garbage collectors.
+
+    :param values: Tuple of garbage collector names
+    :return: Compiled regular expression with groups for the sign and the collector name
+    """
+    return re.compile(r'^-XX:([+-]?)Use({})$'.format('|'.join(map(re.escape, values))))
+
+
+@lru_cache(maxsize=None)
+def get_option_matcher(name, jdk_version=None):
+    """
+    Returns keys of the option index and the pattern options of a supported setting are found with, so that
+    they can be looked up without configuring the setting.
+
+    :param name: Setting name
+    :param jdk_version: Major version of the JDK to look the options up under their names in
+    :return tuple: Tuple of keys and the compiled format pattern
+    """
+    setting_class = get_setting_class(name)
+    option_name = setting_class.get_jdk_option_name(jdk_version)
+    keys = []
+    for setting_format in setting_class.formats:
+        key = option_key('-' + setting_format.format(name=option_name, value='', shorthand=setting_class.shorthand))
+        if key is not None and key not in keys:
+            keys.append(key)
+    return tuple(keys), compile_formats(tuple(setting_class.formats), option_name, setting_class.shorthand)
+
+
+class OptionIndex:
+    """
+    Index of JVM options in a command line built in a single pass, so that settings can look up
+    their options by key instead of scanning all the arguments.
+    """
+
+    def __init__(self, data):
+        self.options = {}
+        self.positions = {}
+        for position, option in enumerate(data):
+            key = option_key(option)
+            if key is not None:
+                self.options.setdefault(key, []).append(option)
+                self.positions.setdefault(key, []).append(position)
+
+    def lookup(self, keys):
+        if len(keys) == 1:
+            return self.options.get(keys[0], [])
+        found = []
+        for key in keys:
+            found.extend(self.options.get(key, ()))
+        return found
+
+    def lookup_positions(self, keys):
+        found = []
+        for key in keys:
+            found.extend(self.positions.get(key, ()))
+        return sorted(found)
+
+
+# Launcher options followed by a separate argument, which must be skipped looking for the main class
+OPTIONS_WITH_ARGUMENT = ('-cp', '-classpath', '--class-path', '-p', '--module-path', '--upgrade-module-path',
+                         '--add-modules', '--limit-modules', '--add-reads', '--add-exports', '--add-opens',
+                         '--patch-module', '--enable-native-access')
+MAIN_CLASS_OPTIONS = ('-jar', '-m', '--module')
+
+
+def find_main_class_position(args):
+    """
+    Returns position of the argument JVM options end at: the main class, `-jar` or `-m` option.
+
+    :param args: List of arguments optionally starting with the java executable
+    :return int: Position of the boundary or the length of arguments if there is none
+    """
+    position = 0
+    if args and os.path.basename(args[0]) in ('java', 'java.exe'):
+        position = 1
+    while position < len(args):
+        arg = args[position]
+        if arg in MAIN_CLASS_OPTIONS or not arg.startswith('-'):
+            return position
+        if arg in OPTIONS_WITH_ARGUMENT:
+            position += 1
+        position += 1
+    return len(args)
+
+
+# Matches major version in `java -version` output or a version string, ex. `openjdk version "1.8.0_292"`, `17.0.1`
+JDK_VERSION_PATTERN = re.compile(r'version "(?:1\.)?(\d+)|^\s*(?:openjdk |java )?(?:1\.)?(\d+)')
+
+
+def parse_jdk_version(version):
+    """
+    Returns major version of the JDK.
+
+    :param version: Major version as an integer, a version string or output of `java -version`
+    :return int: Major version, ex. 8 for 1.8.0_292
+    :raises EncoderConfigException: If the version is not recognized
+    """
+    if isinstance(version, int) and not isinstance(version, bool) and version > 0:
+        return version
+    match = JDK_VERSION_PATTERN.search(version) if isinstance(version, str) else None
+    if match is None:
+        raise EncoderConfigException('Unrecognized JDK version {} in jvm encoder. Expected major version '
+                                     'or output of "java -version".'.format(q(version)))
+    return int(match.group(1) or match.group(2))
+
+
+def is_available_in_jdk(since, until, jdk_version):
+    return jdk_version is None or ((since is None or jdk_version >= since) and (until is None or jdk_version < until))
+
+
+def get_jdk_name(name, renames, jdk_version):
+    """
+    Returns name of a flag in the JDK version.
+
+    :param name: Name of the flag
+    :param renames: Tuple of pairs of the JDK version the flag is renamed in and its new name
+    :param jdk_version: Major version of the JDK, None to keep the name
+    """
+    if jdk_version is not None:
+        for since, new_name in renames:
+            if jdk_version >= since:
+                name = new_name
+    return name
+
+
 class RangeSetting(BaseRangeSetting):
     value_encoder = None
     formats = ('XX:{name}={value}',)
     shorthand = None
     preferred_format = 0
+    # JDK versions the flag is available from and removed in and the versions it is renamed in
+    jdk_since = None
+    jdk_until = None
+    jdk_renames = ()
+    # Versions of the JDK the default of the flag changes in and the new defaults
+    jdk_defaults = ()
+    # Major version of the JDK to encode for, set by the encoder
+    jdk_version = None
+    # Values of GCType the flag has effect with, all of them if None
+    gc_types = None
+    # Name of the JVM flag in -XX:+PrintFlagsFinal output, if other than the setting name
+    flag_name = None
 
     def __init__(self, config=None):
         super().__init__(config)
@@ -76,19 +515,70 @@ class RangeSetting(BaseRangeSetting):
                                       'Found {}.'.format(self.__class__.__name__, len(self.formats),
                                                          q(self.preferred_format)))
 
+    @classmethod
+    def get_jdk_option_name(cls, jdk_version):
+        return get_jdk_name(cls.name, cls.jdk_renames, jdk_version)
+
+    def get_option_name(self):
+        """
+        Returns name of the flag in the JDK version the setting is encoded for.
+        """
+        return self.get_jdk_option_name(self.jdk_version)
+
     def format_value(self, value, format_idx=None):
         index = self.preferred_format if format_idx is None else format_idx
         template = '-' + self.formats[index]
-        formatted = template.format(name=self.name, value=value, shorthand=self.shorthand)
+        formatted = template.format(name=self.get_option_name(), value=value, shorthand=self.shorthand)
         return formatted
 
+    def get_format_template(self):
+        """
+        Returns parts of the preferred format preceding and following the value, so that encoding a value
+        boils down to concatenation.
+
+        :return tuple: Prefix and suffix of the value
+        """
+        try:
+            return self._format_template
+        except AttributeError:
+            template = '-' + self.formats[self.preferred_format]
+            prefix, suffix = template.split('{value}', 1)
+            name = self.get_option_name()
+            self._format_template = (prefix.format(name=name, shorthand=self.shorthand),
+                                     suffix.format(name=name, shorthand=self.shorthand))
+            return self._format_template
+
+    def get_format_pattern(self):
+        try:
+            return self._format_pattern
+        except AttributeError:
+            self._format_pattern = compile_formats(tuple(self.formats), self.get_option_name(), self.shorthand)
+            return self._format_pattern
+
     def get_format_match(self, value):
+        return self.get_format_pattern().match(value)
+
+    def get_format_match_value(self, value):
+        match = self.get_format_match(value)
+        if match is None:
+            return None
+        return match.group(match.lastindex)
+
+    def get_option_keys(self):
+        """
+        Returns keys of the option index the setting can be found under, one per distinct format.
+        """
+        try:
+            return self._option_keys
+        except AttributeError:
+            pass
+        keys = []
         for format_idx, _ in enumerate(self.formats):
-            pattern = r'^{}$'.format(self.format_value('(.*)', format_idx))
-            match = re.match(pattern, value)
-            if match:
-                return match
-        return None
+            key = option_key(self.format_value('', format_idx))
+            if key is not None and key not in keys:
+                keys.append(key)
+        self._option_keys = keys
+        return keys
 
     def get_value_encoder(self):
         if callable(self.value_encoder):
@@ -104,19 +594,65 @@ class RangeSetting(BaseRangeSetting):
         """
         value = self.validate_value(value)
         encoded_value = self.get_value_encoder().encode(value)
-        return [self.format_value(encoded_value)]
+        prefix, suffix = self.get_format_template()
+        return [prefix + encoded_value + suffix]
+
+    def encode_option_as(self, value, option):
+        """
+        Encodes single primitive value in the same format the given option is in.
+
+        :param value: Single primitive value
+        :param option: Option of the setting to take the format of
+        :return list: List of multiple primitive values
+        """
+        match = self.get_format_match(option)
+        if match is None:
+            return self.encode_option(value)
+        value = self.validate_value(value)
+        return [self.format_value(self.get_value_encoder().encode(value), match.lastindex - 1)]
+
+    def get_lattice_size(self):
+        """
+        Returns number of values on the lattice of the setting, which are indexed by ordinals from 0 to size - 1.
+        """
+        return int(round((self.max - self.min) / self.step)) + 1
 
-    def filter_data(self, data):
-        def predicate(option):
-            return bool(self.get_format_match(option))
+    def get_lattice_value(self, ordinal):
+        return self.min + ordinal * self.step
 
-        return list(filter(predicate, data))
+    def get_lattice_ordinal(self, value):
+        return int(round((value - self.min) / self.step))
 
-    def validate_data(self, data):
+    def encode_ordinals(self, ordinals):
+        """
+        Encodes an array of lattice ordinals at once.
+
+        :param ordinals: NumPy array of integer ordinals, already checked to be within the lattice
+        :return list: List of lists of primitive values, one per ordinal
+        """
+        values = self.min + ordinals * self.step
+        value_encoder = self.get_value_encoder()
+        if hasattr(value_encoder, 'encode_array'):
+            encoded_values = value_encoder.encode_array(values).tolist()
+        else:
+            encoded_values = [value_encoder.encode(value) for value in values.tolist()]
+        prefix, suffix = self.get_format_template()
+        return [[prefix + encoded_value + suffix] for encoded_value in encoded_values]
+
+    def get_option_positions(self, data, index):
+        return [position for position in index.lookup_positions(self.get_option_keys())
+                if self.get_format_match(data[position])]
+
+    def filter_data(self, data, index=None):
+        if index is None:
+            index = OptionIndex(data)
+        return [option for option in index.lookup(self.get_option_keys()) if self.get_format_match(option)]
+
+    def validate_data(self, data, index=None):
         if not isinstance(data, list):
             raise SettingRuntimeException('Expected list on input for RangeSetting. '
                                           'Got {} instead.'.format(q(type(data).__name__)))
-        opts = self.filter_data(data)
+        opts = self.filter_data(data, index)
         if len(opts) > 1:
             raise SettingRuntimeException('Received multiple values for setting {}, only one value is allowed '
                                           'on decode'.format(q(self.name)))
@@ -125,17 +661,18 @@ class RangeSetting(BaseRangeSetting):
                                           'default value was configured.'.format(q(self.name)))
         return opts
 
-    def decode_option(self, data):
+    def decode_option(self, data, index=None):
         """
         Decodes list of primitive values back into single primitive value.
 
         :param data: List of multiple primitive values
+        :param index: Optional OptionIndex of the data shared between settings
         :return: Single primitive value
         """
-        opts = self.validate_data(data)
+        opts = self.validate_data(data, index)
         if opts:
             opt = opts[0]
-            value = self.get_format_match(opt).groups()[0]
+            value = self.get_format_match_value(opt)
             try:
                 return self.get_value_encoder().decode(value)
             except ValueError as e:
@@ -161,102 +698,90 @@ class HeapSizeSetting(RangeSetting, ABC):
     step = .125
 
 
-class MaxHeapSizeSetting(HeapSizeSetting):
-    name = 'MaxHeapSize'
-    shorthand = 'mx'
-
-
-class InitialHeapSizeSetting(HeapSizeSetting):
-    name = 'InitialHeapSize'
-    shorthand = 'ms'
-
-
-class InitialEdenHeapSizeSetting(HeapSizeSetting):
-    name = 'InitialEdenHeapSize'
-    shorthand = 'mn'
-    min = 32 / 1024
-    step = 32 / 1024
+class OffHeapSizeSetting(HeapSizeSetting):
+    value_encoder = SizeValueEncoder(1024 ** 2, 'm')
+    formats = ('XX:{name}={value}',)
+    unit = 'MiB'
+    min = 16
+    step = 16
 
 
-class GCTimeRatioSetting(RangeSetting):
+class IntegerSetting(RangeSetting):
     value_encoder = IntToStrValueEncoder()
-    name = 'GCTimeRatio'
-    min = 9
-    max = 99
-    step = 1
-    relaxable = False
 
 
-class G1NewSizePercentSetting(RangeSetting):
-    value_encoder = IntToStrValueEncoder()
-    name = 'G1NewSizePercent'
-    min = 0
-    max = 100
-    step = 1
-    default = 5
+class FloatSetting(RangeSetting):
+    value_encoder = FloatToStrValueEncoder()
 
 
-class G1ReservePercentSetting(RangeSetting):
-    value_encoder = IntToStrValueEncoder()
-    name = 'G1ReservePercent'
+class PercentageSetting(RangeSetting):
+    value_encoder = FloatToDecimalStrValueEncoder()
+    unit = '%'
     min = 0
     max = 100
     step = 1
-    default = 10
 
 
-class G1MixedGCLiveThresholdPercentSetting(RangeSetting):
-    value_encoder = IntToStrValueEncoder()
-    name = 'G1MixedGCLiveThresholdPercent'
+class EnumSetting(RangeSetting):
+    type = 'enum'
+    value_encoder = StrValueEncoder()
+    freeze_range = True
     min = 0
-    max = 100
+    max = 0
     step = 1
-    default = 65
+    values = ()
+    allowed_options = BaseRangeSetting.allowed_options | {'values'}
 
+    def __init__(self, config=None):
+        super().__init__(config)
+        if self.config.get('values'):
+            self.values = tuple(self.config.get('values'))
 
-class MaxGCPauseMillisSetting(RangeSetting):
-    value_encoder = IntToStrValueEncoder()
-    name = 'MaxGCPauseMillis'
-    min = 1
-    max = 1000
-    step = 1
-    default = 200
+        if self.default is not None and self.default not in self.values:
+            raise SettingConfigException(
+                'Default value for setting {} was not found in the defined list of values. '
+                'Found {}. Supported: {}'.format(q(self.name), q(self.default), ', '.join(self.values)))
 
+        self.max = len(self.values) - 1
 
-class NewRatioSetting(RangeSetting):
-    value_encoder = IntToStrValueEncoder()
-    name = 'NewRatio'
-    min = 1
-    max = 99
-    step = 1
-    default = 2
+    def describe(self):
+        name, descr = super().describe()
+        descr['values'] = [*self.values]
+        del descr['min']
+        del descr['max']
+        del descr['step']
+        return name, descr
 
+    def check_config(self):
+        super().check_config()
+        values = self.config.get('values')
+        if values is not None:
+            if not isinstance(values, (list, tuple)):
+                raise SettingConfigException('Provided set of values must be a list or a tuple in setting {}. '
+                                             'Found: {}'.format(q(self.name), values))
+            if len(values) == 0:
+                raise SettingConfigException('No values has been provided for setting {}.'.format(q(self.name)))
+            unrecognized_values = set(values) - set(self.values)
+            if unrecognized_values:
+                raise SettingConfigException('Provided set of values in setting {} contains those it does not '
+                                             'support: {}'.format(q(self.name), ', '.join(unrecognized_values)))
 
-class SurvivorRatioSetting(RangeSetting):
-    value_encoder = IntToStrValueEncoder()
-    name = 'SurvivorRatio'
-    min = 1
-    max = 99
-    step = 1
-    default = 8
+    def validate_value(self, value):
+        if value not in self.values:
+            raise SettingRuntimeException('Provided value {} for encode is not one of the available ones '
+                                          'for setting {}: {}.'.format(q(value), q(self.name), ', '.join(self.values)))
+        return value
 
+    def get_lattice_value(self, ordinal):
+        return self.values[ordinal]
 
-class TargetSurvivorRatioSetting(RangeSetting):
-    value_encoder = IntToStrValueEncoder()
-    name = 'TargetSurvivorRatio'
-    min = 9
-    max = 99
-    step = 1
-    default = 50
+    def get_lattice_ordinal(self, value):
+        return self.values.index(value)
 
-
-class StackShadowPagesSetting(RangeSetting):
-    value_encoder = IntToStrValueEncoder()
-    name = 'StackShadowPages'
-    min = 0
-    max = 100
-    step = 1
-    default = 20
+    def encode_ordinals(self, ordinals):
+        prefix, suffix = self.get_format_template()
+        encoded_values = [[prefix + value + suffix] for value in self.values]
+        return [encoded_values[ordinal] for ordinal in ordinals.tolist()]
 
 
 class GCTypeSetting(BaseRangeSetting):
@@ -266,12 +791,129 @@ class GCTypeSetting(BaseRangeSetting):
     min = 0
     max = 0
     step = 1
-    supported_values = ('ParNewGC', 'G1GC', 'ParallelOldGC', 'ConcMarkSweepGC', 'SerialGC')
+    supported_values = ('ParNewGC', 'G1GC', 'ParallelOldGC', 'ConcMarkSweepGC', 'SerialGC', 'ZGC', 'GenerationalZGC',
+                        'ShenandoahGC')
     values = supported_values
     disable_others = False
+    jdk_since = None
+    jdk_until = None
+    jdk_version = None
+    # JDK versions collectors are available from and removed in and the versions their flags are renamed in
+    value_jdk_versions = {'ParNewGC': (None, 10), 'ConcMarkSweepGC': (None, 14), 'ZGC': (11, 24),
+                          'GenerationalZGC': (21, None), 'ShenandoahGC': (12, None)}
+    value_jdk_renames = {'ParallelOldGC': ((15, 'ParallelGC'),)}
+    # Collectors, which are experimental and need UnlockExperimentalVMOptions before a JDK version
+    value_jdk_experimental = {'ZGC': 15, 'ShenandoahGC': 15}
+    # Collectors enabled by the flag of another one and told apart by a flag: the other collector, the flag
+    # and the JDK version it is on by default since
+    value_variants = {'GenerationalZGC': ('ZGC', 'ZGenerational', 23)}
+    # Whether UnlockExperimentalVMOptions is encoded along with experimental collectors, the encoder
+    # turns it off when the flag is a setting of its own
+    unlock_experimental = True
+    allowed_options = BaseRangeSetting.allowed_options | {'values', 'disable_others'}
+
+    @classmethod
+    def get_jdk_values(cls, jdk_version):
+        """
+        Returns supported collectors available in the JDK version.
+        """
+        return [value for value in cls.supported_values
+                if is_available_in_jdk(*cls.value_jdk_versions.get(value, (None, None)), jdk_version)]
+
+    @classmethod
+    def get_jdk_option_name(cls, value, jdk_version):
+        """
+        Returns name of the flag enabling the collector in the JDK version.
+        """
+        value = cls.value_variants.get(value, (value,))[0]
+        return 'Use' + get_jdk_name(value, cls.value_jdk_renames.get(value, ()), jdk_version)
+
+    @classmethod
+    def get_flag_states(cls, value, jdk_version):
+        """
+        Returns states of the flags the collector is enabled by in the JDK version, ex. 1 for both `UseZGC`
+        and `ZGenerational` for GenerationalZGC.
+        """
+        states = {cls.get_jdk_option_name(value, jdk_version): 1}
+        for variant, (base, flag, _) in cls.value_variants.items():
+            if variant == value:
+                states[flag] = 1
+            elif base == value:
+                states[flag] = 0
+        return states
+
+    def get_option_name(self, value):
+        return self.get_jdk_option_name(value, self.jdk_version)
+
+    def get_option_pattern(self):
+        names = dict.fromkeys(self.get_option_name(value)[len('Use'):] for value in self.supported_values)
+        return compile_gc_pattern(tuple(names))
+
+    def get_option_value(self, option_value, index):
+        """
+        Returns collector enabled by the flag matched by the option pattern, telling apart variants of
+        the collector by their flags in the index.
+        """
+        try:
+            values_by_option = self._values_by_option
+        except AttributeError:
+            values_by_option = self._values_by_option = {
+                self.get_option_name(value)[len('Use'):]: value
+                for value in self.supported_values if value not in self.value_variants}
+        value = values_by_option[option_value]
+        for variant, (base, flag, default_since) in self.value_variants.items():
+            if base != value:
+                continue
+            if self.jdk_version is not None and value not in self.get_jdk_values(self.jdk_version):
+                # Once the collector is removed, the JVM ignores the flag and runs the variant, ex. ZGC since JDK 24
+                return variant
+            options = index.lookup([('XX', flag)])
+            if options:
+                enabled = not options[-1].startswith('-XX:-')
+            else:
+                enabled = self.jdk_version is not None and self.jdk_version >= default_since
+            return variant if enabled else value
+        return value
+
+    def get_option_keys(self):
+        try:
+            return self._option_keys
+        except AttributeError:
+            self._option_keys = list(dict.fromkeys(('XX', self.get_option_name(value)) for value in self.values))
+            return self._option_keys
+
+    def requires_unlock(self, value):
+        """
+        Returns whether the collector is experimental in the JDK version, which is assumed when the version
+        is not known.
+        """
+        until = self.value_jdk_experimental.get(value)
+        return until is not None and (self.jdk_version is None or self.jdk_version < until)
+
+    def get_disabled_values(self):
+        """
+        Returns collectors `disable_others` turns off. Unless the JDK version is known, only those available
+        in all the versions are, as JVMs abort on unknown flags.
+        """
+        if self.jdk_version is None:
+            return [value for value in self.supported_values
+                    if self.value_jdk_versions.get(value, (None, None))[0] is None]
+        return self.get_jdk_values(self.jdk_version)
+
+    def get_variant_options(self, value):
+        """
+        Returns options telling apart the collector from its variants in the JDK version.
+        """
+        options = []
+        for variant, (base, flag, default_since) in self.value_variants.items():
+            default = self.jdk_version is not None and self.jdk_version >= default_since
+            if variant == value and not default:
+                options.append('-XX:+{}'.format(flag))
+            elif base == value and default:
+                options.append('-XX:-{}'.format(flag))
+        return options
 
     def __init__(self, config=None):
-        self.allowed_options.update({'values', 'disable_others'})
         super().__init__(config)
         if self.config.get('values'):
             self.values = self.config.get('values')
@@ -287,16 +929,6 @@ class GCTypeSetting(BaseRangeSetting):
         if disable_others is not None:
             self.disable_others = disable_others
 
-        self.settings = []
-        for value in self.values:
-            class Setting(BooleanSetting):
-                name = value
-                default = 0
-                formats = ('XX:{value}Use{name}',)
-
-            setting = Setting()
-            self.settings.append(setting)
-
     def describe(self):
         name, descr = super().describe()
         descr['values'] = [*self.values]
@@ -336,27 +968,73 @@ class GCTypeSetting(BaseRangeSetting):
         value_index = value
         current_value = self.values[value_index]
         encoded = []
+        if self.unlock_experimental and self.requires_unlock(current_value):
+            encoded.append('-XX:+UnlockExperimentalVMOptions')
+        option_name = self.get_option_name(current_value)
         if self.disable_others:
-            disabled_gcs = set(self.supported_values) - {current_value}
-            for gc in sorted(disabled_gcs):
-                encoded.append('-XX:-Use{}'.format(gc))
-        encoded.append('-XX:+Use{}'.format(current_value))
+            disabled_options = {self.get_option_name(gc) for gc in self.get_disabled_values()} - {option_name}
+            for disabled_option in sorted(disabled_options):
+                encoded.append('-XX:-{}'.format(disabled_option))
+        encoded.append('-XX:+{}'.format(option_name))
+        encoded.extend(self.get_variant_options(current_value))
         return encoded
 
-    def validate_data(self, data):
-        decoded_values = {setting.name: setting.decode_option(data) for setting in self.settings}
+    def get_option_positions(self, data, index):
+        keys = list(dict.fromkeys(('XX', self.get_option_name(value)) for value in self.supported_values))
+        pattern = self.get_option_pattern()
+        positions = [position for position in index.lookup_positions(keys) if pattern.match(data[position])]
+        variant_keys = [('XX', flag) for _, flag, _ in self.value_variants.values()]
+        return sorted(positions + index.lookup_positions(variant_keys))
+
+    def encode_option_as(self, value, option):
+        return self.encode_option(value)
+
+    def get_lattice_size(self):
+        return len(self.values)
+
+    def get_lattice_value(self, ordinal):
+        return self.values[ordinal]
+
+    def get_lattice_ordinal(self, value):
+        return self.values.index(value)
+
+    def encode_ordinals(self, ordinals):
+        encoded_values = [self.encode_option(value) for value in self.values]
+        return [encoded_values[ordinal] for ordinal in ordinals.tolist()]
+
+    def validate_data(self, data, index=None):
+        if not isinstance(data, list):
+            raise SettingRuntimeException('Expected list on input for setting GCType. '
+                                          'Got {} instead.'.format(q(type(data).__name__)))
+        if index is None:
+            index = OptionIndex(data)
+
+        decoded_values = dict.fromkeys(self.values, 0)
+        found = set()
+        pattern = self.get_option_pattern()
+        for option in index.lookup(self.get_option_keys()):
+            match = pattern.match(option)
+            if match is None:
+                continue
+            sign, value = match.groups()
+            value = self.get_option_value(value, index)
+            if value in found:
+                raise SettingRuntimeException('Received multiple values for collector {} of setting {}, only one '
+                                              'value is allowed on decode'.format(q(value), q(self.name)))
+            found.add(value)
+            decoded_values[value] = 0 if sign == '-' else 1
 
         if sum(decoded_values.values()) > 1:
             raise SettingRuntimeException('There is more than 1 active GC in the input data for setting GCType.')
 
         if not any(decoded_values.values()) and self.default is None:
             raise SettingRuntimeException('No value found to decode for setting GCType and no '
-                                          'default value was configured.'.format(q(self.name)))
+                                          'default value was configured.')
 
         return decoded_values
 
-    def decode_option(self, data):
-        decoded_values = self.validate_data(data)
+    def decode_option(self, data, index=None):
+        decoded_values = self.validate_data(data, index)
 
         if any(decoded_values.values()):
             value = list(filter(lambda i: i[1] == 1, decoded_values.items()))[0][0]
@@ -365,94 +1043,1639 @@ class GCTypeSetting(BaseRangeSetting):
         return self.default
 
 
-# Boolean settings
-class CMSParallelRemarkEnabledSetting(BooleanSetting):
-    name = 'CMSParallelRemarkEnabled'
-    default = 0
-
+# Collectors flags specific to some of them have effect with
+G1 = ('G1GC',)
+CMS = ('ConcMarkSweepGC',)
+ZGCS = ('ZGC', 'GenerationalZGC')
+SHENANDOAH = ('ShenandoahGC',)
+THROUGHPUT_GCS = ('G1GC', 'ParallelOldGC')
+CONCURRENT_GCS = ('G1GC', 'ConcMarkSweepGC', 'ZGC', 'GenerationalZGC', 'ShenandoahGC')
+NUMA_GCS = ('G1GC', 'ParallelOldGC', 'ZGC', 'GenerationalZGC')
+PARALLEL_GCS = ('ParNewGC', 'G1GC', 'ParallelOldGC', 'ConcMarkSweepGC', 'ZGC', 'GenerationalZGC', 'ShenandoahGC')
+
+# Large page sizes of the supported platforms, ex. 2m and 1g on x86_64
+LARGE_PAGE_SIZES = ('64k', '2m', '32m', '512m', '1g', '16g')
+
+# Supported settings by name: kind of the setting and class attributes to override those of the kind with.
+# Setting classes are built from this table on first use.
+SETTINGS = {
+    'MaxHeapSize': ('heap', {'shorthand': 'mx'}),
+    'InitialHeapSize': ('heap', {'shorthand': 'ms'}),
+    'InitialEdenHeapSize': ('heap', {'shorthand': 'mn', 'min': 32 / 1024, 'step': 32 / 1024, 'flag_name': 'NewSize'}),
+    'GCTimeRatio': ('int', {'min': 9, 'max': 99, 'step': 1, 'relaxable': False, 'gc_types': THROUGHPUT_GCS}),
+    'G1NewSizePercent': ('int', {'min': 0, 'max': 100, 'step': 1, 'default': 5, 'gc_types': G1}),
+    'G1ReservePercent': ('int', {'min': 0, 'max': 100, 'step': 1, 'default': 10, 'gc_types': G1}),
+    'G1MixedGCLiveThresholdPercent': ('int', {'min': 0, 'max': 100, 'step': 1, 'default': 65, 'gc_types': G1}),
+    'MaxGCPauseMillis': ('int', {'min': 1, 'max': 1000, 'step': 1, 'default': 200, 'gc_types': THROUGHPUT_GCS}),
+    'NewRatio': ('int', {'min': 1, 'max': 99, 'step': 1, 'default': 2}),
+    'SurvivorRatio': ('int', {'min': 1, 'max': 99, 'step': 1, 'default': 8}),
+    'TargetSurvivorRatio': ('int', {'min': 9, 'max': 99, 'step': 1, 'default': 50}),
+    'StackShadowPages': ('int', {'min': 0, 'max': 100, 'step': 1, 'default': 20}),
+    'MaxMetaspaceSize': ('offheap', {'min': 64, 'max': 4096, 'step': 64}),
+    'MetaspaceSize': ('offheap', {'max': 1024}),
+    'ReservedCodeCacheSize': ('offheap', {'min': 32, 'max': 2048, 'default': 240}),
+    'MaxDirectMemorySize': ('offheap', {'min': 64, 'step': 64}),
+    # -XX:ThreadStackSize is in KiB without a suffix, so only -Xss is supported
+    'ThreadStackSize': ('offheap', {'value_encoder': SizeValueEncoder(1024, 'k', flag_unit=1),
+                                    'formats': ('X{shorthand}{value}',), 'shorthand': 'ss', 'unit': 'KiB',
+                                    'min': 256, 'max': 8192, 'step': 128, 'default': 1024}),
+    'GCType': ('gc', {}),
+    'CMSParallelRemarkEnabled': ('bool', {'default': 0, 'jdk_until': 14, 'gc_types': CMS}),
+    'UseCMSInitiatingOccupancyOnly': ('bool', {'default': 0, 'jdk_until': 14, 'gc_types': CMS}),
+    'CMSInitiatingOccupancyFraction': ('int', {'min': 50, 'max': 95, 'step': 1, 'default': 92, 'jdk_until': 14,
+                                               'gc_types': CMS}),
+    'CMSScavengeBeforeRemark': ('bool', {'default': 0, 'jdk_until': 14, 'gc_types': CMS}),
+    'ScavengeBeforeFullGC': ('bool', {'default': 0, 'jdk_until': 23}),
+    'AlwaysPreTouch': ('bool', {'default': 0}),
+    'ExplicitGCInvokesConcurrent': ('bool', {'default': 0}),
+    'ParallelRefProcEnabled': ('bool', {'default': 0}),
+    'UseStringDeduplication': ('bool', {'default': 0}),
+    'UnlockExperimentalVMOptions': ('bool', {'default': 0}),
+    'UseCGroupMemoryLimitForHeap': ('bool', {'default': 0, 'jdk_renames': ((10, 'UseContainerSupport'),)}),
+    'MaxRAMPercentage': ('percent', {'min': 1, 'default': 25, 'jdk_since': 10}),
+    'MinRAMPercentage': ('percent', {'min': 1, 'default': 50, 'jdk_since': 10}),
+    'InitialRAMPercentage': ('percent', {'step': 1 / 16, 'default': 1.5625, 'jdk_since': 10}),
+    'TieredCompilation': ('bool', {'default': 1}),
+    'TieredStopAtLevel': ('int', {'min': 0, 'max': 4, 'step': 1, 'default': 4}),
+    'CompileThreshold': ('int', {'min': 1000, 'max': 100000, 'step': 1000, 'default': 10000}),
+    'InlineSmallCode': ('int', {'min': 500, 'max': 10000, 'step': 500, 'default': 2000, 'jdk_defaults': ((14, 2500),)}),
+    'MaxInlineSize': ('int', {'min': 0, 'max': 200, 'step': 5, 'default': 35}),
+    'FreqInlineSize': ('int', {'min': 0, 'max': 1000, 'step': 25, 'default': 325}),
+    'UseCountedLoopSafepoints': ('bool', {'default': 0, 'jdk_defaults': ((10, 1),)}),
+    'UseLargePages': ('bool', {'default': 0}),
+    'UseTransparentHugePages': ('bool', {'default': 0}),
+    'LargePageSizeInBytes': ('enum', {'value_encoder': SizeToStrValueEncoder(), 'values': LARGE_PAGE_SIZES}),
+    'UseNUMA': ('bool', {'default': 0, 'gc_types': NUMA_GCS}),
+    'ConcGCThreads': ('int', {'min': 1, 'step': 1, 'gc_types': CONCURRENT_GCS}),
+    'ParallelGCThreads': ('int', {'min': 1, 'step': 1, 'gc_types': PARALLEL_GCS}),
+    'CICompilerCount': ('int', {'min': 2, 'step': 1}),
+    'ActiveProcessorCount': ('int', {'min': 1, 'step': 1, 'jdk_since': 10}),
+    'ZCollectionInterval': ('float', {'min': 0, 'max': 600, 'step': 1, 'default': 0, 'jdk_since': 11,
+                                      'gc_types': ZGCS}),
+    'ZAllocationSpikeTolerance': ('float', {'min': 1, 'max': 10, 'step': .25, 'default': 2, 'jdk_since': 11,
+                                            'gc_types': ZGCS}),
+    'ShenandoahGCHeuristics': ('enum', {'values': ('adaptive', 'static', 'compact', 'aggressive'),
+                                        'default': 'adaptive', 'jdk_since': 12, 'gc_types': SHENANDOAH}),
+}
+
+SETTING_KINDS = {
+    'int': IntegerSetting,
+    'float': FloatSetting,
+    'percent': PercentageSetting,
+    'enum': EnumSetting,
+    'bool': BooleanSetting,
+    'heap': HeapSizeSetting,
+    'offheap': OffHeapSizeSetting,
+    'gc': GCTypeSetting,
+}
+
+_setting_classes = {}
+
+
+def get_setting_class(name):
+    """
+    Returns class of the supported setting, building it from the `SETTINGS` table on first use.
+
+    :param name: Setting name
+    :return: Setting class
+    :raises EncoderConfigException: If the setting is not supported
+    """
+    try:
+        return _setting_classes[name]
+    except KeyError:
+        pass
+    try:
+        kind, attrs = SETTINGS[name]
+    except (KeyError, TypeError):
+        import difflib
+        suggestions = difflib.get_close_matches(str(name), SETTINGS, n=3)
+        hint = ' Did you mean {}?'.format(' or '.join(map(q, suggestions))) if suggestions else ''
+        raise EncoderConfigException('Setting "{}" is not supported in java-opts encoder.{}'.format(name, hint))
+    base = SETTING_KINDS[kind]
+    if base.name == name and not attrs:
+        setting_class = base
+    else:
+        setting_class = type('{}Setting'.format(name), (base,), dict(attrs, name=name, __module__=__name__))
+    _setting_classes[name] = setting_class
+    return setting_class
+
+
+def __getattr__(name):
+    # Keeps setting classes importable by their names, ex. `from encoders.jvm import MaxHeapSizeSetting`
+    if name.endswith('Setting') and name[:-len('Setting')] in SETTINGS:
+        return get_setting_class(name[:-len('Setting')])
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+
+# Relations between settings the JVM fails to start or overrides the former if violated: setting, operator,
+# setting it is bounded by
+SETTING_CONSTRAINTS = (
+    ('InitialHeapSize', '<=', 'MaxHeapSize'),
+    ('InitialEdenHeapSize', '<', 'MaxHeapSize'),
+    ('InitialRAMPercentage', '<=', 'MaxRAMPercentage'),
+    ('MetaspaceSize', '<=', 'MaxMetaspaceSize'),
+)
+# Heap sizes set as a percentage of the available memory by the setting of the absolute size overriding them
+HEAP_PERCENTAGE_SETTINGS = {
+    'MaxRAMPercentage': 'MaxHeapSize',
+    'MinRAMPercentage': 'MaxHeapSize',
+    'InitialRAMPercentage': 'InitialHeapSize',
+}
+CONSTRAINT_MODES = ('reject', 'repair', 'off')
+# Tolerance of comparing values on the lattice of a setting, in steps
+LATTICE_TOLERANCE = 1e-9
+
+
+def get_max_ordinal(setting, bound, operator):
+    """
+    Returns the highest lattice ordinal of the setting, whose value satisfies the relation to the bound.
+    Works on scalars as well as NumPy arrays of bounds.
+    """
+    ordinal = (bound - setting.min) / setting.step
+    if operator == '<=':
+        return (ordinal + LATTICE_TOLERANCE) // 1
+    return -((-ordinal + LATTICE_TOLERANCE) // 1) - 1
+
+
+_generated_count = 0
+
+
+def generate_codecs(settings, before, after, conditional=None):
+    """
+    Generates source of encode and decode functions specialized for the given settings, with names,
+    templates, patterns and defaults inlined as constants. Settings without specialized code are called
+    through their bound methods.
+
+    :param settings: Dict of settings by name
+    :param before: Arguments to put before the encoded settings
+    :param after: Arguments to put after the encoded settings
+    :param conditional: Values of GCType by name of the settings, which are only active with those
+    :return tuple: Source of the module defining `encode` and `decode` functions and its namespace
+    """
+    conditional = conditional or {}
+    namespace = {
+        'BEFORE': tuple(before),
+        'AFTER': tuple(after),
+        'NAMES': frozenset(settings),
+        'OptionIndex': OptionIndex,
+        'EncoderRuntimeException': EncoderRuntimeException,
+        'SettingRuntimeException': SettingRuntimeException,
+    }
+    encode_lines = ['def encode(values):', '    encoded = list(BEFORE)']
+    decode_lines = ['def decode(data):', '    index = OptionIndex(data)', '    decoded = {}']
+    if conditional:
+        encode_lines.append("    gc_type = values.get('GCType')")
+
+    for idx, (name, setting) in enumerate(settings.items()):
+        namespace['validate_{}'.format(idx)] = setting.validate_value
+        indent = '    '
+        if name in conditional:
+            namespace['ACTIVE_{}'.format(idx)] = conditional[name]
+            encode_lines.append('    if gc_type in ACTIVE_{}:'.format(idx))
+            indent += '    '
+        encode_lines.append('{}value = validate_{}(values.get({!r}))'.format(indent, idx, name))
+        if isinstance(setting, GCTypeSetting):
+            namespace['ENCODED_{}'.format(idx)] = tuple(tuple(setting.encode_option(value))
+                                                        for value in setting.values)
+            encode_lines.append('    encoded.extend(ENCODED_{}[value])'.format(idx))
+        else:
+            value_encoder = setting.get_value_encoder()
+            if hasattr(value_encoder, 'encode_source'):
+                expression = value_encoder.encode_source('value')
+            else:
+                namespace['encode_{}'.format(idx)] = value_encoder.encode
+                expression = 'encode_{}(value)'.format(idx)
+            prefix, suffix = setting.get_format_template()
+            parts = [repr(prefix)] if prefix else []
+            parts.append(expression)
+            if suffix:
+                parts.append(repr(suffix))
+            encode_lines.append('{}encoded.append({})'.format(indent, ' + '.join(parts)))
+
+    # GCType is decoded first, as the settings conditional on it are only decoded when active
+    for idx, (name, setting) in sorted(enumerate(settings.items()),
+                                       key=lambda item: not isinstance(item[1][1], GCTypeSetting)):
+        if name in conditional:
+            decode_lines.append("    if decoded['GCType'] in ACTIVE_{}:".format(idx))
+        block_start = len(decode_lines)
+        if not isinstance(setting, RangeSetting):
+            namespace['decode_option_{}'.format(idx)] = setting.decode_option
+            decode_lines.append('    decoded[{!r}] = decode_option_{}(data, index)'.format(name, idx))
+        else:
+            namespace['KEYS_{}'.format(idx)] = setting.get_option_keys()
+            namespace['match_{}'.format(idx)] = setting.get_format_pattern().match
+            namespace['decode_{}'.format(idx)] = setting.get_value_encoder().decode
+            namespace['DEFAULT_{}'.format(idx)] = setting.default
+            decode_lines.extend((
+                '    options = [option for option in index.lookup(KEYS_{0}) if match_{0}(option)]'.format(idx),
+                '    if len(options) > 1:',
+                '        raise SettingRuntimeException({!r})'.format(
+                    'Received multiple values for setting {}, only one value is allowed on decode'.format(q(name))),
+                '    if options:',
+                '        match = match_{}(options[0])'.format(idx),
+                '        try:',
+                '            decoded[{!r}] = decode_{}(match.group(match.lastindex))'.format(name, idx),
+                '        except ValueError as e:',
+                '            raise SettingRuntimeException({!r}.format(str(e), options[0]))'.format(
+                    'Invalid value to decode for setting {}. '.format(q(name)) + 'Error: {}. Arg: {}'),
+            ))
+            if setting.default is None:
+                decode_lines.extend((
+                    '    else:',
+                    '        raise SettingRuntimeException({!r})'.format(
+                        'No value found to decode for setting {} and no default value was configured.'.format(q(name))),
+                ))
+            else:
+                decode_lines.extend((
+                    '    else:',
+                    '        decoded[{!r}] = DEFAULT_{}'.format(name, idx),
+                ))
+        if name in conditional:
+            decode_lines[block_start:] = ['    ' + line for line in decode_lines[block_start:]]
+
+    encode_lines.extend((
+        '    encoded.extend(AFTER)',
+        '    if not NAMES.issuperset(values):',
+        "        raise EncoderRuntimeException('We received settings to encode we do not support: {}'.format(",
+        "            ', '.join(name for name in values if name not in NAMES)))",
+        '    return encoded',
+    ))
+    decode_lines.append('    return decoded')
+    return '\n'.join(encode_lines + [''] + decode_lines) + '\n', namespace
+
+
+def compile_codecs(settings, before, after, conditional=None):
+    """
+    Compiles functions generated by `generate_codecs`. Source is registered in `linecache`, so that
+    tracebacks show the generated code.
+
+    :return tuple: Encode and decode functions and their source
+    """
+    global _generated_count
+    source, namespace = generate_codecs(settings, before, after, conditional)
+    _generated_count += 1
+    filename = '<jvm-encoder-{}>'.format(_generated_count)
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    exec(compile(source, filename, 'exec'), namespace)
+    return namespace['encode'], namespace['decode'], source
+
+
+class LRUCache:
+    """
+    Size-bounded cache evicting least recently used items, which keeps track of hits, misses and evictions.
+    """
+
+    def __init__(self, maxsize=0):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        try:
+            value = self.items[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.items.move_to_end(key)
+        self.hits += 1
+        return value
 
-class UseCMSInitiatingOccupancyOnlySetting(BooleanSetting):
-    name = 'UseCMSInitiatingOccupancyOnly'
-    default = 0
+    def put(self, key, value):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        self.evict()
+
+    def evict(self):
+        while len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, maxsize):
+        self.maxsize = maxsize
+        self.evict()
+
+    def clear(self):
+        self.items.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self.items), 'maxsize': self.maxsize}
+
+
+def config_fingerprint(config):
+    """
+    Returns canonical hash of the encoder config or any other JSON-like structure.
+    """
+    import hashlib
+    import json
+    canonical = json.dumps(config, sort_keys=True, separators=(',', ':'), default=repr)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+SNAPSHOT_VERSION = 1
+
+
+def get_snapshot_path(snapshot_dir, settings_config):
+    """
+    Returns path of the snapshot of settings built from the given config. Snapshots are keyed by the config
+    along with the version of this module, so they get stale once either of them changes.
+    """
+    module_stat = os.stat(__file__)
+    key = zlib.crc32(repr((SNAPSHOT_VERSION, module_stat.st_mtime_ns, module_stat.st_size,
+                           settings_config)).encode('utf-8'))
+    return os.path.join(snapshot_dir, 'jvm-encoder-{:08x}.marshal'.format(key))
+
+
+def load_settings_snapshot(path, settings_config):
+    """
+    Restores validated settings from a snapshot without running their config checks.
+
+    :param path: Path of the snapshot file
+    :param settings_config: Config the settings are expected to be built from
+    :return dict: Settings by name or None if there is no usable snapshot
+    """
+    try:
+        with open(path, 'rb') as f:
+            snapshot = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if (
+            not isinstance(snapshot, dict)
+            or snapshot.get('version') != SNAPSHOT_VERSION
+            or snapshot.get('config') != settings_config
+    ):
+        return None
+    settings = {}
+    for name, state in snapshot['settings']:
+        setting_class = get_setting_class(name)
+        setting = setting_class.__new__(setting_class)
+        setting.__dict__.update(state)
+        settings[name] = setting
+    return settings
+
+
+def save_settings_snapshot(path, settings_config, settings):
+    """
+    Writes snapshot of validated settings. Caches of the settings are left out to be rebuilt on first use.
+    Failures to write are ignored, as the snapshot is only an optimization.
+    """
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'config': settings_config,
+        'settings': [(name, {key: value for key, value in vars(setting).items() if not key.startswith('_')})
+                     for name, setting in settings.items()],
+    }
+    try:
+        data = marshal.dumps(snapshot)
+    except ValueError:
+        return
+    write_file_atomic(path, data)
+
+
+def write_file_atomic(path, data):
+    """
+    Writes data to a temporary file next to the path and moves it in place, so that readers never see
+    a partially written file. Failures to write are ignored.
+    """
+    import tempfile
+    try:
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    except OSError:
+        pass
+
+
+# Kinds of values of JVM flags by their type in -XX:+PrintFlagsFinal output
+FLAG_TYPE_KINDS = {
+    'bool': 'bool',
+    'int': 'int',
+    'intx': 'int',
+    'uint': 'int',
+    'uintx': 'int',
+    'uint64_t': 'int',
+    'size_t': 'int',
+    'double': 'float',
+    'ccstr': 'str',
+}
+FLAGS_CACHE_VERSION = 1
+_flag_tables = {}
+
+
+def parse_flag_value(flag_type, value):
+    kind = FLAG_TYPE_KINDS.get(flag_type)
+    try:
+        if kind == 'bool':
+            return 1 if value == 'true' else 0
+        if kind == 'int':
+            return int(value)
+        if kind == 'float':
+            return float(value)
+    except ValueError:
+        return None
+    return value
+
+
+def parse_flags(text):
+    """
+    Parses output of `java -XX:+PrintFlagsFinal` and/or `java -XX:+PrintFlagsRanges` into a flag table.
+    Lines are split on blanks, which is several times faster than matching them with patterns, ex.
+    `size_t MaxHeapSize := 4294967296 {product}` (JDK 8 marks changed values with `:=`) for values
+    and `uintx G1ReservePercent [ 0 ... 50 ] {product}` for ranges.
+
+    :param text: Output of the JVM
+    :return dict: Tuple of type, value, min and max by flag name, parts missing in the output are None
+    """
+    flags = {}
+    for line in text.splitlines():
+        parts = line.split(None, 6)
+        if len(parts) < 3:
+            continue
+        flag_type, name, separator = parts[:3]
+        if separator == '=' or separator == ':=':
+            value = parts[3] if len(parts) > 3 and not parts[3].startswith('{') else ''
+            low, high = flags.get(name, (None, None, None, None))[2:]
+            flags[name] = (flag_type, parse_flag_value(flag_type, value), low, high)
+        elif separator == '[' and len(parts) > 5 and parts[4] == '...':
+            value = flags.get(name, (None, None))[1]
+            flags[name] = (flag_type, value, parse_flag_value(flag_type, parts[3]),
+                           parse_flag_value(flag_type, parts[5].rstrip(']')))
+    return flags
+
+
+def load_flags_file(path, cache_dir=None):
+    """
+    Returns flag table parsed from the file. Tables are kept in memory for the lifetime of the process
+    and, if the cache directory is given, on disk keyed by the content of the file.
+
+    :param path: Path of the file with output of the JVM
+    :param cache_dir: Directory to cache parsed tables in
+    :return dict: Flag table as returned by `parse_flags`
+    :raises EncoderConfigException: If the file can not be read
+    """
+    path = os.path.abspath(path)
+    try:
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cached = _flag_tables.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        with open(path, 'rb') as f:
+            content = f.read()
+    except OSError as e:
+        raise EncoderConfigException('Unable to read JVM flags from {} in jvm encoder: {}'.format(q(path), str(e)))
+
+    flags = None
+    if cache_dir:
+        import hashlib
+        digest = hashlib.sha1(str(FLAGS_CACHE_VERSION).encode('ascii') + content).hexdigest()
+        cache_path = os.path.join(cache_dir, 'jvm-flags-{}.marshal'.format(digest))
+        try:
+            with open(cache_path, 'rb') as f:
+                flags = marshal.loads(f.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+        if not isinstance(flags, dict):
+            flags = parse_flags(content.decode('utf-8', 'replace'))
+            write_file_atomic(cache_path, marshal.dumps(flags))
+    else:
+        flags = parse_flags(content.decode('utf-8', 'replace'))
+    _flag_tables[path] = (stamp, flags)
+    return flags
+
+
+def load_flags(paths, cache_dir=None):
+    """
+    Returns flag table merged from the files, ex. outputs of -XX:+PrintFlagsFinal and -XX:+PrintFlagsRanges.
+
+    :param paths: Path or list of paths of the files
+    :param cache_dir: Directory to cache parsed tables in
+    :return dict: Flag table as returned by `parse_flags`
+    """
+    if isinstance(paths, str):
+        return load_flags_file(paths, cache_dir)
+    flags = {}
+    for path in paths:
+        for name, flag in load_flags_file(path, cache_dir).items():
+            known = flags.get(name)
+            flags[name] = flag if known is None else tuple(old if new is None else new
+                                                           for old, new in zip(known, flag))
+    return flags
+
+
+def apply_jdk_version(settings_config, jdk_version):
+    """
+    Leaves out settings unavailable in the JDK version and limits values of GCType to the collectors
+    available in it.
+
+    :param settings_config: Configs of settings by name
+    :param jdk_version: Major version of the JDK
+    :return dict: Configs of the available settings
+    :raises EncoderConfigException: If configured values of GCType are not available in the JDK version
+    """
+    configs = {}
+    for name, config in settings_config.items():
+        setting_class = get_setting_class(name)
+        if not is_available_in_jdk(setting_class.jdk_since, setting_class.jdk_until, jdk_version):
+            continue
+        configs[name] = config
+        if not issubclass(setting_class, GCTypeSetting) or (config is not None and not isinstance(config, dict)):
+            continue
+        available = setting_class.get_jdk_values(jdk_version)
+        values = (config or {}).get('values')
+        if isinstance(values, (list, tuple)):
+            unavailable = [value for value in values if value not in available]
+            if unavailable:
+                raise EncoderConfigException('Values {} of setting GCType are not available in JDK {}. '
+                                             'Available: {}.'.format(', '.join(unavailable), jdk_version,
+                                                                     ', '.join(available)))
+        elif len(available) < len(setting_class.supported_values):
+            configs[name] = dict(config or {}, values=available)
+    return configs
+
+
+def apply_jdk_defaults(settings_config, jdk_version):
+    """
+    Sets defaults not configured of the settings, whose flags have other defaults in the JDK version.
+
+    :param settings_config: Configs of settings by name
+    :param jdk_version: Major version of the JDK
+    :return dict: Configs of settings with the defaults set
+    """
+    configs = dict(settings_config)
+    for name, config in settings_config.items():
+        jdk_defaults = getattr(get_setting_class(name), 'jdk_defaults', ())
+        if not jdk_defaults or (config is not None and not isinstance(config, dict)) or 'default' in (config or {}):
+            continue
+        for since, default in jdk_defaults:
+            if jdk_version >= since:
+                configs[name] = dict(config or {}, default=default)
+    return configs
+
+
+SYSFS_ROOT = '/sys'
+# Memory limit of the cgroup of the container in cgroup v2 and v1 hierarchies, relative to the sysfs root
+CGROUP_MEMORY_LIMIT_PATHS = ('fs/cgroup/memory.max', 'fs/cgroup/memory/memory.limit_in_bytes')
+# Limits from here on mean there is none, ex. 9223372036854771712 in cgroup v1
+CGROUP_UNLIMITED = 2 ** 60
+CONTAINER_HEAP_SETTINGS = ('MaxHeapSize', 'InitialHeapSize')
+# Share of the memory limit for the heap and memory in GiB reserved for the rest of the JVM out of it
+CONTAINER_MEMORY_DEFAULTS = {'heap_fraction': .75, 'reserved': .25}
+# CPU quota and period of the cgroup of the container in cgroup v2 (in a single file) and v1 hierarchies
+CGROUP_CPU_LIMIT_PATHS = (('fs/cgroup/cpu.max', None),
+                          ('fs/cgroup/cpu/cpu.cfs_quota_us', 'fs/cgroup/cpu/cpu.cfs_period_us'),
+                          ('fs/cgroup/cpu,cpuacct/cpu.cfs_quota_us', 'fs/cgroup/cpu,cpuacct/cpu.cfs_period_us'))
+CONTAINER_CPU_SETTINGS = ('ParallelGCThreads', 'ConcGCThreads', 'CICompilerCount', 'ActiveProcessorCount')
+# Threads per CPU of the limit
+CONTAINER_CPU_DEFAULTS = {'threads_per_cpu': 1}
+
+
+# Huge page pools by size, transparent huge pages mode and NUMA nodes of the host, relative to the sysfs root
+HUGE_PAGES_PATH = 'kernel/mm/hugepages'
+HUGE_PAGES_POOL_PATTERN = re.compile(r'^hugepages-(\d+)kB$')
+TRANSPARENT_HUGE_PAGES_PATH = 'kernel/mm/transparent_hugepage/enabled'
+NUMA_NODES_PATH = 'devices/system/node'
+NUMA_NODE_PATTERN = re.compile(r'^node\d+$')
+
+
+def read_sysfs_file(sysfs_root, path):
+    """
+    Returns stripped content of a file relative to the sysfs root or None if it can not be read.
+    """
+    try:
+        with open(os.path.join(sysfs_root, path)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
 
 
-class CMSInitiatingOccupancyFractionSetting(RangeSetting):
-    value_encoder = IntToStrValueEncoder()
-    name = 'CMSInitiatingOccupancyFraction'
-    min = 50
-    max = 95
-    step = 1
-    default = 92
+def read_cgroup_memory_limit(sysfs_root=SYSFS_ROOT):
+    """
+    Returns memory limit of the cgroup of the container, cgroup v2 is looked up first and v1 next.
+
+    :param sysfs_root: Path sysfs is mounted at
+    :return: Memory limit in bytes or None if there is none
+    """
+    for path in CGROUP_MEMORY_LIMIT_PATHS:
+        limit = read_sysfs_file(sysfs_root, path)
+        if limit is None:
+            continue
+        try:
+            limit = int(limit)
+        except ValueError:
+            # `max` in cgroup v2
+            return None
+        return limit if 0 < limit < CGROUP_UNLIMITED else None
+    return None
+
+
+def read_cgroup_cpu_limit(sysfs_root=SYSFS_ROOT):
+    """
+    Returns CPU limit of the cgroup of the container as its CPU quota over the period, cgroup v2 is looked up
+    first and v1 next.
+
+    :param sysfs_root: Path sysfs is mounted at
+    :return float: Number of CPUs or None if there is no limit
+    """
+    for quota_path, period_path in CGROUP_CPU_LIMIT_PATHS:
+        quota = read_sysfs_file(sysfs_root, quota_path)
+        if quota is None:
+            continue
+        if period_path is None:
+            # `<quota> <period>` in cgroup v2, the quota is `max` without a limit
+            quota, _, period = quota.partition(' ')
+        else:
+            period = read_sysfs_file(sysfs_root, period_path)
+        try:
+            quota, period = int(quota), int(period)
+        except (TypeError, ValueError):
+            return None
+        # -1 in cgroup v1
+        return quota / period if quota > 0 and period > 0 else None
+    return None
+
+
+def list_sysfs_dir(sysfs_root, path):
+    try:
+        return os.listdir(os.path.join(sysfs_root, path))
+    except OSError:
+        return []
+
+
+def read_host_memory(sysfs_root=SYSFS_ROOT):
+    """
+    Returns memory placement capabilities of the host: sizes of large pages with pages reserved in their pools,
+    whether transparent huge pages are enabled for the JVM (`always` or `madvise` mode) and the number
+    of NUMA nodes.
+
+    :param sysfs_root: Path sysfs is mounted at
+    :return dict: Capabilities with `large_page_sizes`, `transparent_huge_pages` and `numa_nodes` keys
+    """
+    large_page_sizes = []
+    for pool in list_sysfs_dir(sysfs_root, HUGE_PAGES_PATH):
+        match = HUGE_PAGES_POOL_PATTERN.match(pool)
+        pages = read_sysfs_file(sysfs_root, os.path.join(HUGE_PAGES_PATH, pool, 'nr_hugepages'))
+        if match and pages and pages.isdigit() and int(pages) > 0:
+            large_page_sizes.append(int(match.group(1)) * 1024)
+    # The mode in use is bracketed, ex. `always [madvise] never`
+    modes = read_sysfs_file(sysfs_root, TRANSPARENT_HUGE_PAGES_PATH) or ''
+    transparent_huge_pages = '[always]' in modes or '[madvise]' in modes
+    numa_nodes = sum(1 for node in list_sysfs_dir(sysfs_root, NUMA_NODES_PATH) if NUMA_NODE_PATTERN.match(node))
+    return {'large_page_sizes': [format_size(size) for size in sorted(large_page_sizes)],
+            'transparent_huge_pages': transparent_huge_pages,
+            'numa_nodes': numa_nodes}
+
+
+def apply_host_memory(settings_config, host_memory):
+    """
+    Leaves out memory placement settings the host can not honour and limits values of LargePageSizeInBytes
+    to the sizes of large pages reserved on it.
+
+    :param settings_config: Configs of settings by name
+    :param host_memory: Capabilities of the host as returned by `read_host_memory`
+    :return dict: Configs of the settings the host can honour
+    :raises EncoderConfigException: If configured values of LargePageSizeInBytes are not reserved on the host
+    """
+    page_sizes = [size for size in host_memory['large_page_sizes'] if size in LARGE_PAGE_SIZES]
+    unsupported = set()
+    if not page_sizes:
+        unsupported.add('LargePageSizeInBytes')
+        if not host_memory['transparent_huge_pages']:
+            unsupported.add('UseLargePages')
+    if not host_memory['transparent_huge_pages']:
+        unsupported.add('UseTransparentHugePages')
+    if host_memory['numa_nodes'] < 2:
+        unsupported.add('UseNUMA')
+    configs = {name: config for name, config in settings_config.items() if name not in unsupported}
+
+    config = configs.get('LargePageSizeInBytes')
+    if 'LargePageSizeInBytes' in configs and (config is None or isinstance(config, dict)):
+        values = (config or {}).get('values')
+        if isinstance(values, (list, tuple)):
+            unavailable = [value for value in values if value not in page_sizes]
+            if unavailable:
+                raise EncoderConfigException('Values {} of setting LargePageSizeInBytes are not reserved on the '
+                                             'host. Available: {}.'.format(', '.join(unavailable),
+                                                                           ', '.join(page_sizes)))
+        else:
+            configs['LargePageSizeInBytes'] = dict(config or {}, values=page_sizes)
+    return configs
+
+
+def get_lattice_max(setting_class, config, bound):
+    """
+    Returns the highest value on the lattice of the setting configured with the given config, which is not
+    above the bound.
+
+    :return tuple: Min of the setting and the value or None if the config has no valid min and step
+    """
+    setting_min = config.get('min', setting_class.min)
+    step = config.get('step', setting_class.step)
+    if not all(isinstance(option, (int, float)) for option in (setting_min, step)) or step <= 0:
+        return None
+    return setting_min, setting_min + math.floor((bound - setting_min) / step + LATTICE_TOLERANCE) * step
+
+
+def apply_container_memory(settings_config, memory_limit, heap_fraction, reserved):
+    """
+    Sets max of the heap size settings to the share of the memory limit of the container left for the heap,
+    which is the fraction of the limit less the reserved memory, snapped down to the lattice of the setting.
+
+    :param settings_config: Configs of settings by name
+    :param memory_limit: Memory limit of the container in GiB
+    :param heap_fraction: Share of the memory limit for the heap
+    :param reserved: Memory in GiB reserved for the rest of the JVM
+    :return tuple: Configs of settings and the derived bounds by setting name
+    :raises EncoderConfigException: If the memory left for the heap is below min of a setting
+    :raises SettingConfigException: If configured max of a setting is above the memory left for the heap
+    """
+    heap_max = memory_limit * heap_fraction - reserved
+    configs = dict(settings_config)
+    derived = {}
+    for name in CONTAINER_HEAP_SETTINGS:
+        if name not in configs or (configs[name] is not None and not isinstance(configs[name], dict)):
+            continue
+        config = dict(configs[name] or {})
+        lattice_max = get_lattice_max(get_setting_class(name), config, heap_max)
+        if lattice_max is None:
+            continue
+        setting_min, bound = lattice_max
+        if heap_max < setting_min:
+            raise EncoderConfigException('Memory limit of the container of {:g} GiB leaves {:g} GiB for the heap, '
+                                         'which is below min of setting {}.'.format(memory_limit, heap_max, q(name)))
+        if 'max' in config:
+            if isinstance(config['max'], (int, float)) and config['max'] > bound:
+                raise SettingConfigException('Max value {} of setting {} is above {:g} GiB the memory limit of '
+                                             'the container leaves for the heap.'.format(config['max'], q(name),
+                                                                                         heap_max))
+            continue
+        config['max'] = bound
+        configs[name] = config
+        derived[name] = {'max': bound, 'memory_limit': memory_limit}
+    return configs, derived
+
+
+def apply_container_cpu(settings_config, cpu_limit, threads_per_cpu):
+    """
+    Sets max of the thread count settings to the number of threads the CPU limit of the container allows,
+    rounded up to whole CPUs, snapped down to the lattice of the setting and raised to min of the setting, as the
+    JVM runs the minimal number of threads, ex. 2 compiler threads, whatever the limit.
+
+    :param settings_config: Configs of settings by name
+    :param cpu_limit: CPU limit of the container in CPUs
+    :param threads_per_cpu: Threads per CPU of the limit
+    :return tuple: Configs of settings and the derived bounds by setting name
+    :raises SettingConfigException: If configured max of a setting is above the number of threads
+    """
+    threads_max = math.ceil(cpu_limit - LATTICE_TOLERANCE) * threads_per_cpu
+    configs = dict(settings_config)
+    derived = {}
+    for name in CONTAINER_CPU_SETTINGS:
+        if name not in configs or (configs[name] is not None and not isinstance(configs[name], dict)):
+            continue
+        config = dict(configs[name] or {})
+        lattice_max = get_lattice_max(get_setting_class(name), config, threads_max)
+        if lattice_max is None:
+            continue
+        setting_min, bound = lattice_max
+        bound = max(bound, setting_min)
+        if 'max' in config:
+            if isinstance(config['max'], (int, float)) and config['max'] > bound:
+                raise SettingConfigException('Max value {} of setting {} is above {:g} threads the CPU limit of '
+                                             'the container allows.'.format(config['max'], q(name), threads_max))
+            continue
+        config['max'] = bound
+        configs[name] = config
+        derived[name] = {'max': bound, 'cpu_limit': cpu_limit}
+    return configs, derived
+
+
+def apply_flags(settings_config, flags, jdk_version=None):
+    """
+    Checks configs of settings against the flag table of a JVM and fills options missing in them: bounds
+    are narrowed to the ranges of the flags and defaults are set to values of the flags, snapped to the
+    lattice of the setting. GCType values are limited to the collectors known to the JVM and default to
+    the one it enables.
+
+    :param settings_config: Configs of settings by name
+    :param flags: Flag table as returned by `parse_flags`
+    :param jdk_version: Major version of the JDK to look the flags up under their names in
+    :return dict: Configs of settings with missing options filled
+    :raises EncoderConfigException: If a setting is not supported by the JVM
+    :raises SettingConfigException: If a setting config does not match the flag
+    """
+    configs = {}
+    for name, config in settings_config.items():
+        setting_class = get_setting_class(name)
+        if config is not None and not isinstance(config, dict):
+            configs[name] = config
+            continue
+        config = dict(config or {})
+        configs[name] = config
+
+        if issubclass(setting_class, GCTypeSetting):
+            supported = [value for value in setting_class.supported_values
+                         if setting_class.get_jdk_option_name(value, jdk_version) in flags
+                         and (value not in setting_class.value_variants
+                              or setting_class.value_variants[value][1] in flags)]
+            values = config.get('values')
+            if isinstance(values, (list, tuple)):
+                unsupported = [value for value in values if value not in supported]
+                if unsupported:
+                    raise EncoderConfigException('Values {} of setting GCType are not supported by the JVM. '
+                                                 'Supported: {}.'.format(', '.join(unsupported), ', '.join(supported)))
+            elif len(supported) < len(setting_class.supported_values):
+                config['values'] = values = supported
+            else:
+                values = supported
+            if 'default' not in config:
+                enabled = [value for value in values
+                           if all(flags.get(flag, (None, 0))[1] == state
+                                  for flag, state in setting_class.get_flag_states(value, jdk_version).items())]
+                if len(enabled) == 1:
+                    config['default'] = enabled[0]
+            continue
+
+        flag_name = setting_class.flag_name or setting_class.get_jdk_option_name(jdk_version)
+        try:
+            flag_type, value, low, high = flags[flag_name]
+        except KeyError:
+            raise EncoderConfigException('Setting {} is not supported by the JVM, flag {} was not found '
+                                         'in its flags.'.format(q(name), q(flag_name)))
+        value_encoder = setting_class.value_encoder
+        flag_kind = FLAG_TYPE_KINDS.get(flag_type)
+        # Some integer flags turned into floating point ones in later JDKs, ex. ZCollectionInterval
+        if flag_kind != value_encoder.flag_kind and (flag_kind, value_encoder.flag_kind) != ('int', 'float'):
+            raise SettingConfigException('Flag {} is of type {} in the JVM, which does not match '
+                                         'setting {}.'.format(q(flag_name), flag_type, q(name)))
+        if issubclass(setting_class, EnumSetting):
+            # Values of flags are compared in the form of values of the setting, ex. `2m` for 2097152
+            try:
+                value = value_encoder.decode(str(value))
+            except ValueError:
+                continue
+            if 'default' not in config and value in config.get('values', setting_class.values):
+                config['default'] = value
+            continue
+        unit = value_encoder.flag_unit
+        if unit != 1:
+            value, low, high = (None if flag is None else flag / unit for flag in (value, low, high))
+        step = config.get('step', setting_class.step)
+        setting_min = config.get('min', setting_class.min)
+        setting_max = config.get('max', setting_class.max)
+        if not all(isinstance(option, (int, float)) for option in (step, setting_min)) or step <= 0:
+            continue
+
+        if low is not None and setting_min < low:
+            if 'min' in config or setting_class.freeze_range:
+                raise SettingConfigException('Min value {} of setting {} is below the min value {} of the flag '
+                                             'in the JVM.'.format(setting_min, q(name), low))
+            setting_min = config['min'] = setting_min + math.ceil((low - setting_min) / step - LATTICE_TOLERANCE) * step
+        if high is not None and isinstance(setting_max, (int, float)) and setting_max > high:
+            if 'max' in config or setting_class.freeze_range:
+                raise SettingConfigException('Max value {} of setting {} is above the max value {} of the flag '
+                                             'in the JVM.'.format(setting_max, q(name), high))
+            setting_max = config['max'] = \
+                setting_min + math.floor((high - setting_min) / step + LATTICE_TOLERANCE) * step
+
+        if 'default' not in config and value is not None:
+            ordinal = max(0, round((value - setting_min) / step))
+            if isinstance(setting_max, (int, float)):
+                ordinal = min(ordinal, round((setting_max - setting_min) / step))
+            config['default'] = setting_min + ordinal * step
+    return configs
+
+
+# Components of the JVM footprint categories of `jcmd <pid> VM.native_memory summary` output count towards,
+# direct buffers are tracked under Other since JDK 11, the rest of the categories count towards other memory
+NATIVE_MEMORY_COMPONENTS = {'Java Heap': 'heap', 'Class': 'metaspace', 'Metaspace': 'metaspace', 'Thread': 'threads',
+                            'Code': 'code', 'GC': 'gc', 'Other': 'direct'}
+# Matches categories, ex. `-                 Java Heap (reserved=262144KB, committed=16384KB)`
+NATIVE_MEMORY_CATEGORY_PATTERN = re.compile(r'^-\s*(.+?) \(reserved=(\d+)([KMG]?B), committed=(\d+)([KMG]?B)\)', re.M)
+NATIVE_MEMORY_THREADS_PATTERN = re.compile(r'\(thread #(\d+)\)')
+NATIVE_MEMORY_UNITS = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+FOOTPRINT_OPTIONS = ('memory_limit', 'native_memory', 'threads')
+# Settings bounding components of the footprint
+FOOTPRINT_SETTINGS = ('MaxHeapSize', 'MaxRAMPercentage', 'MaxMetaspaceSize', 'ReservedCodeCacheSize',
+                      'MaxDirectMemorySize', 'ThreadStackSize')
+
+
+def parse_native_memory(text):
+    """
+    Parses output of `jcmd <pid> VM.native_memory summary` of a JVM running with -XX:NativeMemoryTracking=summary.
+
+    :param text: Output of jcmd
+    :return tuple: Dict of reserved and committed bytes by category and the number of threads or None
+    :raises ValueError: If no categories are found in the text
+    """
+    categories = {}
+    for match in NATIVE_MEMORY_CATEGORY_PATTERN.finditer(text):
+        name, reserved, reserved_unit, committed, committed_unit = match.groups()
+        categories[name] = (int(reserved) * NATIVE_MEMORY_UNITS[reserved_unit],
+                            int(committed) * NATIVE_MEMORY_UNITS[committed_unit])
+    if not categories:
+        raise ValueError('No memory categories found in the native memory summary.')
+    threads = NATIVE_MEMORY_THREADS_PATTERN.search(text)
+    return categories, int(threads.group(1)) if threads else None
+
+
+class FootprintModel:
+    """
+    Estimates resident memory of the JVM for values of settings in GiB as a sum of the heap, metaspace, code cache,
+    thread stacks, GC structures, direct buffers and other native memory. Components the values do not bound
+    are taken from a native memory summary of the application, if given, or from the defaults below.
+    """
+    # Defaults of the components in GiB
+    defaults = {'metaspace': .125, 'code': 240 / 1024, 'direct': 0, 'other': .125}
+    # Share of the heap JVM defaults it to and GC structures take in addition to it
+    heap_fraction = .25
+    gc_fraction = .05
+    thread_stack = 1 / 1024
+    threads = 50
+
+    def __init__(self, memory_limit, native_memory=None, threads=None):
+        """
+        :param memory_limit: Memory limit of the container in GiB
+        :param native_memory: Summary as returned by `parse_native_memory`
+        :param threads: Number of threads of the application, taken from the summary by default
+        """
+        self.memory_limit = memory_limit
+        self.components = dict(self.defaults)
+        self.heap = None
+        if native_memory is not None:
+            categories, summary_threads = native_memory
+            observed = {}
+            for name, (_, committed) in categories.items():
+                component = NATIVE_MEMORY_COMPONENTS.get(name, 'other')
+                observed[component] = observed.get(component, 0) + committed / 1024 ** 3
+            observed.pop('heap', None)
+            if 'Java Heap' in categories:
+                self.heap = categories['Java Heap'][0] / 1024 ** 3
+                if 'gc' in observed and self.heap:
+                    self.gc_fraction = observed.pop('gc') / self.heap
+            if summary_threads:
+                self.threads = summary_threads
+            self.components.update(observed)
+        if threads is not None:
+            self.threads = threads
+
+    def get_heap(self, values):
+        if 'MaxHeapSize' in values:
+            return values['MaxHeapSize']
+        if 'MaxRAMPercentage' in values:
+            return self.memory_limit * values['MaxRAMPercentage'] / 100
+        if self.heap is not None:
+            return self.heap
+        return self.memory_limit * self.heap_fraction
+
+    def estimate(self, values):
+        """
+        Returns estimated footprint of the JVM for the values of settings.
 
+        :param values: Dict of values of settings
+        :return dict: Components of the footprint and their `total` in GiB
+        """
+        heap = self.get_heap(values)
+        estimate = dict(self.components, heap=heap, gc=heap * self.gc_fraction)
+        if 'MaxMetaspaceSize' in values:
+            estimate['metaspace'] = values['MaxMetaspaceSize'] / 1024
+        if 'ReservedCodeCacheSize' in values:
+            estimate['code'] = values['ReservedCodeCacheSize'] / 1024
+        if 'MaxDirectMemorySize' in values:
+            estimate['direct'] = values['MaxDirectMemorySize'] / 1024
+        if 'ThreadStackSize' in values:
+            estimate['threads'] = self.threads * values['ThreadStackSize'] / 1024 ** 2
+        elif 'threads' not in estimate:
+            estimate['threads'] = self.threads * self.thread_stack
+        estimate['total'] = sum(estimate.values())
+        return estimate
+
+
+# Pauses with heap occupancy before and after them in JDK unified GC logs (-Xlog:gc*) with the uptime decoration,
+# ex. `[1.234s][info][gc] GC(3) Pause Young (Normal) (G1 Evacuation Pause) 24M->4M(256M) 3.456ms`
+UNIFIED_GC_PAUSE_PATTERN = re.compile(
+    rb'^\[(?:[^\]\n]*\]\[)*?(\d+\.\d+)s\][^\n]*? GC\(\d+\) Pause[^\n]*? '
+    rb'(?:(\d+)([KMG])->(\d+)([KMG])\(\d+[KMG]\) )?(\d+\.\d+)ms\r?$', re.M)
+# Pauses in legacy logs of -XX:+PrintGCDetails, ex. `1.234: [GC (Allocation Failure) [PSYoungGen:
+# 65536K->10720K(76288K)] 65536K->10744K(251392K), 0.0123456 secs]`, heap occupancy is missing for G1 pauses.
+# Records of generations nested in the pause, ex. `[ParNew: 65536K->8192K(73728K), 0.0100000 secs]`, are skipped
+# by taking the heap transition and the time the record of the pause ends with, followed by times or end of line
+LEGACY_GC_PAUSE_PATTERN = re.compile(
+    rb'(\d+\.\d+): \[(?:Full )?GC[ (][^\n]*?(?: (\d+)(K)->(\d+)(K)\(\d+K\)(?:, \[[A-Za-z ]+: [^\]\n]*\])?)?, '
+    rb'(\d+\.\d+) secs\](?= \[Times:|[ \t]*\r?$)', re.M)
+UNIFIED_GC_LOG_MARKER = re.compile(rb'\]\[gc[,\] ]')
+GC_LOG_HEAD_SIZE = 64 * 1024
+GC_SIZE_UNITS = {b'K': 1024, b'M': 1024 ** 2, b'G': 1024 ** 3}
+GC_LOG_CACHE_VERSION = 1
+# Percentiles of pause times the proposed range of MaxGCPauseMillis spans
+GC_PAUSE_RANGE_PERCENTILES = ('pause_p50', 'pause_p99')
+# Factor of the observed ratio of application to GC time the proposed range of GCTimeRatio spans either way
+GC_TIME_RATIO_RANGE_FACTOR = 2
+
+
+class PauseHistogram:
+    """
+    Histogram of pause times in logarithmic buckets of the given relative precision, which records any number
+    of pauses in constant memory and returns their percentiles within the precision.
+    """
+
+    def __init__(self, lowest=.001, highest=1e7, precision=.01):
+        self.lowest = lowest
+        self.log_base = math.log1p(precision)
+        self.counts = [0] * (self.get_bucket(highest) + 1)
+        self.total = 0
+        self.max = 0
+
+    def get_bucket(self, value):
+        if value <= self.lowest:
+            return 0
+        return int(math.log(value / self.lowest) / self.log_base) + 1
 
-class CMSScavengeBeforeRemarkSetting(BooleanSetting):
-    name = 'CMSScavengeBeforeRemark'
-    default = 0
+    def record(self, value):
+        self.counts[min(self.get_bucket(value), len(self.counts) - 1)] += 1
+        self.total += 1
+        if value > self.max:
+            self.max = value
 
+    def percentile(self, percent):
+        """
+        Returns upper bound of the bucket the percentile of recorded values falls in, capped by the highest value.
+        """
+        if not self.total:
+            return None
+        rank = max(1, math.ceil(self.total * percent / 100 - LATTICE_TOLERANCE))
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.max, self.lowest * math.exp(bucket * self.log_base))
+        return self.max
+
+
+def analyze_gc_log(data):
+    """
+    Computes statistics of pauses and allocations in a JDK unified GC log or a legacy -XX:+PrintGCDetails one
+    in a single pass in constant memory. The format is told by the first lines of the log.
+
+    :param data: Bytes-like content of the log, ex. a memory-mapped file
+    :return dict: Number of pauses, their percentiles, max and total in ms, duration of the log in seconds, share of
+                  the time spent in pauses and allocation rate in MiB/s, the last three are None if unknown
+    """
+    pattern = UNIFIED_GC_PAUSE_PATTERN if UNIFIED_GC_LOG_MARKER.search(data[:GC_LOG_HEAD_SIZE]) \
+        else LEGACY_GC_PAUSE_PATTERN
+    histogram = PauseHistogram()
+    pause_total = 0
+    first_uptime = last_uptime = None
+    allocated = 0
+    allocation_start = allocation_end = None
+    last_after = None
+    for match in pattern.finditer(data):
+        uptime, before, before_unit, after, after_unit, pause = match.groups()
+        uptime = float(uptime)
+        pause = float(pause) if pattern is UNIFIED_GC_PAUSE_PATTERN else float(pause) * 1000
+        histogram.record(pause)
+        pause_total += pause
+        if first_uptime is None:
+            first_uptime = uptime
+        last_uptime = uptime
+        if before is None:
+            continue
+        before = int(before) * GC_SIZE_UNITS[before_unit]
+        if last_after is None:
+            allocation_start = uptime
+        elif before >= last_after:
+            allocated += before - last_after
+            allocation_end = uptime
+        last_after = int(after) * GC_SIZE_UNITS[after_unit]
+
+    duration = last_uptime - first_uptime if histogram.total > 1 else None
+    stats = {'pauses': histogram.total,
+             'pause_p50': histogram.percentile(50),
+             'pause_p90': histogram.percentile(90),
+             'pause_p99': histogram.percentile(99),
+             'pause_max': histogram.max if histogram.total else None,
+             'pause_total': pause_total,
+             'duration': duration,
+             'gc_overhead': None,
+             'allocation_rate': None}
+    if duration:
+        stats['gc_overhead'] = min(1., pause_total / 1000 / duration)
+    if allocation_start is not None and allocation_end is not None and allocation_end > allocation_start:
+        stats['allocation_rate'] = allocated / 1024 ** 2 / (allocation_end - allocation_start)
+    return stats
+
+
+def load_gc_log(path, cache_dir=None):
+    """
+    Returns statistics of the GC log, which is memory-mapped rather than read into memory. If the cache directory
+    is given, statistics are cached in it keyed by the path, size and modification time of the log.
+
+    :param path: Path of the GC log
+    :param cache_dir: Directory to cache statistics in
+    :return dict: Statistics as returned by `analyze_gc_log`
+    :raises EncoderConfigException: If the log can not be read
+    """
+    import mmap
+    path = os.path.abspath(path)
+    try:
+        stat = os.stat(path)
+        cache_path = None
+        if cache_dir:
+            key = zlib.crc32(repr((GC_LOG_CACHE_VERSION, path, stat.st_mtime_ns, stat.st_size)).encode('utf-8'))
+            cache_path = os.path.join(cache_dir, 'jvm-gc-log-{:08x}.marshal'.format(key))
+            try:
+                with open(cache_path, 'rb') as f:
+                    cached = marshal.loads(f.read())
+                if isinstance(cached, dict) and cached.get('key') == (path, stat.st_mtime_ns, stat.st_size):
+                    return cached['stats']
+            except (OSError, EOFError, ValueError, TypeError):
+                pass
+        with open(path, 'rb') as f:
+            if stat.st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    stats = analyze_gc_log(data)
+            else:
+                stats = analyze_gc_log(b'')
+    except OSError as e:
+        raise EncoderConfigException('Unable to read GC log {} in jvm encoder: {}'.format(q(path), str(e)))
+    if cache_path is not None:
+        write_file_atomic(cache_path, marshal.dumps({'key': (path, stat.st_mtime_ns, stat.st_size), 'stats': stats}))
+    return stats
+
+
+def get_lattice_range(setting_class, config, low, high):
+    """
+    Returns the range on the lattice of the setting configured with the given config spanning the values from low
+    to high, within the bounds of the setting. Bounds configured explicitly are kept.
+
+    :return tuple: Min and max of the range or None if it is empty or the config has no valid bounds
+    """
+    setting_min = config.get('min', setting_class.min)
+    setting_max = config.get('max', setting_class.max)
+    step = config.get('step', setting_class.step)
+    if not all(isinstance(option, (int, float)) for option in (setting_min, setting_max, step)) or step <= 0:
+        return None
+    if 'min' not in config:
+        # Anchored on a configured max, so that the step still fits the range
+        if 'max' in config:
+            ordinal = math.ceil((setting_max - max(low, setting_min)) / step - LATTICE_TOLERANCE)
+            ordinal = min(ordinal, math.floor((setting_max - setting_min) / step + LATTICE_TOLERANCE))
+            setting_min = setting_max - ordinal * step
+        else:
+            ordinal = math.floor((max(low, setting_min) - setting_min) / step + LATTICE_TOLERANCE)
+            setting_min = min(setting_min + ordinal * step, setting_max)
+    if 'max' not in config:
+        ordinal = math.ceil((min(high, setting_max) - setting_min) / step - LATTICE_TOLERANCE)
+        setting_max = min(setting_min + max(ordinal, 1) * step, setting_max)
+    if setting_min >= setting_max:
+        return None
+    return setting_min, setting_max
+
+
+def apply_gc_log(settings_config, stats):
+    """
+    Narrows bounds of MaxGCPauseMillis and GCTimeRatio, which are not configured explicitly, to the pause times
+    and the time spent in GC observed in the log: MaxGCPauseMillis to the range from median to 99th percentile
+    pause and GCTimeRatio to the observed ratio of application to GC time scaled down and up by a factor.
+
+    :param settings_config: Configs of settings by name
+    :param stats: Statistics of the GC log as returned by `analyze_gc_log`
+    :return tuple: Configs of settings and the derived bounds by setting name
+    """
+    proposals = {}
+    if stats['pauses']:
+        proposals['MaxGCPauseMillis'] = (tuple(stats[name] for name in GC_PAUSE_RANGE_PERCENTILES),
+                                         {name: stats[name] for name in GC_PAUSE_RANGE_PERCENTILES})
+    if stats['gc_overhead']:
+        ratio = (1 - stats['gc_overhead']) / stats['gc_overhead']
+        proposals['GCTimeRatio'] = ((ratio / GC_TIME_RATIO_RANGE_FACTOR, ratio * GC_TIME_RATIO_RANGE_FACTOR),
+                                    {'gc_overhead': stats['gc_overhead']})
+    configs = dict(settings_config)
+    derived = {}
+    for name, ((low, high), observed) in proposals.items():
+        if name not in configs or (configs[name] is not None and not isinstance(configs[name], dict)):
+            continue
+        config = dict(configs[name] or {})
+        if 'min' in config and 'max' in config:
+            continue
+        bounds = get_lattice_range(get_setting_class(name), config, low, high)
+        if bounds is None:
+            continue
+        derived[name] = dict(observed, allocation_rate=stats['allocation_rate'])
+        for option, bound in zip(('min', 'max'), bounds):
+            if option not in config:
+                config[option] = derived[name][option] = bound
+        configs[name] = config
+    return configs, derived
+
+
+# Encoders are created anew on every call of servo, so results are cached on the module level and
+# keyed by the encoder config along with the values or the command line
+result_cache = LRUCache()
+_missing = object()
 
-class ScavengeBeforeFullGCSetting(BooleanSetting):
-    name = 'ScavengeBeforeFullGC'
-    default = 0
 
+class Encoder(BaseEncoder):
 
-class AlwaysPreTouchSetting(BooleanSetting):
-    name = 'AlwaysPreTouch'
-    default = 0
+    def __init__(self, config):
+        super().__init__(config)
 
+        cache_size = self.config.get('cache_size')
+        if cache_size is not None:
+            if not isinstance(cache_size, int) or isinstance(cache_size, bool) or cache_size < 0:
+                raise EncoderConfigException('Option "cache_size" in jvm encoder must be a non-negative integer. '
+                                             'Found {}.'.format(q(cache_size)))
+            # The cache is shared by all encoders, so it only grows to the largest size configured
+            if cache_size > result_cache.maxsize:
+                result_cache.resize(cache_size)
+        self.cache_enabled = bool(cache_size)
+        self._fingerprint = None
+        self.codegen = bool(self.config.get('codegen'))
+        self._codecs = None
+
+        self.constraints_mode = self.config.get('constraints', 'reject')
+        if self.constraints_mode not in CONSTRAINT_MODES:
+            raise EncoderConfigException('Option "constraints" in jvm encoder must be one of: {}. '
+                                         'Found {}.'.format(', '.join(CONSTRAINT_MODES), q(self.constraints_mode)))
 
-class ExplicitGCInvokesConcurrentSetting(BooleanSetting):
-    name = 'ExplicitGCInvokesConcurrent'
-    default = 0
+        requested_settings = self.config.get('settings') or {}
+        jdk_version = self.config.get('jdk_version')
+        self.jdk_version = None if jdk_version is None else parse_jdk_version(jdk_version)
+        if self.jdk_version is not None:
+            available_settings = apply_jdk_version(requested_settings, self.jdk_version)
+            self.unavailable_settings = frozenset(requested_settings.keys() - available_settings.keys())
+            requested_settings = available_settings
+        else:
+            self.unavailable_settings = frozenset()
+        self.sysfs_root = self.config.get('sysfs_root', SYSFS_ROOT)
+        if not isinstance(self.sysfs_root, str):
+            raise EncoderConfigException('Option "sysfs_root" in jvm encoder must be a path. '
+                                         'Found {}.'.format(q(self.sysfs_root)))
+        self.derived_bounds = {}
+        container_memory = self.get_options('container_memory', CONTAINER_MEMORY_DEFAULTS)
+        if container_memory is not None:
+            memory_limit = read_cgroup_memory_limit(self.sysfs_root)
+            if memory_limit is not None:
+                requested_settings, derived = apply_container_memory(
+                    requested_settings, memory_limit / 1024 ** 3, **container_memory)
+                self.derived_bounds.update(derived)
+        container_cpu = self.get_options('container_cpu', CONTAINER_CPU_DEFAULTS)
+        if container_cpu is not None:
+            cpu_limit = read_cgroup_cpu_limit(self.sysfs_root)
+            if cpu_limit is not None:
+                requested_settings, derived = apply_container_cpu(requested_settings, cpu_limit, **container_cpu)
+                self.derived_bounds.update(derived)
+
+        host_memory = self.config.get('host_memory', False)
+        if not isinstance(host_memory, bool):
+            raise EncoderConfigException('Option "host_memory" in jvm encoder must be a boolean. '
+                                         'Found {}.'.format(q(host_memory)))
+        if host_memory:
+            supported_settings = apply_host_memory(requested_settings, read_host_memory(self.sysfs_root))
+            self.unavailable_settings |= requested_settings.keys() - supported_settings.keys()
+            requested_settings = supported_settings
+
+        self.footprint_model = self.get_footprint_model()
+
+        gc_log = self.config.get('gc_log')
+        if gc_log is not None:
+            if not isinstance(gc_log, str):
+                raise EncoderConfigException('Option "gc_log" in jvm encoder must be a path. '
+                                             'Found {}.'.format(q(gc_log)))
+            requested_settings, derived = apply_gc_log(
+                requested_settings, load_gc_log(gc_log, self.config.get('gc_log_cache_dir')))
+            self.derived_bounds.update(derived)
+
+        flags_file = self.config.get('flags_file')
+        if flags_file:
+            if not isinstance(flags_file, (str, list)) or not all(isinstance(path, str) for path in flags_file):
+                raise EncoderConfigException('Option "flags_file" in jvm encoder must be a path or a list of paths. '
+                                             'Found {}.'.format(q(flags_file)))
+            flags = load_flags(flags_file, self.config.get('flags_cache_dir'))
+            requested_settings = apply_flags(requested_settings, flags, self.jdk_version)
+        if self.jdk_version is not None:
+            requested_settings = apply_jdk_defaults(requested_settings, self.jdk_version)
+        snapshot_dir = self.config.get('snapshot_dir')
+        settings = None
+        if snapshot_dir:
+            snapshot_path = get_snapshot_path(snapshot_dir, requested_settings)
+            settings = load_settings_snapshot(snapshot_path, requested_settings)
+        if settings is None:
+            settings = {name: get_setting_class(name)(setting) for name, setting in requested_settings.items()}
+            if snapshot_dir:
+                save_settings_snapshot(snapshot_path, requested_settings, settings)
+        if self.jdk_version is not None:
+            for setting in settings.values():
+                setting.jdk_version = self.jdk_version
+        if 'GCType' in settings and 'UnlockExperimentalVMOptions' in settings:
+            # The JVM reads options in order, so the unlock has to precede the collector it unlocks in every
+            # encoded command line, all of which follow the order of settings
+            names = [name for name in settings if name != 'UnlockExperimentalVMOptions']
+            names.insert(names.index('GCType'), 'UnlockExperimentalVMOptions')
+            settings = {name: settings[name] for name in names}
+        self.settings = settings
+
+        self.heap_percentage_settings = {}
+        for name, absolute_name in HEAP_PERCENTAGE_SETTINGS.items():
+            if name in settings and absolute_name in settings:
+                raise EncoderConfigException('Settings {} and {} are mutually exclusive in jvm encoder, as heap '
+                                             'size set with the latter overrides the former.'.format(q(name),
+                                                                                                     q(absolute_name)))
+            if name in settings or absolute_name in settings:
+                self.heap_percentage_settings[name] = absolute_name
+
+        conditional = self.config.get('conditional', True)
+        if not isinstance(conditional, bool):
+            raise EncoderConfigException('Option "conditional" in jvm encoder must be a boolean. '
+                                         'Found {}.'.format(q(conditional)))
+        self.conditional_settings = self.get_conditional_settings() if conditional else {}
+        self._inactive_settings = {}
+
+        # Results depend on the settings as resolved against the JDK, the container, the host, the GC log and the
+        # flags of the JVM rather than on the raw config, so cached results are keyed by them
+        self._cache_scope = {'settings': requested_settings, 'unavailable': sorted(self.unavailable_settings),
+                             'jdk_version': self.jdk_version, 'before': self.config.get('before', []),
+                             'after': self.config.get('after', []), 'constraints': self.constraints_mode,
+                             'conditional': conditional,
+                             'footprint': vars(self.footprint_model) if self.footprint_model else None}
+
+        # Experimental collectors turn the flag on themselves, unless it is a setting of its own
+        gc_setting = self.settings.get('GCType')
+        self.experimental_gcs = ()
+        if gc_setting is not None and 'UnlockExperimentalVMOptions' in self.settings:
+            gc_setting.unlock_experimental = False
+            if self.constraints_mode != 'off':
+                self.experimental_gcs = tuple(value for value in gc_setting.values if gc_setting.requires_unlock(value))
+
+    def get_options(self, name, defaults):
+        """
+        Returns options of an optional feature of the encoder, which is turned on with `true` or a dict
+        overriding the numeric defaults.
 
+        :param name: Name of the option in the encoder config
+        :param defaults: Default options of the feature
+        :return dict: Options or None if the feature is off
+        :raises EncoderConfigException: If the option is malformed
+        """
+        options = self.config.get(name)
+        if not options:
+            return None
+        if options is True:
+            return dict(defaults)
+        if not isinstance(options, dict) or not options.keys() <= defaults.keys():
+            raise EncoderConfigException('Option {} in jvm encoder must be true or a dict of any of: {}. '
+                                         'Found {}.'.format(q(name), ', '.join(sorted(defaults)), q(options)))
+        for key, value in options.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                raise EncoderConfigException('Option {} of {} in jvm encoder must be a non-negative number. '
+                                             'Found {}.'.format(q(key), q(name), q(value)))
+        return dict(defaults, **options)
+
+    def get_footprint_model(self):
+        """
+        Returns footprint model of the JVM configured with the `footprint` option, which is turned on with `true`
+        or a dict of the options of the model.
 
-class ParallelRefProcEnabledSetting(BooleanSetting):
-    name = 'ParallelRefProcEnabled'
-    default = 0
+        :return: FootprintModel or None if the option is off
+        :raises EncoderConfigException: If the option is malformed or there is no memory limit
+        """
+        options = self.config.get('footprint')
+        if not options:
+            return None
+        if options is True:
+            options = {}
+        if not isinstance(options, dict) or not options.keys() <= set(FOOTPRINT_OPTIONS):
+            raise EncoderConfigException('Option "footprint" in jvm encoder must be true or a dict of any of: {}. '
+                                         'Found {}.'.format(', '.join(FOOTPRINT_OPTIONS), q(options)))
+        for key in ('memory_limit', 'threads'):
+            value = options.get(key)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0):
+                raise EncoderConfigException('Option {} of "footprint" in jvm encoder must be a positive number. '
+                                             'Found {}.'.format(q(key), q(value)))
+        memory_limit = options.get('memory_limit')
+        if memory_limit is None:
+            memory_limit = read_cgroup_memory_limit(self.sysfs_root)
+            if memory_limit is None:
+                raise EncoderConfigException('Option "footprint" in jvm encoder requires a memory limit, either '
+                                             'configured as "memory_limit" or of the container.')
+            memory_limit /= 1024 ** 3
+        native_memory = None
+        path = options.get('native_memory')
+        if path is not None:
+            try:
+                with open(path) as f:
+                    native_memory = parse_native_memory(f.read())
+            except (OSError, ValueError, TypeError) as e:
+                raise EncoderConfigException('Unable to read native memory summary from {} in jvm encoder: '
+                                             '{}'.format(q(path), str(e)))
+        return FootprintModel(memory_limit, native_memory, options.get('threads'))
+
+    def check_footprint(self, values):
+        """
+        Rejects values, for which the estimated footprint of the JVM exceeds the memory limit.
 
+        :raises EncoderRuntimeException: If the footprint exceeds the limit
+        """
+        # Values of wrong types are left to the settings to reject
+        estimate = self.footprint_model.estimate({name: value for name, value in values.items()
+                                                  if isinstance(value, (int, float)) and not isinstance(value, bool)})
+        if estimate['total'] > self.footprint_model.memory_limit:
+            raise EncoderRuntimeException('Estimated footprint of the JVM of {:.3f} GiB, of which {:.3f} GiB is '
+                                          'heap, exceeds the memory limit of {:g} GiB.'.format(
+                                              estimate['total'], estimate['heap'], self.footprint_model.memory_limit))
 
-class UseStringDeduplicationSetting(BooleanSetting):
-    name = 'UseStringDeduplication'
-    default = 0
+    def describe(self):
+        settings = []
+        for setting in self.settings.values():
+            settings.append(setting.describe())
+        described = dict(settings)
+        for name, operator, bound_name in self.get_constraints():
+            described[name].setdefault('constraints', []).append({'operator': operator, 'setting': bound_name})
+        for name, gc_types in self.conditional_settings.items():
+            described[name]['parent'] = 'GCType'
+            described[name]['active_when'] = list(gc_types)
+        for name, derived in self.derived_bounds.items():
+            if name in described:
+                described[name]['derived'] = dict(derived)
+        return described
+
+    def get_conditional_settings(self):
+        """
+        Returns settings, which have effect only with some of the configured values of GCType.
 
+        :return dict: Values of GCType the setting is active with by setting name
+        :raises EncoderConfigException: If a setting has effect with none of the configured values of GCType
+        """
+        gc_setting = self.settings.get('GCType')
+        if gc_setting is None:
+            return {}
+        conditional = {}
+        for name, setting in self.settings.items():
+            gc_types = getattr(setting, 'gc_types', None)
+            if not gc_types:
+                continue
+            active = tuple(value for value in gc_setting.values if value in gc_types)
+            if not active:
+                raise EncoderConfigException('Setting {} has effect with none of the configured values of GCType. '
+                                             'Supported: {}.'.format(q(name), ', '.join(gc_types)))
+            if len(active) < len(gc_setting.values):
+                conditional[name] = active
+        return conditional
+
+    def get_inactive_settings(self, gc_type):
+        """
+        Returns names of the settings, which have no effect with the given value of GCType and are not encoded.
+        """
+        if not self.conditional_settings:
+            return frozenset()
+        try:
+            return self._inactive_settings[gc_type]
+        except (KeyError, TypeError):
+            pass
+        inactive = frozenset(name for name, active in self.conditional_settings.items() if gc_type not in active)
+        if gc_type in self.settings['GCType'].values:
+            self._inactive_settings[gc_type] = inactive
+        return inactive
+
+    def drop_unavailable(self, values):
+        """
+        Leaves out values of the configured settings, which are not available in the targeted JDK version.
+        """
+        if not self.unavailable_settings.intersection(values):
+            return values
+        return {name: value for name, value in values.items() if name not in self.unavailable_settings}
 
-class UnlockExperimentalVMOptionsSetting(BooleanSetting):
-    name = 'UnlockExperimentalVMOptions'
-    default = 0
+    def find_options(self, name, index):
+        """
+        Returns options of a supported setting in the indexed command line, whether it is configured or not.
+        """
+        keys, pattern = get_option_matcher(name, self.jdk_version)
+        return [option for option in index.lookup(keys) if pattern.match(option)]
 
+    def check_heap_percentages(self, index):
+        """
+        Checks that heap sizes set as a percentage of the available memory, either in the command line or
+        by a configured setting, are not overridden by absolute heap sizes in the command line.
 
-class UseCGroupMemoryLimitForHeapSetting(BooleanSetting):
-    name = 'UseCGroupMemoryLimitForHeap'
-    default = 0
+        :param index: OptionIndex of the command line
+        :raises SettingRuntimeException: If both forms of a heap size are found
+        """
+        for name, absolute_name in self.heap_percentage_settings.items():
+            absolute_options = self.find_options(absolute_name, index)
+            if absolute_options and (name in self.settings or self.find_options(name, index)):
+                raise SettingRuntimeException('Heap size is set with option {} in the input data, which overrides '
+                                              '{}.'.format(q(absolute_options[0]), q(name)))
 
+    def get_constraints(self):
+        """
+        Returns constraints between configured settings, which are enforced on encode.
+        """
+        if self.constraints_mode == 'off':
+            return []
+        return [constraint for constraint in SETTING_CONSTRAINTS
+                if constraint[0] in self.settings and constraint[2] in self.settings]
 
-class Encoder(BaseEncoder):
+    def apply_constraints(self, values):
+        """
+        Checks values against constraints between settings. Violating values are either rejected or repaired
+        by moving them to the highest value on the lattice of the setting satisfying the constraint.
 
-    def __init__(self, config):
-        super().__init__(config)
-        self.settings = {}
+        :param values: Dict of values to encode
+        :return dict: Values to encode, a copy if any of them was repaired
+        """
+        for name, operator, bound_name in self.get_constraints():
+            value, bound = values.get(name), values.get(bound_name)
+            if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (value, bound)):
+                continue
+            if value < bound or (operator == '<=' and value == bound):
+                continue
+            setting = self.settings[name]
+            ordinal = get_max_ordinal(setting, bound, operator)
+            if self.constraints_mode == 'reject' or ordinal < 0:
+                raise EncoderRuntimeException('Value {} of setting {} violates constraint {} {} {}, '
+                                              'value of which is {}.'.format(value, q(name), name, operator,
+                                                                             bound_name, bound))
+            values = dict(values)
+            values[name] = setting.get_lattice_value(int(ordinal))
+
+        gc_type = values.get('GCType')
+        if gc_type in self.experimental_gcs and values.get('UnlockExperimentalVMOptions') == 0:
+            if self.constraints_mode == 'reject':
+                raise EncoderRuntimeException('Collector {} is experimental in the JDK and requires setting '
+                                              'UnlockExperimentalVMOptions to be on.'.format(q(gc_type)))
+            values = dict(values, UnlockExperimentalVMOptions=1)
+        return values
+
+    def apply_patch_constraints(self, values, args, index):
+        """
+        Checks values to patch a command line with against constraints between settings and the footprint of the JVM,
+        taking values of the other settings from the command line.
 
-        requested_settings = self.config.get('settings') or {}
-        for name, setting in requested_settings.items():
+        :param values: Dict of values to patch the command line with
+        :param args: Arguments of the command line
+        :param index: OptionIndex of the options of the command line
+        :return dict: Values to patch the command line with, including those of the other settings repaired
+        """
+        related = [(name, bound_name) for name, _, bound_name in self.get_constraints()]
+        if self.experimental_gcs:
+            related.append(('GCType', 'UnlockExperimentalVMOptions'))
+        names = {name for names in related if any(name in values for name in names) for name in names}
+        existing = self.get_existing_values(names - values.keys(), args, index)
+        checked = self.apply_constraints(dict(existing, **values))
+        if self.footprint_model is not None:
+            footprint_names = {name for name in FOOTPRINT_SETTINGS if name in self.settings} - checked.keys()
+            self.check_footprint(dict(self.get_existing_values(footprint_names, args, index), **checked))
+        return {name: value for name, value in checked.items()
+                if name in values or value != existing[name]}
+
+    def get_existing_values(self, names, args, index):
+        """
+        Returns values of the given settings decoded from a command line, leaving out those it lacks or the settings
+        do not accept, which can not be checked against.
+        """
+        existing = {}
+        for name in names:
             try:
-                setting_class = globals()['{}Setting'.format(name)]
-            except KeyError:
-                raise EncoderConfigException('Setting "{}" is not supported in java-opts encoder.'.format(name))
-            self.settings[name] = setting_class(setting)
+                existing[name] = self.settings[name].decode_option(args, index)
+            except SettingRuntimeException:
+                continue
+        return existing
 
-    def describe(self):
-        settings = []
-        for setting in self.settings.values():
-            settings.append(setting.describe())
-        return dict(settings)
+    def get_codecs(self):
+        """
+        Returns encode and decode functions generated for the config of the encoder and their source.
+        """
+        if self._codecs is None:
+            self._codecs = compile_codecs(self.settings, self.config.get('before', []),
+                                          self.config.get('after', []), self.conditional_settings)
+        return self._codecs
+
+    @property
+    def generated_source(self):
+        return self.get_codecs()[2]
 
     def _encode_multi(self, values):
+        if self.codegen:
+            return self.get_codecs()[0](values)
+
         encoded = []
         values_to_encode = values.copy()
 
         encoded.extend(self.config.get('before', []))
 
+        inactive = self.get_inactive_settings(values.get('GCType'))
         for name, setting in self.settings.items():
-            encoded.extend(setting.encode_option(values_to_encode.pop(name, None)))
+            value = values_to_encode.pop(name, None)
+            if name not in inactive:
+                encoded.extend(setting.encode_option(value))
 
         encoded.extend(self.config.get('after', []))
 
@@ -462,22 +2685,352 @@ class Encoder(BaseEncoder):
 
         return encoded
 
-    def encode_multi(self, values, expected_type=None):
-        encoded = self._encode_multi(values)
+    @staticmethod
+    def _get_output_formatter(expected_type):
         expected_type = str if expected_type is None else expected_type
         if expected_type in ('str', str):
-            return ' '.join(encoded)
+            return quote_args
         if expected_type in ('list', list):
-            return encoded
+            return None
         raise EncoderConfigException('Unrecognized expected_type passed on encode in jvm encoder: {}. '
                                      'Supported: "list", "str"'.format(q(expected_type)))
 
+    def get_cache_key(self, operation, *args):
+        if self._fingerprint is None:
+            self._fingerprint = config_fingerprint(self._cache_scope)
+        return (operation, self._fingerprint) + args
+
+    def cache_stats(self):
+        return result_cache.stats()
+
+    def encode_multi(self, values, expected_type=None):
+        formatter = self._get_output_formatter(expected_type)
+        values = self.drop_unavailable(values)
+        key = None
+        if self.cache_enabled:
+            try:
+                # Values equal across types, ex. True, 1 and 1.0, are told apart, as settings accept some of them only
+                key = self.get_cache_key('encode', formatter is None,
+                                         tuple(sorted((name, type(value), value) for name, value in values.items())))
+                hash(key)
+            except TypeError:
+                key = None
+            else:
+                cached = result_cache.get(key, _missing)
+                if cached is not _missing:
+                    return list(cached) if formatter is None else cached
+
+        values = self.apply_constraints(values)
+        if self.footprint_model is not None:
+            self.check_footprint(values)
+        encoded = self._encode_multi(values)
+        encoded = formatter(encoded) if formatter else encoded
+        if key is not None:
+            result_cache.put(key, tuple(encoded) if formatter is None else encoded)
+        return encoded
+
+    @staticmethod
+    def _get_batch_rows(batch):
+        if not isinstance(batch, dict):
+            return batch
+        sizes = {len(column) for column in batch.values()}
+        if len(sizes) > 1:
+            raise EncoderRuntimeException('All the columns of the batch to encode must be of the same length. '
+                                          'Found lengths: {}'.format(', '.join(map(str, sorted(sizes)))))
+        names = list(batch.keys())
+        return (dict(zip(names, row)) for row in zip(*batch.values()))
+
+    def encode_batch(self, batch, expected_type=None):
+        """
+        Encodes many sets of values at once. Configuration and output type are resolved once per batch and
+        every distinct value of a setting is validated and encoded only once.
+
+        :param batch: List of dicts of values to encode or a dict of lists of values (columns) per setting
+        :param expected_type: Type of each of the encoded items: "list" or "str"
+        :return list: Encoded items in the order of the batch
+        """
+        formatter = self._get_output_formatter(expected_type)
+        before = list(self.config.get('before', []))
+        after = list(self.config.get('after', []))
+        names = set(self.settings)
+        settings = [(name, setting, {}) for name, setting in self.settings.items()]
+
+        encoded_batch = []
+        for values in self._get_batch_rows(batch):
+            values = self.drop_unavailable(values)
+            unsupported = values.keys() - names
+            if unsupported:
+                raise EncoderRuntimeException('We received settings to encode we do not support: {}'
+                                              ''.format(', '.join(unsupported)))
+            values = self.apply_constraints(values)
+            if self.footprint_model is not None:
+                self.check_footprint(values)
+            inactive = self.get_inactive_settings(values.get('GCType'))
+            encoded = before[:]
+            for name, setting, encoded_values in settings:
+                if name in inactive:
+                    continue
+                value = values.get(name)
+                key = (type(value), value)
+                try:
+                    encoded_value = encoded_values[key]
+                except KeyError:
+                    encoded_value = encoded_values[key] = setting.encode_option(value)
+                except TypeError:
+                    encoded_value = setting.encode_option(value)
+                encoded.extend(encoded_value)
+            encoded.extend(after)
+            encoded_batch.append(formatter(encoded) if formatter else encoded)
+
+        return encoded_batch
+
+    def encode_patch(self, existing, values, expected_type=None):
+        """
+        Rewrites options of the given settings in an existing command line in place. Options of settings
+        missing in the command line are inserted before the main class, options of settings having no effect
+        with the new GCType are removed, all the other arguments are kept untouched. When the command line
+        is a string, the text outside of rewritten options is kept byte-identical.
+
+        :param existing: Existing command line as a list of arguments or a string
+        :param values: Dict of values of the settings to rewrite
+        :param expected_type: "list" or "str", defaults to the type of the existing command line
+        :return: Patched command line
+        """
+        values = self.drop_unavailable(values)
+        unsupported = values.keys() - self.settings.keys()
+        if unsupported:
+            raise EncoderRuntimeException('We received settings to encode we do not support: {}'
+                                          ''.format(', '.join(unsupported)))
+        source = existing if isinstance(existing, str) else None
+        if source is not None:
+            try:
+                matches = list(_iter_arg_matches(source))
+            except ValueError as e:
+                raise EncoderRuntimeException('Unable to split command line into arguments '
+                                              'in jvm encoder: {}'.format(str(e)))
+            args = [unquote_arg(match.group(1)) for match in matches]
+            spans = [match.span() for match in matches]
+        else:
+            args = list(existing)
+        if expected_type is None:
+            expected_type = str if source is not None else list
+        formatter = self._get_output_formatter(expected_type)
+
+        boundary = find_main_class_position(args)
+        index = OptionIndex(args[:boundary])
+        values = self.apply_patch_constraints(values, args, index)
+        replacements = {}
+        inserts = []
+        leading = {}
+        inactive = self.get_inactive_settings(values['GCType']) if 'GCType' in values else frozenset()
+        for name, setting in self.settings.items():
+            if name in inactive:
+                # Options having no effect with the new collector are dropped
+                for position in setting.get_option_positions(args, index):
+                    replacements[position] = []
+                continue
+            if name not in values:
+                continue
+            positions = setting.get_option_positions(args, index)
+            if name == 'UnlockExperimentalVMOptions' and 'GCType' in self.settings:
+                gc_positions = self.settings['GCType'].get_option_positions(args, index)
+                if gc_positions and (not positions or positions[0] > gc_positions[0]):
+                    # The unlock has to precede the collector, so it is moved right before it
+                    leading[gc_positions[0]] = setting.encode_option(values[name])
+                    for position in positions:
+                        replacements[position] = []
+                    continue
+            if not positions:
+                inserts.extend(setting.encode_option(values[name]))
+                continue
+            replacements[positions[0]] = setting.encode_option_as(values[name], args[positions[0]])
+            for position in positions[1:]:
+                replacements[position] = []
+        for name, absolute_name in self.heap_percentage_settings.items():
+            if name in values:
+                # Absolute heap sizes would override the percentage
+                keys, pattern = get_option_matcher(absolute_name, self.jdk_version)
+                for position in index.lookup_positions(keys):
+                    if pattern.match(args[position]):
+                        replacements[position] = []
+        for position, encoded in leading.items():
+            replacements[position] = encoded + replacements.get(position, [args[position]])
+
+        if source is None or formatter is None:
+            patched = []
+            for position, arg in enumerate(args):
+                if position == boundary:
+                    patched.extend(inserts)
+                patched.extend(replacements.get(position, (arg,)))
+            if boundary == len(args):
+                patched.extend(inserts)
+            return formatter(patched) if formatter else patched
+
+        pieces = []
+        cursor = 0
+        kept = False
+        for position, (start, end) in enumerate(spans):
+            if position == boundary and inserts:
+                pieces.extend((source[cursor:start], quote_args(inserts), ' '))
+                cursor = start
+                kept = True
+            replacement = replacements.get(position)
+            if replacement is None:
+                kept = True
+                continue
+            if replacement:
+                pieces.extend((source[cursor:start], quote_args(replacement)))
+                kept = True
+            elif kept:
+                # Removed options take the blanks preceding them along
+                pieces.append(source[cursor:max(cursor, spans[position - 1][1])])
+            else:
+                # or the blanks following them, when no argument precedes them
+                pieces.append(source[cursor:start])
+                cursor = spans[position + 1][0] if position + 1 < len(spans) else end
+                continue
+            cursor = end
+        if boundary == len(spans) and inserts:
+            last_end = spans[-1][1] if spans else 0
+            pieces.extend((source[cursor:last_end], ' ' if spans else '', quote_args(inserts)))
+            cursor = last_end
+        pieces.append(source[cursor:])
+        return ''.join(pieces)
+
+    def get_lattice(self):
+        """
+        Returns sizes of lattices of the configured settings in the order of columns expected by `encode_ordinals`.
+
+        :return dict: Lattice size per setting name
+        """
+        return {name: setting.get_lattice_size() for name, setting in self.settings.items()}
+
+    def encode_ordinals(self, ordinals, expected_type=None, normalized=False):
+        """
+        Encodes all rows of a 2-D array of lattice ordinals at once. Columns follow the order of settings
+        in `get_lattice`.
+
+        :param ordinals: 2-D array-like of integer ordinals, or of coordinates in the range [0, 1] if normalized
+        :param expected_type: Type of each of the encoded items: "list" or "str"
+        :param normalized: Whether coordinates are to be snapped to the nearest lattice ordinals
+        :return list: Encoded items, one per row
+        """
+        np = import_numpy()
+        formatter = self._get_output_formatter(expected_type)
+        ordinals = np.asarray(ordinals)
+        if ordinals.ndim != 2 or ordinals.shape[1] != len(self.settings):
+            raise EncoderRuntimeException('Expected 2-D array of ordinals with {} columns on encode in jvm '
+                                          'encoder. Got shape {}.'.format(len(self.settings), ordinals.shape))
+
+        columns = {}
+        for column_idx, (name, setting) in enumerate(self.settings.items()):
+            column = ordinals[:, column_idx]
+            size = setting.get_lattice_size()
+            if normalized:
+                if column.size and (np.min(column) < 0 or np.max(column) > 1):
+                    raise SettingRuntimeException('Normalized coordinates for setting {} must be within '
+                                                  'the range 0 to 1.'.format(q(name)))
+                column = np.rint(column * (size - 1)).astype(np.int64)
+            else:
+                if not np.issubdtype(column.dtype, np.integer):
+                    if not np.array_equal(column, np.rint(column)):
+                        raise SettingRuntimeException('Ordinals for setting {} must be integers.'.format(q(name)))
+                    column = column.astype(np.int64)
+                if column.size and (np.min(column) < 0 or np.max(column) >= size):
+                    raise SettingRuntimeException('Ordinals for setting {} must be within the range '
+                                                  '0 to {}.'.format(q(name), size - 1))
+            columns[name] = column
+
+        for name, operator, bound_name in self.get_constraints():
+            bound_setting = self.settings[bound_name]
+            bounds = bound_setting.min + columns[bound_name] * bound_setting.step
+            max_ordinals = get_max_ordinal(self.settings[name], bounds, operator)
+            violations = columns[name] > max_ordinals
+            if not np.any(violations):
+                continue
+            if self.constraints_mode == 'reject' or np.any(max_ordinals[violations] < 0):
+                row_idx = int(np.flatnonzero(violations)[0])
+                raise EncoderRuntimeException('Ordinals in row {} violate constraint {} {} {}.'.format(
+                    row_idx, name, operator, bound_name))
+            columns[name] = np.where(violations, max_ordinals, columns[name]).astype(np.int64)
+
+        if self.experimental_gcs:
+            gc_setting = self.settings['GCType']
+            experimental_ordinals = [gc_setting.get_lattice_ordinal(value) for value in self.experimental_gcs]
+            unlock = columns['UnlockExperimentalVMOptions']
+            violations = np.isin(columns['GCType'], experimental_ordinals) & (unlock == 0)
+            if np.any(violations):
+                if self.constraints_mode == 'reject':
+                    row_idx = int(np.flatnonzero(violations)[0])
+                    raise EncoderRuntimeException('Ordinals in row {} select an experimental collector without '
+                                                  'setting UnlockExperimentalVMOptions.'.format(row_idx))
+                columns['UnlockExperimentalVMOptions'] = np.where(violations, 1, unlock)
+
+        if self.footprint_model is not None:
+            # Footprint settings are ranges, so their values are computed for whole columns at once
+            footprint_values = {name: self.settings[name].min + columns[name] * self.settings[name].step
+                                for name in FOOTPRINT_SETTINGS if name in self.settings}
+            estimate = self.footprint_model.estimate(footprint_values)
+            violations = np.broadcast_to(estimate['total'] > self.footprint_model.memory_limit, ordinals.shape[:1])
+            if np.any(violations):
+                row_idx = int(np.flatnonzero(violations)[0])
+                raise EncoderRuntimeException('Estimated footprint of the JVM of {:.3f} GiB in row {} exceeds the '
+                                              'memory limit of {:g} GiB.'.format(
+                                                  float(np.broadcast_to(estimate['total'], violations.shape)[row_idx]),
+                                                  row_idx, self.footprint_model.memory_limit))
+
+        rows = [list(self.config.get('before', [])) for _ in range(ordinals.shape[0])]
+        for name, setting in self.settings.items():
+            encoded_column = setting.encode_ordinals(columns[name])
+            if name in self.conditional_settings:
+                gc_setting = self.settings['GCType']
+                active_ordinals = [gc_setting.get_lattice_ordinal(gc) for gc in self.conditional_settings[name]]
+                active_rows = np.isin(columns['GCType'], active_ordinals).tolist()
+                encoded_column = (encoded if active else () for encoded, active in zip(encoded_column, active_rows))
+            for row, encoded in zip(rows, encoded_column):
+                row.extend(encoded)
+
+        after = self.config.get('after', [])
+        for row in rows:
+            row.extend(after)
+        return [formatter(row) for row in rows] if formatter else rows
+
     def _decode_multi(self, data):
-        return {name: setting.decode_option(data)
-                for name, setting in self.settings.items()}
+        if self.codegen and isinstance(data, list):
+            if self.heap_percentage_settings:
+                self.check_heap_percentages(OptionIndex(data))
+            return self.get_codecs()[1](data)
+
+        index = OptionIndex(data) if isinstance(data, list) else None
+        if self.heap_percentage_settings and index is not None:
+            self.check_heap_percentages(index)
+        if not self.conditional_settings:
+            return {name: setting.decode_option(data, index)
+                    for name, setting in self.settings.items()}
+
+        # Settings having no effect with the collector in use are left out
+        gc_type = self.settings['GCType'].decode_option(data, index)
+        inactive = self.get_inactive_settings(gc_type)
+        return {name: gc_type if name == 'GCType' else setting.decode_option(data, index)
+                for name, setting in self.settings.items() if name not in inactive}
 
     def decode_multi(self, data):
-        if isinstance(data, str):
-            # TODO: There might be cases with escaped spaces - this code is to be advanced.
-            data = data.split(' ')
-        return self._decode_multi(data)
+        if isinstance(data, str) or hasattr(data, 'read'):
+            try:
+                data = list(iter_args(data))
+            except ValueError as e:
+                raise EncoderRuntimeException('Unable to split command line into arguments '
+                                              'in jvm encoder: {}'.format(str(e)))
+        if not self.cache_enabled or not isinstance(data, list):
+            return self._decode_multi(data)
+
+        try:
+            key = self.get_cache_key('decode', tuple(data))
+            hash(key)
+        except TypeError:
+            return self._decode_multi(data)
+        decoded = result_cache.get(key)
+        if decoded is None:
+            decoded = self._decode_multi(data)
+            result_cache.put(key, decoded)
+        return dict(decoded)
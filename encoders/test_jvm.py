@@ -1,8 +1,15 @@
+import io
+import os
+import random
+
 import pytest
 from encoders.base import encode as original_encode, describe as original_describe
-from encoders.jvm import EncoderConfigException, \
+from encoders.jvm import Encoder, EncoderConfigException, \
     SettingConfigException, \
-    SettingRuntimeException, GCTypeSetting
+    EncoderRuntimeException, SettingRuntimeException, GCTypeSetting, OptionIndex, option_key, compile_formats, \
+    iter_args, quote_args, result_cache, LRUCache, SETTINGS, get_setting_class, parse_flags, load_flags, \
+    parse_jdk_version, read_cgroup_memory_limit, SizeValueEncoder, IntToGbValueEncoder, read_cgroup_cpu_limit, \
+    read_host_memory, parse_native_memory, PauseHistogram, analyze_gc_log
 
 """
 Describe helper
@@ -23,6 +30,17 @@ def encode(config, values, expected_type=None):
     return original_encode(config, values, expected_type)
 
 
+def import_numpy():
+    """
+    NumPy is optional, so tests of arrays are skipped without it, unless running in CI, where a missing NumPy fails
+    them rather than hiding them.
+    """
+    if os.environ.get('CI'):
+        import numpy
+        return numpy
+    return pytest.importorskip('numpy')
+
+
 def test_describe_list():
     config = {'settings': {'MaxHeapSize': {'min': 1, 'max': 6, 'step': 1},
                            'GCTimeRatio': {'min': 9, 'max': 99, 'step': 1}}}
@@ -42,6 +60,49 @@ def test_describe_string():
         'GCTimeRatio': {'min': 9, 'max': 99, 'step': 1, 'value': 19, 'type': 'range', 'unit': ''}}
 
 
+def test_describe_string_quoted():
+    config = {'settings': {'MaxHeapSize': {'min': 1, 'max': 6, 'step': 1},
+                           'GCTimeRatio': {'min': 9, 'max': 99, 'step': 1}}}
+    descriptor = describe(config, 'java  -Dapp.name="my app"\t-XX:MaxHeapSize=3072m \'-Dapp.dir=/my app\' '
+                                  '-XX:GCTimeRatio=19 -Dapp.owner=it\\\'s\\ me -jar /app.jar')
+    assert descriptor['MaxHeapSize']['value'] == 3
+    assert descriptor['GCTimeRatio']['value'] == 19
+
+
+def test_describe_string_unterminated_quote():
+    with pytest.raises(EncoderRuntimeException):
+        describe({'settings': {'GCTimeRatio': None}}, '-Dapp.name="my app -XX:GCTimeRatio=19')
+
+
+def test_describe_stream():
+    config = {'settings': {'GCTimeRatio': {'min': 9, 'max': 99, 'step': 1}}}
+    descriptor = describe(config, io.StringIO('-Dapp.name="my app" -XX:GCTimeRatio=19'))
+    assert descriptor['GCTimeRatio']['value'] == 19
+
+
+def test_iter_args():
+    data = 'java  -Dfoo="a b"\t\'x y\' z\\ w "q\\"x" \'it\'"\'"\'s\' \'\' -jar /app.jar'
+    expected = ['java', '-Dfoo=a b', 'x y', 'z w', 'q"x', "it's", '', '-jar', '/app.jar']
+    assert list(iter_args(data)) == expected
+    for chunk_size in (1, 2, 5, 64):
+        assert list(iter_args(io.StringIO(data), chunk_size)) == expected
+    for data in ('"abc', "a'b", 'abc \\'):
+        with pytest.raises(ValueError):
+            list(iter_args(data))
+
+    # Line continuations are removed, joining the words around them
+    data = 'java \\\n  -Xmx2g \\\n\\\n\t-Dfoo=a\\\nb \\\n-jar app.jar \\\n'
+    expected = ['java', '-Xmx2g', '-Dfoo=ab', '-jar', 'app.jar']
+    assert list(iter_args(data)) == expected
+    for chunk_size in (1, 2, 5, 64):
+        assert list(iter_args(io.StringIO(data), chunk_size)) == expected
+
+
+def test_quote_args_round_trip():
+    args = ['java', '-Dfoo=a b', "it's", '', 'tab\there', '$HOME', 'a"b\\c', '-jar', '/app.jar']
+    assert list(iter_args(quote_args(args))) == args
+
+
 def test_describe_one_setting():
     config = {'settings': {'GCTimeRatio': {'min': 9, 'max': 99, 'step': 1}}}
     descriptor = describe(config, ['-XX:GCTimeRatio=19'])
@@ -94,6 +155,50 @@ def test_describe_unsupported_options_provided():
         'GCTimeRatio': {'min': 9, 'max': 99, 'step': 1, 'value': 50, 'type': 'range', 'unit': ''}}
 
 
+def test_describe_long_command_line():
+    config = {'settings': {'MaxHeapSize': {'min': 1, 'max': 6, 'step': 1},
+                           'InitialHeapSize': {'min': 1, 'max': 6, 'step': 1},
+                           'AlwaysPreTouch': None,
+                           'GCType': {'values': ['G1GC', 'ParallelOldGC']}}}
+    data = ['java', '-server']
+    data.extend('-Dproperty{}=value{}'.format(i, i) for i in range(200))
+    data.extend(['-Xms2048m', '-XX:MaxHeapSize=4096m', '-XX:-AlwaysPreTouch', '-XX:+UseG1GC',
+                 '-cp', '/app/lib/*', '-jar', '/app.jar'])
+    descriptor = describe(config, data)
+    assert descriptor['MaxHeapSize']['value'] == 4
+    assert descriptor['InitialHeapSize']['value'] == 2
+    assert descriptor['AlwaysPreTouch']['value'] == 0
+    assert descriptor['GCType']['value'] == 'G1GC'
+
+
+def test_option_index():
+    assert option_key('-XX:MaxHeapSize=4096m') == ('XX', 'MaxHeapSize')
+    assert option_key('-XX:+AlwaysPreTouch') == ('XX', 'AlwaysPreTouch')
+    assert option_key('-XX:-UseG1GC') == ('XX', 'UseG1GC')
+    assert option_key('-XX:AlwaysPreTouch') == ('XX', 'AlwaysPreTouch')
+    assert option_key('-Xmx4096m') == ('X', 'mx')
+    assert option_key('-Xms:4096m') == ('X', 'ms')
+    assert option_key('-Xlog:gc') is None
+    assert option_key('-Dfoo=bar') is None
+    assert option_key('/app.jar') is None
+
+    index = OptionIndex(['java', '-Xmx1024m', '-XX:MaxHeapSize=2048m', '-XX:+UseG1GC', '-jar', '/app.jar'])
+    assert index.lookup([('XX', 'MaxHeapSize'), ('X', 'mx')]) == ['-XX:MaxHeapSize=2048m', '-Xmx1024m']
+    assert index.lookup([('XX', 'UseG1GC')]) == ['-XX:+UseG1GC']
+    assert index.lookup([('XX', 'GCTimeRatio')]) == []
+
+
+def test_compile_formats():
+    pattern = compile_formats(('XX:{name}={value}', 'X{shorthand}{value}'), 'Max.Heap+Size', 'mx')
+    assert pattern is compile_formats(('XX:{name}={value}', 'X{shorthand}{value}'), 'Max.Heap+Size', 'mx')
+    match = pattern.match('-XX:Max.Heap+Size=1024m')
+    assert match.group(match.lastindex) == '1024m'
+    match = pattern.match('-Xmx2048m')
+    assert match.group(match.lastindex) == '2048m'
+    assert pattern.match('-XX:MaxAHeap+Size=1024m') is None
+    assert pattern.match('-XX:Max.HeapSize=1024m') is None
+
+
 def test_describe_multiple_option_formats_provided():
     config = {'settings': {'MaxHeapSize': {'min': 1, 'max': 6, 'step': 1}}}
     with pytest.raises(SettingRuntimeException):
@@ -146,6 +251,30 @@ def test_describe_unsupported_setting_requested():
     with pytest.raises(EncoderConfigException):
         describe({'settings': {'MortgageAPR': {}}}, [])
 
+    for name in ('Boolean', 'HeapSize', 'Range'):
+        with pytest.raises(EncoderConfigException):
+            describe({'settings': {name: {}}}, [])
+
+
+def test_describe_unsupported_setting_suggestions():
+    with pytest.raises(EncoderConfigException) as e:
+        describe({'settings': {'MaxHeapSise': {'min': 1, 'max': 6, 'step': 1}}}, [])
+    assert 'Did you mean "MaxHeapSize"' in str(e.value)
+
+
+def test_setting_registry():
+    for name in SETTINGS:
+        setting_class = get_setting_class(name)
+        assert setting_class.name == name
+        assert get_setting_class(name) is setting_class
+    assert get_setting_class('GCType') is GCTypeSetting
+
+    from encoders import jvm
+    assert jvm.MaxHeapSizeSetting is get_setting_class('MaxHeapSize')
+    assert jvm.MaxHeapSizeSetting.shorthand == 'mx'
+    with pytest.raises(AttributeError):
+        jvm.MortgageAPRSetting
+
 
 """
 Encode helper
@@ -162,6 +291,463 @@ def test_encode():
                                       '-XX:GCTimeRatio=59'])
 
 
+def test_encode_batch():
+    encoder = Encoder({**config_base,
+                       'settings': {'MaxHeapSize': {'min': 1, 'max': 6, 'step': 1},
+                                    'GCType': {'values': ['G1GC', 'ParallelOldGC']}},
+                       'before': ['java'],
+                       'after': ['-jar', '/app.jar']})
+    batch = [{'MaxHeapSize': 4, 'GCType': 'G1GC'},
+             {'MaxHeapSize': 2, 'GCType': 'ParallelOldGC'},
+             {'MaxHeapSize': 4, 'GCType': 'ParallelOldGC'}]
+    expected = [encoder.encode_multi(values, list) for values in batch]
+    assert expected[0] == ['java', '-XX:MaxHeapSize=4096m', '-XX:+UseG1GC', '-jar', '/app.jar']
+    assert encoder.encode_batch(batch, list) == expected
+    assert encoder.encode_batch(batch) == [encoder.encode_multi(values) for values in batch]
+
+    columns = {'MaxHeapSize': [4, 2, 4], 'GCType': ['G1GC', 'ParallelOldGC', 'ParallelOldGC']}
+    assert encoder.encode_batch(columns, list) == expected
+    assert encoder.encode_batch([], list) == []
+
+
+def test_encode_batch_invalid_values():
+    encoder = Encoder({**config_base, 'settings': {'MaxHeapSize': {'min': 1, 'max': 6, 'step': 1}}})
+    with pytest.raises(SettingRuntimeException):
+        encoder.encode_batch([{'MaxHeapSize': 4}, {'MaxHeapSize': 7}])
+    with pytest.raises(SettingRuntimeException):
+        encoder.encode_batch([{'MaxHeapSize': 4}, {}])
+    with pytest.raises(EncoderRuntimeException):
+        encoder.encode_batch([{'MaxHeapSize': 4, 'GCTimeRatio': 9}])
+    with pytest.raises(EncoderRuntimeException):
+        encoder.encode_batch({'MaxHeapSize': [4, 5], 'GCTimeRatio': [9]})
+    with pytest.raises(EncoderConfigException):
+        encoder.encode_batch([{'MaxHeapSize': 4}], dict)
+
+
+def test_encode_ordinals():
+    np = import_numpy()
+    encoder = Encoder({**config_base,
+                       'settings': {'MaxHeapSize': {'min': .5, 'max': 6, 'step': .125},
+                                    'GCTimeRatio': {'min': 9, 'max': 99, 'step': 10},
+                                    'AlwaysPreTouch': None,
+                                    'GCType': {'values': ['G1GC', 'ParallelOldGC']}},
+                       'before': ['java'],
+                       'after': ['-jar', '/app.jar']})
+    assert encoder.get_lattice() == {'MaxHeapSize': 45, 'GCTimeRatio': 10, 'AlwaysPreTouch': 2, 'GCType': 2}
+
+    ordinals = np.array([[0, 0, 0, 0], [9, 5, 1, 1], [44, 9, 1, 0]])
+    expected = []
+    for row in ordinals:
+        values = {name: setting.get_lattice_value(ordinal)
+                  for ordinal, (name, setting) in zip(row.tolist(), encoder.settings.items())}
+        expected.append(encoder.encode_multi(values, list))
+    assert expected[1] == ['java', '-XX:MaxHeapSize=1664m', '-XX:GCTimeRatio=59', '-XX:+AlwaysPreTouch',
+                           '-XX:+UseParallelOldGC', '-jar', '/app.jar']
+    assert encoder.encode_ordinals(ordinals, list) == expected
+    assert encoder.encode_ordinals(ordinals.tolist()) == [quote_args(encoded) for encoded in expected]
+    assert encoder.encode_ordinals(ordinals / np.array([44, 9, 1, 1]), list, normalized=True) == expected
+
+
+def test_encode_ordinals_invalid():
+    np = import_numpy()
+    encoder = Encoder({**config_base, 'settings': {'GCTimeRatio': {'min': 9, 'max': 99, 'step': 10}}})
+    assert encoder.settings['GCTimeRatio'].get_lattice_ordinal(59) == 5
+    with pytest.raises(SettingRuntimeException):
+        encoder.encode_ordinals(np.array([[10]]))
+    with pytest.raises(SettingRuntimeException):
+        encoder.encode_ordinals(np.array([[-1]]))
+    with pytest.raises(SettingRuntimeException):
+        encoder.encode_ordinals(np.array([[.5]]))
+    with pytest.raises(SettingRuntimeException):
+        encoder.encode_ordinals(np.array([[1.5]]), normalized=True)
+    with pytest.raises(EncoderRuntimeException):
+        encoder.encode_ordinals(np.array([1, 2]))
+
+
+def test_lru_cache():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    assert cache.stats() == {'hits': 2, 'misses': 1, 'evictions': 1, 'size': 2, 'maxsize': 2}
+    cache.resize(1)
+    assert list(cache.items) == ['c']
+    assert cache.stats()['evictions'] == 2
+
+
+def test_encode_decode_cached():
+    result_cache.clear()
+    config = {'settings': {'MaxHeapSize': {'min': 1, 'max': 6, 'step': 1}}, 'cache_size': 16}
+    for _ in range(3):
+        encoded, _ = encode(config, {'MaxHeapSize': {'value': 4}}, list)
+        assert encoded == ['-XX:MaxHeapSize=4096m']
+        encoded.append('mutated')
+    assert encode(config, {'MaxHeapSize': {'value': 4}}, str)[0] == '-XX:MaxHeapSize=4096m'
+    assert result_cache.stats()['hits'] == 2
+    assert result_cache.stats()['misses'] == 2
+
+    for _ in range(2):
+        assert describe(config, '-Xmx3072m')['MaxHeapSize']['value'] == 3
+    assert result_cache.stats()['hits'] == 3
+
+    # Same command line under a different config must not be served from cache
+    other_config = {'settings': {'MaxHeapSize': {'min': 1, 'max': 6, 'step': 1},
+                                 'GCTimeRatio': {'default': 19}}, 'cache_size': 16}
+    assert describe(other_config, '-Xmx3072m')['GCTimeRatio']['value'] == 19
+    assert result_cache.stats()['hits'] == 3
+
+    with pytest.raises(SettingRuntimeException):
+        encode(config, {'MaxHeapSize': {'value': 7}}, list)
+
+    # Values equal to cached ones but of other types are validated anew
+    bool_config = {'settings': {'AlwaysPreTouch': None}, 'cache_size': 16}
+    assert encode(bool_config, {'AlwaysPreTouch': {'value': 1}}, list)[0] == ['-XX:+AlwaysPreTouch']
+    with pytest.raises(SettingRuntimeException):
+        encode(bool_config, {'AlwaysPreTouch': {'value': True}}, list)
+
+    # Encoders with a smaller cache or none leave entries of the others in place
+    size = result_cache.stats()['size']
+    for cache_size in (4, 0, None):
+        Encoder({**config_base, **config, 'cache_size': cache_size})
+    assert result_cache.stats()['size'] == size
+    assert result_cache.maxsize == 16
+    result_cache.resize(0)
+
+
+def test_encode_cached_resolved_settings(tmp_path):
+    result_cache.clear()
+    sysfs_root = make_cgroup_tree(tmp_path, 4 * 1024 ** 3)
+    config = {**config_base, 'settings': {'MaxHeapSize': {'min': .5, 'step': .5}}, 'container_memory': True,
+              'sysfs_root': sysfs_root, 'cache_size': 16}
+    assert Encoder(config).encode_multi({'MaxHeapSize': 2.5}, list) == ['-XX:MaxHeapSize=2560m']
+
+    # The same config resolves to other bounds once the memory limit of the container changes
+    (tmp_path / 'fs' / 'cgroup' / 'memory.max').write_text('{}\n'.format(2 * 1024 ** 3))
+    encoder = Encoder(config)
+    assert encoder.settings['MaxHeapSize'].max == 1
+    with pytest.raises(SettingRuntimeException):
+        encoder.encode_multi({'MaxHeapSize': 2.5}, list)
+    assert result_cache.stats()['hits'] == 0
+    result_cache.resize(0)
+
+
+def test_encode_cache_size_invalid():
+    with pytest.raises(EncoderConfigException):
+        encode({'settings': {'MaxHeapSize': {'min': 1, 'max': 6, 'step': 1}}, 'cache_size': -1},
+               {'MaxHeapSize': {'value': 4}})
+
+
+def test_encode_patch():
+    encoder = Encoder({**config_base, 'settings': {'MaxHeapSize': {'min': 1, 'max': 6, 'step': 1},
+                                                   'GCTimeRatio': None,
+                                                   'GCType': None,
+                                                   'AlwaysPreTouch': None}})
+    values = {'MaxHeapSize': 4, 'GCType': 'G1GC', 'AlwaysPreTouch': 1}
+    existing = ['java', '-Xmx1024m', '-Dapp.name=my app', '-XX:+UseParallelOldGC', '-XX:-UseG1GC',
+                '-cp', '/app/lib/*', 'com.example.Main', '-XX:-AlwaysPreTouch']
+    assert encoder.encode_patch(existing, values) == [
+        'java', '-Xmx4096m', '-Dapp.name=my app', '-XX:+UseG1GC',
+        '-cp', '/app/lib/*', '-XX:+AlwaysPreTouch', 'com.example.Main', '-XX:-AlwaysPreTouch']
+    assert existing[1] == '-Xmx1024m'
+
+    existing = ("  java -XX:MaxHeapSize=1024m  -Dapp.name='my app'\t-XX:+UseParallelOldGC -XX:-UseG1GC "
+                "-javaagent:/agent.jar -jar /app.jar --port 8080\n")
+    assert encoder.encode_patch(existing, values) == (
+        "  java -XX:MaxHeapSize=4096m  -Dapp.name='my app'\t-XX:+UseG1GC "
+        "-javaagent:/agent.jar -XX:+AlwaysPreTouch -jar /app.jar --port 8080\n")
+    assert encoder.encode_patch(existing, {'GCTimeRatio': 19}, list) == [
+        'java', '-XX:MaxHeapSize=1024m', '-Dapp.name=my app', '-XX:+UseParallelOldGC', '-XX:-UseG1GC',
+        '-javaagent:/agent.jar', '-XX:GCTimeRatio=19', '-jar', '/app.jar', '--port', '8080']
+    existing = 'java \\\n  -Xmx2g \\\n  -XX:+UseG1GC \\\n  -jar app.jar'
+    assert encoder.encode_patch(existing, {'MaxHeapSize': 4}) == \
+        'java \\\n  -Xmx4096m \\\n  -XX:+UseG1GC \\\n  -jar app.jar'
+    assert encoder.encode_patch(existing, {'GCType': 'ParallelOldGC', 'AlwaysPreTouch': 1}) == \
+        'java \\\n  -Xmx2g \\\n  -XX:+UseParallelOldGC \\\n  -XX:+AlwaysPreTouch -jar app.jar'
+    assert encoder.encode_patch(existing, {'MaxHeapSize': 4}, list) == ['java', '-Xmx4096m', '-XX:+UseG1GC', '-jar',
+                                                                        'app.jar']
+    assert encoder.encode_patch('-Xms1g', {'AlwaysPreTouch': 0}) == '-Xms1g -XX:-AlwaysPreTouch'
+    assert encoder.encode_patch('', {'AlwaysPreTouch': 0}) == '-XX:-AlwaysPreTouch'
+
+
+def test_encode_patch_invalid():
+    encoder = Encoder({**config_base, 'settings': {'MaxHeapSize': {'min': 1, 'max': 6, 'step': 1}}})
+    with pytest.raises(EncoderRuntimeException):
+        encoder.encode_patch(['java', '-jar', '/app.jar'], {'GCTimeRatio': 19})
+    with pytest.raises(EncoderRuntimeException):
+        encoder.encode_patch('java "-jar', {'MaxHeapSize': 2})
+    with pytest.raises(SettingRuntimeException):
+        encoder.encode_patch(['java', '-Xmx1g', '-jar', '/app.jar'], {'MaxHeapSize': 7})
+
+
+def test_encoder_snapshot(tmp_path, monkeypatch):
+    config = {**config_base,
+              'settings': {'MaxHeapSize': {'min': 1, 'max': 6, 'step': 1},
+                           'GCType': {'values': ['G1GC', 'ParallelOldGC'], 'default': 'G1GC'},
+                           'AlwaysPreTouch': None},
+              'snapshot_dir': str(tmp_path)}
+    values = {'MaxHeapSize': 4, 'GCType': 'ParallelOldGC', 'AlwaysPreTouch': 1}
+    data = ['-Xmx2048m', '-XX:+AlwaysPreTouch']
+    encoder = Encoder(config)
+    assert len(list(tmp_path.iterdir())) == 1
+
+    def check_config(self):
+        raise AssertionError('Setting config must not be checked when loaded from snapshot')
+
+    monkeypatch.setattr(GCTypeSetting, 'check_config', check_config)
+    loaded = Encoder(config)
+    assert loaded.describe() == encoder.describe()
+    assert loaded.encode_multi(values) == encoder.encode_multi(values)
+    assert loaded.decode_multi(data) == encoder.decode_multi(data) == {
+        'MaxHeapSize': 2, 'GCType': 'G1GC', 'AlwaysPreTouch': 1}
+
+    # Snapshots of other configs are stored separately
+    with pytest.raises(AssertionError):
+        Encoder({**config, 'settings': {'GCType': None}})
+
+
+def test_encoder_snapshot_corrupted(tmp_path):
+    config = {**config_base, 'settings': {'GCTimeRatio': None}, 'snapshot_dir': str(tmp_path)}
+    Encoder(config)
+    snapshot_path, = tmp_path.iterdir()
+    snapshot_path.write_bytes(b'corrupted')
+    assert Encoder(config).decode_multi(['-XX:GCTimeRatio=19']) == {'GCTimeRatio': 19}
+    assert Encoder(config).decode_multi(['-XX:GCTimeRatio=29']) == {'GCTimeRatio': 29}
+    Encoder({**config, 'snapshot_dir': str(tmp_path / 'missing')})
+
+
+def test_codegen_equivalence():
+    config = {**config_base,
+              'settings': {'MaxHeapSize': {'min': 1, 'max': 6, 'step': .5},
+                           'InitialHeapSize': {'min': .5, 'max': 6, 'step': .5, 'default': 1},
+                           'GCType': {'values': ['G1GC', 'ParallelOldGC', 'SerialGC'], 'disable_others': True,
+                                      'default': 'G1GC'},
+                           'GCTimeRatio': {'min': 9, 'max': 99, 'step': 10},
+                           'AlwaysPreTouch': None,
+                           'NewRatio': None},
+              'before': ['java', '-server'],
+              'after': ['-jar', '/app.jar']}
+    generic = Encoder(config)
+    generated = Encoder({**config, 'codegen': True})
+    assert 'def encode(values):' in generated.generated_source
+    assert "'-XX:GCTimeRatio=' + str(int(value))" in generated.generated_source
+
+    def outcome(func, *args):
+        try:
+            return func(*args)
+        except Exception as e:
+            return type(e), str(e)
+
+    rng = random.Random(7)
+    candidates = {
+        'MaxHeapSize': [1, 1.5, 6, 0, 7, 2.25, '1', None],
+        'InitialHeapSize': [.5, 3, 6.5],
+        'GCType': ['G1GC', 'SerialGC', 'ConcMarkSweepGC', None],
+        'GCTimeRatio': [9, 59, 99, 10],
+        'AlwaysPreTouch': [0, 1, 2],
+        'NewRatio': [1, 2, 99, 100],
+        'MortgageAPR': [1],
+    }
+    for _ in range(500):
+        values = {name: rng.choice(options) for name, options in candidates.items() if rng.random() < .9}
+        for expected_type in ('list', 'str'):
+            assert outcome(generated.encode_multi, values, expected_type) == \
+                outcome(generic.encode_multi, values, expected_type)
+
+    options = ['-Xmx2048m', '-XX:MaxHeapSize=3072m', '-Xmx3g', '-Xms1024m', '-XX:InitialHeapSize=abc',
+               '-XX:+UseG1GC', '-XX:-UseG1GC', '-XX:+UseSerialGC', '-XX:GCTimeRatio=19', '-XX:GCTimeRatio=x',
+               '-XX:+AlwaysPreTouch', '-XX:AlwaysPreTouch', '-XX:NewRatio=3', '-Dfoo=bar', '-jar', '/app.jar']
+    for _ in range(500):
+        data = rng.sample(options, rng.randint(0, 8))
+        assert outcome(generated.decode_multi, data) == outcome(generic.decode_multi, data)
+    assert outcome(generated.decode_multi, 'x') == outcome(generic.decode_multi, 'x')
+    data = ['java', '-Xmx3072m', '-XX:+UseSerialGC', '-XX:GCTimeRatio=19', '-jar', '/app.jar']
+    assert generated.decode_multi(data) == generic.decode_multi(data) == {
+        'MaxHeapSize': 3, 'InitialHeapSize': 1, 'GCType': 'SerialGC', 'AlwaysPreTouch': 0, 'NewRatio': 2}
+    data = ['java', '-Xmx3072m', '-XX:+UseG1GC', '-XX:GCTimeRatio=19', '-jar', '/app.jar']
+    assert generated.decode_multi(data) == generic.decode_multi(data) == {
+        'MaxHeapSize': 3, 'InitialHeapSize': 1, 'GCType': 'G1GC', 'GCTimeRatio': 19, 'AlwaysPreTouch': 0,
+        'NewRatio': 2}
+
+
+GC_CONDITIONAL_SETTINGS = {'GCType': {'values': ['G1GC', 'ParallelOldGC', 'ConcMarkSweepGC']},
+                           'G1ReservePercent': None,
+                           'MaxGCPauseMillis': None,
+                           'CMSInitiatingOccupancyFraction': None,
+                           'AlwaysPreTouch': None}
+
+
+def test_describe_conditional():
+    descriptor = describe({'settings': GC_CONDITIONAL_SETTINGS},
+                          ['-XX:+UseG1GC', '-XX:G1ReservePercent=20', '-XX:CMSInitiatingOccupancyFraction=70'])
+    assert descriptor['G1ReservePercent']['parent'] == 'GCType'
+    assert descriptor['G1ReservePercent']['active_when'] == ['G1GC']
+    assert descriptor['G1ReservePercent']['value'] == 20
+    assert descriptor['MaxGCPauseMillis']['active_when'] == ['G1GC', 'ParallelOldGC']
+    assert descriptor['MaxGCPauseMillis']['value'] == 200
+    assert descriptor['CMSInitiatingOccupancyFraction']['active_when'] == ['ConcMarkSweepGC']
+    assert 'value' not in descriptor['CMSInitiatingOccupancyFraction']
+    assert 'parent' not in descriptor['AlwaysPreTouch']
+    assert 'parent' not in descriptor['GCType']
+
+    # Settings active with all of the configured collectors are not conditional
+    descriptor = describe({'settings': {'GCType': {'values': ['G1GC']}, 'G1ReservePercent': None}}, ['-XX:+UseG1GC'])
+    assert 'parent' not in descriptor['G1ReservePercent']
+    descriptor = describe({'settings': GC_CONDITIONAL_SETTINGS, 'conditional': False}, ['-XX:+UseG1GC'])
+    assert 'parent' not in descriptor['G1ReservePercent']
+    assert descriptor['CMSInitiatingOccupancyFraction']['value'] == 92
+
+    with pytest.raises(EncoderConfigException):
+        describe({'settings': {'GCType': {'values': ['SerialGC']}, 'G1ReservePercent': None}}, [])
+    with pytest.raises(EncoderConfigException):
+        describe({'settings': GC_CONDITIONAL_SETTINGS, 'conditional': 'yes'}, [])
+
+
+def test_encode_conditional():
+    config = {'settings': GC_CONDITIONAL_SETTINGS, 'expected_type': 'list'}
+    encoded, _ = encode(config, {'GCType': {'value': 'ParallelOldGC'}, 'MaxGCPauseMillis': {'value': 100},
+                                 'G1ReservePercent': {'value': 15}, 'AlwaysPreTouch': {'value': 1}})
+    assert encoded == ['-XX:+UseParallelOldGC', '-XX:MaxGCPauseMillis=100', '-XX:+AlwaysPreTouch']
+    encoded, _ = encode(config, {'GCType': {'value': 'ConcMarkSweepGC'},
+                                 'CMSInitiatingOccupancyFraction': {'value': 80}, 'AlwaysPreTouch': {'value': 0}})
+    assert encoded == ['-XX:+UseConcMarkSweepGC', '-XX:CMSInitiatingOccupancyFraction=80', '-XX:-AlwaysPreTouch']
+    with pytest.raises(SettingRuntimeException):
+        encode(config, {'GCType': {'value': 'G1GC'}, 'MaxGCPauseMillis': {'value': 100},
+                        'AlwaysPreTouch': {'value': 0}})
+
+    encoded, _ = encode({**config, 'conditional': False},
+                        {'GCType': {'value': 'ParallelOldGC'}, 'MaxGCPauseMillis': {'value': 100},
+                         'G1ReservePercent': {'value': 15}, 'CMSInitiatingOccupancyFraction': {'value': 80},
+                         'AlwaysPreTouch': {'value': 1}})
+    assert encoded == ['-XX:+UseParallelOldGC', '-XX:G1ReservePercent=15', '-XX:MaxGCPauseMillis=100',
+                       '-XX:CMSInitiatingOccupancyFraction=80', '-XX:+AlwaysPreTouch']
+
+
+def test_encode_conditional_batch_and_patch():
+    np = import_numpy()
+    encoder = Encoder({**config_base, 'settings': GC_CONDITIONAL_SETTINGS})
+    batch = [{'GCType': 'G1GC', 'G1ReservePercent': 15, 'MaxGCPauseMillis': 100, 'AlwaysPreTouch': 1},
+             {'GCType': 'ConcMarkSweepGC', 'CMSInitiatingOccupancyFraction': 80, 'AlwaysPreTouch': 0}]
+    expected = [encoder.encode_multi(values, list) for values in batch]
+    assert expected[0] == ['-XX:+UseG1GC', '-XX:G1ReservePercent=15', '-XX:MaxGCPauseMillis=100',
+                           '-XX:+AlwaysPreTouch']
+    assert encoder.encode_batch(batch, list) == expected
+    ordinals = [[encoder.settings[name].get_lattice_ordinal(values.get(name, encoder.settings[name].min))
+                 for name in encoder.settings] for values in batch]
+    assert encoder.encode_ordinals(np.array(ordinals), list) == expected
+
+    existing = 'java -XX:+UseConcMarkSweepGC -XX:CMSInitiatingOccupancyFraction=80 -jar /app.jar'
+    assert encoder.encode_patch(existing, {'GCType': 'G1GC', 'G1ReservePercent': 15}) == \
+        'java -XX:+UseG1GC -XX:G1ReservePercent=15 -jar /app.jar'
+    assert encoder.encode_patch(existing, {'AlwaysPreTouch': 1}) == \
+        'java -XX:+UseConcMarkSweepGC -XX:CMSInitiatingOccupancyFraction=80 -XX:+AlwaysPreTouch -jar /app.jar'
+    # Removed first options take the blanks following them along
+    existing = '-XX:CMSInitiatingOccupancyFraction=80  -XX:+UseConcMarkSweepGC -jar /app.jar'
+    assert encoder.encode_patch(existing, {'GCType': 'G1GC'}) == '-XX:+UseG1GC -jar /app.jar'
+    existing = ' -XX:CMSInitiatingOccupancyFraction=80 -XX:+AlwaysPreTouch -jar /app.jar'
+    assert encoder.encode_patch(existing, {'GCType': 'G1GC'}) == ' -XX:+AlwaysPreTouch -XX:+UseG1GC -jar /app.jar'
+
+
+HEAP_SETTINGS = {'MaxHeapSize': {'min': 1, 'max': 6, 'step': .5},
+                 'InitialHeapSize': {'min': 1, 'max': 6, 'step': 1},
+                 'InitialEdenHeapSize': {'min': .25, 'max': 4, 'step': .25}}
+
+
+def test_encode_patch_constraints():
+    encoder = Encoder({**config_base, 'settings': HEAP_SETTINGS})
+    existing = ['java', '-Xmx4g', '-Xms2g', '-jar', 'a.jar']
+    assert encoder.encode_patch(existing, {'InitialHeapSize': 3}) == ['java', '-Xmx4g', '-Xms3072m', '-jar', 'a.jar']
+    for values in ({'InitialHeapSize': 6}, {'MaxHeapSize': 2, 'InitialHeapSize': 6}, {'MaxHeapSize': 1.5}):
+        with pytest.raises(EncoderRuntimeException):
+            encoder.encode_patch(existing, values)
+    # Values of settings missing in the command line can not be checked
+    assert encoder.encode_patch(['java', '-jar', 'a.jar'], {'InitialHeapSize': 6}) == \
+        ['java', '-XX:InitialHeapSize=6144m', '-jar', 'a.jar']
+
+    # Repaired values of the other settings are patched along
+    encoder = Encoder({**config_base, 'settings': HEAP_SETTINGS, 'constraints': 'repair'})
+    assert encoder.encode_patch(existing, {'MaxHeapSize': 1.5}) == ['java', '-Xmx1536m', '-Xms1024m', '-jar', 'a.jar']
+    assert encoder.encode_patch(existing, {'InitialHeapSize': 6}) == ['java', '-Xmx4g', '-Xms4096m', '-jar', 'a.jar']
+
+    config = {**config_base, 'settings': {'GCType': {'values': ['G1GC', 'ZGC']}, 'UnlockExperimentalVMOptions': None},
+              'jdk_version': 11}
+    existing = 'java -XX:-UnlockExperimentalVMOptions -XX:+UseG1GC -jar app.jar'
+    with pytest.raises(EncoderRuntimeException):
+        Encoder(config).encode_patch(existing, {'GCType': 'ZGC'})
+    with pytest.raises(EncoderRuntimeException):
+        Encoder(config).encode_patch('java -XX:+UseG1GC -jar app.jar', {'GCType': 'ZGC'})
+    assert Encoder({**config, 'constraints': 'repair'}).encode_patch(existing, {'GCType': 'ZGC'}) == \
+        'java -XX:+UnlockExperimentalVMOptions -XX:+UseZGC -jar app.jar'
+    assert Encoder(config).encode_patch(existing, {'GCType': 'G1GC'}) == existing
+
+
+def test_describe_constraints():
+    descriptor = describe({'settings': HEAP_SETTINGS}, ['-Xmx4096m', '-Xms2048m', '-Xmn1024m'])
+    assert descriptor['InitialHeapSize']['constraints'] == [{'operator': '<=', 'setting': 'MaxHeapSize'}]
+    assert descriptor['InitialEdenHeapSize']['constraints'] == [{'operator': '<', 'setting': 'MaxHeapSize'}]
+    assert 'constraints' not in descriptor['MaxHeapSize']
+
+    descriptor = describe({'settings': HEAP_SETTINGS, 'constraints': 'off'}, ['-Xmx4096m', '-Xms2048m', '-Xmn1024m'])
+    assert 'constraints' not in descriptor['InitialHeapSize']
+    descriptor = describe({'settings': {'InitialHeapSize': {'min': 1, 'max': 6, 'step': 1}}}, ['-Xms2048m'])
+    assert 'constraints' not in descriptor['InitialHeapSize']
+
+
+def test_encode_constraints_reject():
+    config = {'settings': HEAP_SETTINGS, 'expected_type': 'list'}
+    encoded, _ = encode(config, {'MaxHeapSize': {'value': 4}, 'InitialHeapSize': {'value': 4},
+                                 'InitialEdenHeapSize': {'value': 3.75}})
+    assert encoded == ['-XX:MaxHeapSize=4096m', '-XX:InitialHeapSize=4096m', '-XX:InitialEdenHeapSize=3840m']
+    with pytest.raises(EncoderRuntimeException):
+        encode(config, {'MaxHeapSize': {'value': 4}, 'InitialHeapSize': {'value': 5},
+                        'InitialEdenHeapSize': {'value': 1}})
+    with pytest.raises(EncoderRuntimeException):
+        encode(config, {'MaxHeapSize': {'value': 4}, 'InitialHeapSize': {'value': 2},
+                        'InitialEdenHeapSize': {'value': 4}})
+
+    encoded, _ = encode({**config, 'constraints': 'off'},
+                        {'MaxHeapSize': {'value': 4}, 'InitialHeapSize': {'value': 5},
+                         'InitialEdenHeapSize': {'value': 4}})
+    assert encoded == ['-XX:MaxHeapSize=4096m', '-XX:InitialHeapSize=5120m', '-XX:InitialEdenHeapSize=4096m']
+
+    with pytest.raises(EncoderConfigException):
+        encode({**config, 'constraints': 'clamp'}, {'MaxHeapSize': {'value': 4}})
+
+
+def test_encode_constraints_repair():
+    config = {'settings': HEAP_SETTINGS, 'constraints': 'repair', 'expected_type': 'list'}
+    encoded, _ = encode(config, {'MaxHeapSize': {'value': 3.5}, 'InitialHeapSize': {'value': 5},
+                                 'InitialEdenHeapSize': {'value': 4}})
+    assert encoded == ['-XX:MaxHeapSize=3584m', '-XX:InitialHeapSize=3072m', '-XX:InitialEdenHeapSize=3328m']
+
+    encoder = Encoder({**config_base, **config})
+    batch = [{'MaxHeapSize': 3.5, 'InitialHeapSize': 5, 'InitialEdenHeapSize': 4},
+             {'MaxHeapSize': 2, 'InitialHeapSize': 1, 'InitialEdenHeapSize': 1}]
+    assert encoder.encode_batch(batch, list) == [encoder.encode_multi(values, list) for values in batch]
+
+    # Eden can't be repaired to a value below the minimal heap size of its lattice
+    with pytest.raises(EncoderRuntimeException):
+        encode({**config, 'settings': {**HEAP_SETTINGS, 'InitialEdenHeapSize': {'min': 1, 'max': 4, 'step': 1}}},
+               {'MaxHeapSize': {'value': 1}, 'InitialHeapSize': {'value': 1}, 'InitialEdenHeapSize': {'value': 2}})
+
+
+def test_encode_ordinals_constraints():
+    np = import_numpy()
+    encoder = Encoder({**config_base, 'settings': HEAP_SETTINGS, 'constraints': 'repair'})
+    ordinals = np.array([[5, 4, 15], [10, 1, 3]])
+    expected = [encoder.encode_multi({name: setting.get_lattice_value(ordinal)
+                                      for ordinal, (name, setting) in zip(row, encoder.settings.items())}, list)
+                for row in ordinals.tolist()]
+    assert encoder.encode_ordinals(ordinals, list) == expected
+    assert expected[0] == ['-XX:MaxHeapSize=3584m', '-XX:InitialHeapSize=3072m', '-XX:InitialEdenHeapSize=3328m']
+
+    encoder = Encoder({**config_base, 'settings': HEAP_SETTINGS})
+    with pytest.raises(EncoderRuntimeException):
+        encoder.encode_ordinals(ordinals)
+
+
 def test_encode_one_setting():
     encoded, _ = encode({'settings': {'GCTimeRatio': {'min': 9, 'max': 99, 'step': 1}},
                          'expected_type': 'list'},
@@ -208,6 +794,16 @@ def test_encode_expected_type_string():
     assert encoded == 'java -server -XX:MaxHeapSize=4096m -javaagent:/tmp/newrelic/newrelic.jar -jar /app.jar'
 
 
+def test_encode_expected_type_string_quoted():
+    encoded, _ = encode({'settings': {'MaxHeapSize': {'min': 1, 'max': 6, 'step': 1}},
+                         'before': ['java', '-Dapp.name=my app'],
+                         'after': ['-jar', '/app.jar']},
+                        {'MaxHeapSize': {'value': 4}},
+                        expected_type='str')
+    assert encoded == "java '-Dapp.name=my app' -XX:MaxHeapSize=4096m -jar /app.jar"
+    assert list(iter_args(encoded)) == ['java', '-Dapp.name=my app', '-XX:MaxHeapSize=4096m', '-jar', '/app.jar']
+
+
 def test_encode_expected_type_list():
     encoded, _ = encode({'settings': {'MaxHeapSize': {'min': 1, 'max': 6, 'step': 1}},
                          'before': ['java', '-server'],
@@ -393,6 +989,29 @@ def test_describe_gc_type_multiple_enabled():
         describe(config, ['-XX:+UseParNewGC', '-XX:+UseConcMarkSweepGC'])
 
 
+def test_describe_gc_type_same_gc_multiple_times():
+    config = {'settings': {'GCType': {'values': ['G1GC', 'ParallelOldGC']}}}
+    with pytest.raises(SettingRuntimeException) as e:
+        describe(config, ['-XX:+UseG1GC', '-XX:-UseG1GC'])
+    assert 'collector "G1GC" of setting "GCType"' in str(e.value)
+
+
+def test_describe_gc_type_unrelated_options():
+    config = {'settings': {'GCType': {'values': ['G1GC', 'ParallelOldGC']}}}
+    descriptor = describe(config, ['-XX:UseG1GC=true', '-XX:*UseParallelOldGC', '-XX:+UseParallelOldGC',
+                                   '-XX:+UseSerialGC'])
+    assert descriptor['GCType']['value'] == 'ParallelOldGC'
+
+
+def test_gc_type_config_does_not_leak():
+    allowed_options = set(GCTypeSetting.__mro__[1].allowed_options)
+    GCTypeSetting({'values': ['G1GC'], 'disable_others': True})
+    assert GCTypeSetting.__mro__[1].allowed_options == allowed_options
+    assert 'values' not in allowed_options
+    with pytest.raises(SettingConfigException):
+        describe({'settings': {'GCTimeRatio': {'values': ['G1GC']}}}, ['-XX:GCTimeRatio=19'])
+
+
 def test_describe_gc_type_no_values_provided():
     with pytest.raises(SettingConfigException):
         describe({'settings': {'GCType': {'values': []}}}, [])
@@ -410,7 +1029,8 @@ def test_describe_gc_type_unsupported_value_provided():
 
 def test_encode_gc_type():
     selected_gcs = ('ParNewGC', 'G1GC', 'ParallelOldGC')
-    supported_gcs = set(GCTypeSetting.supported_values)
+    # Unless the JDK version is configured, only collectors available in all the versions are disabled
+    supported_gcs = {'ParNewGC', 'G1GC', 'ParallelOldGC', 'ConcMarkSweepGC', 'SerialGC'}
     template = '-XX:{}Use{}'
 
     # Test all the available GCs with and without disabling other types
@@ -487,3 +1107,769 @@ def test_encode_StackShadowPages():
                          'expected_type': 'str'},
                         {'StackShadowPages': {'value': 20},})
     assert sorted(encoded) == sorted('-XX:StackShadowPages=20')
+
+
+FLAGS_FINAL = """[Global flags]
+    uintx G1ReservePercent                          = 10                                  {product}
+     bool AlwaysPreTouch                            = false                               {product}
+    uintx GCTimeRatio                               = 99                                  {product}
+    uintx MaxHeapSize                              := 4294967296                          {product}
+     intx StackShadowPages                          = 20                                  {pd product}
+     bool UseG1GC                                   = false                               {product}
+     bool UseParallelOldGC                          = true                                {product}
+     bool UseParallelGC                            := true                                {product}
+     bool UseSerialGC                               = false                               {product}
+    ccstr ErrorFile                                 =                                     {product}
+"""
+FLAGS_RANGES = """[Global flags ranges]
+    uintx G1ReservePercent                          [                0 ...                50 ] {product} {default}
+    uintx GCTimeRatio                               [                0 ...        4294967295 ] {product} {default}
+     intx StackShadowPages                          [               10 ...                50 ] {pd product} {default}
+"""
+
+
+def test_parse_flags():
+    flags = parse_flags(FLAGS_FINAL + FLAGS_RANGES)
+    assert flags['G1ReservePercent'] == ('uintx', 10, 0, 50)
+    assert flags['MaxHeapSize'] == ('uintx', 4294967296, None, None)
+    assert flags['AlwaysPreTouch'] == ('bool', 0, None, None)
+    assert flags['UseParallelOldGC'] == ('bool', 1, None, None)
+    assert flags['ErrorFile'] == ('ccstr', '', None, None)
+    assert 'Global' not in flags
+
+
+def test_load_flags_cache(tmp_path):
+    final_path, ranges_path = tmp_path / 'final.txt', tmp_path / 'ranges.txt'
+    final_path.write_text(FLAGS_FINAL)
+    ranges_path.write_text(FLAGS_RANGES)
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir()
+    flags = load_flags([str(final_path), str(ranges_path)], str(cache_dir))
+    assert flags['G1ReservePercent'] == ('uintx', 10, 0, 50)
+    assert len(list(cache_dir.iterdir())) == 2
+    assert load_flags(str(final_path)) is load_flags(str(final_path))
+
+    # Identical dumps of other images are read from the disk cache
+    copy_path = tmp_path / 'copy.txt'
+    copy_path.write_text(FLAGS_FINAL)
+    assert load_flags(str(copy_path), str(cache_dir)) == load_flags(str(final_path))
+    assert len(list(cache_dir.iterdir())) == 2
+
+    with pytest.raises(EncoderConfigException):
+        load_flags(str(tmp_path / 'missing.txt'))
+
+
+def test_describe_flags(tmp_path):
+    flags_path = tmp_path / 'flags.txt'
+    flags_path.write_text(FLAGS_FINAL + FLAGS_RANGES)
+    config = {'settings': {'MaxHeapSize': {'min': 1, 'max': 8, 'step': .5},
+                           'G1ReservePercent': None,
+                           'StackShadowPages': {'step': 5},
+                           'AlwaysPreTouch': None,
+                           'GCType': None},
+              'flags_file': str(flags_path)}
+    descriptor = describe(config, ['-XX:+UseG1GC'])
+    assert descriptor['G1ReservePercent']['max'] == 50
+    assert descriptor['G1ReservePercent']['value'] == 10
+    assert descriptor['StackShadowPages']['min'] == 10
+    assert descriptor['StackShadowPages']['max'] == 50
+    assert descriptor['MaxHeapSize']['value'] == 4
+    assert descriptor['AlwaysPreTouch']['value'] == 0
+    assert descriptor['GCType']['values'] == ['G1GC', 'ParallelOldGC', 'SerialGC']
+    assert Encoder({**config_base, **config}).settings['GCType'].default == 'ParallelOldGC'
+
+    with pytest.raises(SettingConfigException):
+        describe({**config, 'settings': {'G1ReservePercent': {'min': 0, 'max': 60, 'step': 1}}}, [])
+    with pytest.raises(EncoderConfigException):
+        describe({**config, 'settings': {'GCType': {'values': ['G1GC', 'ConcMarkSweepGC']}}}, [])
+    with pytest.raises(EncoderConfigException):
+        describe({**config, 'settings': {'NewRatio': None}}, [])
+    with pytest.raises(EncoderConfigException):
+        describe({**config, 'flags_file': 42}, [])
+
+    # Sizes of enum settings are matched in any form
+    flags_path.write_text(FLAGS_FINAL + '  size_t LargePageSizeInBytes                      = 2097152'
+                                        '                             {product}\n')
+    config = {'settings': {'LargePageSizeInBytes': None}, 'flags_file': str(flags_path)}
+    assert describe(config, [])['LargePageSizeInBytes']['value'] == '2m'
+
+
+def test_parse_jdk_version():
+    assert parse_jdk_version(11) == 11
+    assert parse_jdk_version('1.8.0_292') == 8
+    assert parse_jdk_version('17.0.1') == 17
+    assert parse_jdk_version('openjdk version "1.8.0_292"\nOpenJDK Runtime Environment (build 1.8.0_292-b10)') == 8
+    assert parse_jdk_version('java version "21" 2023-09-19 LTS') == 21
+    assert parse_jdk_version('openjdk 17.0.1 2021-10-19') == 17
+    for version in ('latest', None, True, 0, ['11']):
+        with pytest.raises(EncoderConfigException):
+            parse_jdk_version(version)
+
+
+def test_jdk_version_translation():
+    config = {'settings': {'GCType': None,
+                           'CMSInitiatingOccupancyFraction': None,
+                           'UseCGroupMemoryLimitForHeap': None,
+                           'AlwaysPreTouch': None},
+              'jdk_version': 'openjdk version "17.0.1" 2021-10-19'}
+    descriptor = describe(config, ['-XX:+UseParallelGC', '-XX:+UseContainerSupport'])
+    assert set(descriptor) == {'GCType', 'UseCGroupMemoryLimitForHeap', 'AlwaysPreTouch'}
+    assert descriptor['GCType']['values'] == ['G1GC', 'ParallelOldGC', 'SerialGC', 'ZGC', 'ShenandoahGC']
+    assert descriptor['GCType']['value'] == 'ParallelOldGC'
+    assert descriptor['UseCGroupMemoryLimitForHeap']['value'] == 1
+
+    values = {'GCType': {'value': 'ParallelOldGC'}, 'UseCGroupMemoryLimitForHeap': {'value': 0},
+              'AlwaysPreTouch': {'value': 1}}
+    encoded, _ = encode(config, values, list)
+    assert encoded == ['-XX:+UseParallelGC', '-XX:-UseContainerSupport', '-XX:+AlwaysPreTouch']
+    encoded, _ = encode({**config, 'jdk_version': 8}, values, list)
+    assert encoded == ['-XX:+UseParallelOldGC', '-XX:-UseCGroupMemoryLimitForHeap', '-XX:+AlwaysPreTouch']
+
+    # Values of settings unavailable in the JDK are dropped
+    encoder = Encoder({**config_base, **config, 'codegen': True})
+    plain = {'GCType': 'G1GC', 'CMSInitiatingOccupancyFraction': 80, 'UseCGroupMemoryLimitForHeap': 1,
+             'AlwaysPreTouch': 0}
+    assert encoder.encode_multi(plain, list) == encoder.encode_batch([plain], list)[0] == \
+        ['-XX:+UseG1GC', '-XX:+UseContainerSupport', '-XX:-AlwaysPreTouch']
+
+    encoded, _ = encode({**config, 'settings': {'GCType': {'disable_others': True}}},
+                        {'GCType': {'value': 'SerialGC'}}, list)
+    assert encoded == ['-XX:-UseG1GC', '-XX:-UseParallelGC', '-XX:-UseShenandoahGC', '-XX:-UseZGC', '-XX:+UseSerialGC']
+
+    with pytest.raises(EncoderConfigException):
+        describe({**config, 'settings': {'GCType': {'values': ['G1GC', 'ConcMarkSweepGC']}}}, [])
+
+
+def test_encode_modern_gc_types():
+    config = {'settings': {'GCType': {'values': ['G1GC', 'ZGC', 'GenerationalZGC', 'ShenandoahGC']}}}
+    cases = [
+        (None, 'ZGC', ['-XX:+UnlockExperimentalVMOptions', '-XX:+UseZGC']),
+        (11, 'ZGC', ['-XX:+UnlockExperimentalVMOptions', '-XX:+UseZGC']),
+        (17, 'ZGC', ['-XX:+UseZGC']),
+        (23, 'ZGC', ['-XX:+UseZGC', '-XX:-ZGenerational']),
+        (None, 'GenerationalZGC', ['-XX:+UseZGC', '-XX:+ZGenerational']),
+        (21, 'GenerationalZGC', ['-XX:+UseZGC', '-XX:+ZGenerational']),
+        (23, 'GenerationalZGC', ['-XX:+UseZGC']),
+        (12, 'ShenandoahGC', ['-XX:+UnlockExperimentalVMOptions', '-XX:+UseShenandoahGC']),
+        (17, 'ShenandoahGC', ['-XX:+UseShenandoahGC']),
+    ]
+    for jdk_version, value, expected in cases:
+        settings = config['settings'] if jdk_version is None or jdk_version >= 21 else {'GCType': None}
+        jdk_config = {'settings': settings, 'jdk_version': jdk_version} if jdk_version else config
+        encoded, _ = encode(jdk_config, {'GCType': {'value': value}}, list)
+        assert encoded == expected
+        assert describe(jdk_config, encoded)['GCType']['value'] == value
+
+    assert describe(config, ['-XX:+UseZGC'])['GCType']['value'] == 'ZGC'
+    assert describe({**config, 'jdk_version': 23}, ['-XX:+UseZGC'])['GCType']['value'] == 'GenerationalZGC'
+    assert describe({'settings': {'GCType': None}, 'jdk_version': 24}, ['-XX:+UseZGC'])['GCType']['values'] == \
+        ['G1GC', 'ParallelOldGC', 'SerialGC', 'GenerationalZGC', 'ShenandoahGC']
+    # The non-generational mode is removed in JDK 24, which ignores the flag turning it on
+    for data in (['-XX:+UseZGC', '-XX:-ZGenerational'], ['-XX:-ZGenerational', '-XX:+UseZGC']):
+        assert describe({'settings': {'GCType': None}, 'jdk_version': 24}, data)['GCType']['value'] == \
+            'GenerationalZGC'
+    with pytest.raises(EncoderConfigException):
+        describe({**config, 'jdk_version': 17}, [])
+
+    encoder = Encoder({**config_base, **config, 'jdk_version': 21})
+    assert encoder.encode_patch('java -XX:+UseZGC -XX:+ZGenerational -jar app.jar', {'GCType': 'ZGC'}) == \
+        'java -XX:+UseZGC -jar app.jar'
+
+
+def test_encode_experimental_gc_unlock():
+    config = {'settings': {'GCType': {'values': ['G1GC', 'ZGC']}, 'UnlockExperimentalVMOptions': None},
+              'jdk_version': 11}
+    encoded, _ = encode(config, {'GCType': {'value': 'ZGC'}, 'UnlockExperimentalVMOptions': {'value': 1}}, list)
+    assert encoded == ['-XX:+UnlockExperimentalVMOptions', '-XX:+UseZGC']
+    with pytest.raises(EncoderRuntimeException):
+        encode(config, {'GCType': {'value': 'ZGC'}, 'UnlockExperimentalVMOptions': {'value': 0}}, list)
+    encoded, _ = encode({**config, 'constraints': 'repair'},
+                        {'GCType': {'value': 'ZGC'}, 'UnlockExperimentalVMOptions': {'value': 0}}, list)
+    assert encoded == ['-XX:+UnlockExperimentalVMOptions', '-XX:+UseZGC']
+    encoded, _ = encode(config, {'GCType': {'value': 'G1GC'}, 'UnlockExperimentalVMOptions': {'value': 0}}, list)
+    assert encoded == ['-XX:-UnlockExperimentalVMOptions', '-XX:+UseG1GC']
+
+    np = import_numpy()
+    encoder = Encoder({**config_base, **config, 'constraints': 'repair'})
+    assert encoder.encode_ordinals(np.array([[0, 1], [0, 0]]), list) == [
+        ['-XX:+UnlockExperimentalVMOptions', '-XX:+UseZGC'], ['-XX:-UnlockExperimentalVMOptions', '-XX:+UseG1GC']]
+    with pytest.raises(EncoderRuntimeException):
+        Encoder({**config_base, **config}).encode_ordinals(np.array([[0, 1]]))
+
+    # The unlock precedes the collector on all the paths, whatever the order of the config
+    values = {'GCType': 'ZGC', 'UnlockExperimentalVMOptions': 1}
+    expected = ['-XX:+UnlockExperimentalVMOptions', '-XX:+UseZGC']
+    assert list(encoder.get_lattice()) == ['UnlockExperimentalVMOptions', 'GCType']
+    for codegen in (False, True):
+        encoder = Encoder({**config_base, **config, 'codegen': codegen})
+        assert encoder.encode_multi(values, list) == expected
+        assert encoder.encode_batch([values], list) == [expected]
+    assert encoder.encode_patch('java -XX:+UseG1GC -jar app.jar', values) == \
+        'java -XX:+UnlockExperimentalVMOptions -XX:+UseZGC -jar app.jar'
+    assert encoder.encode_patch('java -XX:+UseG1GC -XX:-UnlockExperimentalVMOptions -jar app.jar', values) == \
+        'java -XX:+UnlockExperimentalVMOptions -XX:+UseZGC -jar app.jar'
+    assert encoder.encode_patch('java -XX:-UnlockExperimentalVMOptions -XX:+UseG1GC -jar app.jar', values) == \
+        'java -XX:+UnlockExperimentalVMOptions -XX:+UseZGC -jar app.jar'
+    assert encoder.encode_patch('java -jar app.jar', values) == \
+        'java -XX:+UnlockExperimentalVMOptions -XX:+UseZGC -jar app.jar'
+
+
+def test_modern_gc_settings():
+    config = {'settings': {'GCType': {'values': ['GenerationalZGC', 'ShenandoahGC']},
+                           'ConcGCThreads': {'min': 1, 'max': 8, 'step': 1},
+                           'ZCollectionInterval': None,
+                           'ZAllocationSpikeTolerance': None,
+                           'ShenandoahGCHeuristics': {'values': ['adaptive', 'compact']}},
+              'jdk_version': 21}
+    descriptor = describe(config, ['-XX:+UseShenandoahGC', '-XX:ShenandoahGCHeuristics=compact',
+                                   '-XX:ConcGCThreads=2'])
+    assert descriptor['ShenandoahGCHeuristics'] == {'type': 'enum', 'unit': '', 'values': ['adaptive', 'compact'],
+                                                    'value': 'compact', 'parent': 'GCType',
+                                                    'active_when': ['ShenandoahGC']}
+    assert descriptor['ConcGCThreads']['value'] == 2
+    assert 'parent' not in descriptor['ConcGCThreads']
+    assert descriptor['ZAllocationSpikeTolerance']['active_when'] == ['GenerationalZGC']
+    assert 'value' not in descriptor['ZAllocationSpikeTolerance']
+
+    values = {'GCType': 'GenerationalZGC', 'ConcGCThreads': 4, 'ZCollectionInterval': 30,
+              'ZAllocationSpikeTolerance': 2.75}
+    expected = ['-XX:+UseZGC', '-XX:+ZGenerational', '-XX:ConcGCThreads=4', '-XX:ZCollectionInterval=30',
+                '-XX:ZAllocationSpikeTolerance=2.75']
+    generic = Encoder({**config_base, **config})
+    generated = Encoder({**config_base, **config, 'codegen': True})
+    assert generic.encode_multi(values, list) == generated.encode_multi(values, list) == expected
+    assert generic.decode_multi(expected) == generated.decode_multi(expected) == values
+    values = {'GCType': 'ShenandoahGC', 'ConcGCThreads': 1, 'ShenandoahGCHeuristics': 'adaptive'}
+    expected = ['-XX:+UseShenandoahGC', '-XX:ConcGCThreads=1', '-XX:ShenandoahGCHeuristics=adaptive']
+    assert generic.encode_multi(values, list) == generated.encode_multi(values, list) == expected
+    with pytest.raises(SettingRuntimeException):
+        generic.encode_multi(dict(values, ShenandoahGCHeuristics='static'))
+
+    np = import_numpy()
+    assert generic.get_lattice()['ShenandoahGCHeuristics'] == 2
+    assert generic.encode_ordinals(np.array([[1, 3, 0, 3, 1]]), list) == [
+        ['-XX:+UseShenandoahGC', '-XX:ConcGCThreads=4', '-XX:ShenandoahGCHeuristics=compact']]
+
+    with pytest.raises(SettingConfigException):
+        describe({'settings': {'ShenandoahGCHeuristics': {'values': ['adaptive', 'passive']}}}, [])
+    with pytest.raises(SettingConfigException):
+        describe({'settings': {'ConcGCThreads': None}}, [])
+
+
+def make_cgroup_tree(root, limit, version=2):
+    path = root / 'fs' / 'cgroup' if version == 2 else root / 'fs' / 'cgroup' / 'memory'
+    path.mkdir(parents=True)
+    (path / ('memory.max' if version == 2 else 'memory.limit_in_bytes')).write_text('{}\n'.format(limit))
+    return str(root)
+
+
+def test_read_cgroup_memory_limit(tmp_path):
+    assert read_cgroup_memory_limit(make_cgroup_tree(tmp_path / 'v2', 4 * 1024 ** 3)) == 4 * 1024 ** 3
+    assert read_cgroup_memory_limit(make_cgroup_tree(tmp_path / 'v1', 2 * 1024 ** 3, version=1)) == 2 * 1024 ** 3
+    assert read_cgroup_memory_limit(make_cgroup_tree(tmp_path / 'v2max', 'max')) is None
+    assert read_cgroup_memory_limit(make_cgroup_tree(tmp_path / 'v1max', 9223372036854771712, version=1)) is None
+    assert read_cgroup_memory_limit(str(tmp_path / 'missing')) is None
+
+
+def test_describe_container_memory(tmp_path):
+    config = {'settings': {'MaxHeapSize': None, 'InitialHeapSize': {'min': 1, 'step': .5}, 'GCTimeRatio': None},
+              'container_memory': True,
+              'sysfs_root': make_cgroup_tree(tmp_path, 4 * 1024 ** 3)}
+    data = ['-Xmx2048m', '-Xms1024m', '-XX:GCTimeRatio=19']
+    descriptor = describe(config, data)
+    assert descriptor['MaxHeapSize']['max'] == 2.75
+    assert descriptor['MaxHeapSize']['derived'] == {'max': 2.75, 'memory_limit': 4}
+    assert descriptor['InitialHeapSize']['max'] == 2.5
+    assert 'derived' not in descriptor['GCTimeRatio']
+
+    descriptor = describe({**config, 'container_memory': {'heap_fraction': .5, 'reserved': 0}}, data)
+    assert descriptor['MaxHeapSize']['max'] == 2
+
+    # Configured max is kept as long as it fits
+    descriptor = describe({**config, 'settings': {'MaxHeapSize': {'max': 2}}}, data)
+    assert descriptor['MaxHeapSize']['max'] == 2
+    assert 'derived' not in descriptor['MaxHeapSize']
+    with pytest.raises(SettingConfigException):
+        describe({**config, 'settings': {'MaxHeapSize': {'max': 3}}}, data)
+    with pytest.raises(EncoderConfigException):
+        describe({**config, 'container_memory': {'reserved': 3}}, data)
+    with pytest.raises(EncoderConfigException):
+        describe({**config, 'container_memory': {'headroom': 1}}, data)
+    with pytest.raises(EncoderConfigException):
+        describe({**config, 'container_memory': {'heap_fraction': '75%'}}, data)
+
+    # Without a limit max has to be configured as before
+    with pytest.raises(SettingConfigException):
+        describe({**config, 'sysfs_root': make_cgroup_tree(tmp_path / 'unlimited', 'max')}, data)
+
+
+def test_ram_percentage_settings():
+    config = {'settings': {'MaxRAMPercentage': {'min': 50, 'max': 90, 'step': 5},
+                           'InitialRAMPercentage': None,
+                           'InitialHeapSize': {'max': 4}}}
+    with pytest.raises(EncoderConfigException):
+        describe(config, [])
+    config['settings'].pop('InitialHeapSize')
+
+    descriptor = describe(config, ['-XX:MaxRAMPercentage=75.0'])
+    assert descriptor['MaxRAMPercentage'] == {'type': 'range', 'min': 50, 'max': 90, 'step': 5, 'unit': '%',
+                                              'value': 75}
+    assert descriptor['InitialRAMPercentage']['value'] == 1.5625
+    assert descriptor['InitialRAMPercentage']['constraints'] == [{'operator': '<=', 'setting': 'MaxRAMPercentage'}]
+
+    # Floating point flags are always encoded with a decimal point
+    values = {'MaxRAMPercentage': 75, 'InitialRAMPercentage': 12.5}
+    expected = ['-XX:MaxRAMPercentage=75.0', '-XX:InitialRAMPercentage=12.5']
+    generic = Encoder({**config_base, **config})
+    generated = Encoder({**config_base, **config, 'codegen': True})
+    assert generic.encode_multi(values, list) == generated.encode_multi(values, list) == expected
+    assert generic.decode_multi(expected) == generated.decode_multi(expected) == values
+    with pytest.raises(EncoderRuntimeException):
+        generic.encode_multi({'MaxRAMPercentage': 50, 'InitialRAMPercentage': 60})
+
+    # Absolute heap sizes override the percentages
+    for data in (['-Xmx2048m', '-XX:InitialRAMPercentage=10.0'], ['-XX:MaxHeapSize=2g']):
+        with pytest.raises(SettingRuntimeException):
+            generic.decode_multi(data)
+        with pytest.raises(SettingRuntimeException):
+            generated.decode_multi(data)
+    with pytest.raises(SettingRuntimeException):
+        describe({'settings': {'MaxHeapSize': {'max': 4}}}, ['-Xmx2048m', '-XX:MaxRAMPercentage=75.0'])
+    assert describe({'settings': {'MaxHeapSize': {'max': 4}}}, ['-Xmx2048m'])['MaxHeapSize']['value'] == 2
+    assert generic.encode_patch('java -Xmx2048m -XX:MaxRAMPercentage=50.0 -jar app.jar', {'MaxRAMPercentage': 80}) == \
+        'java -XX:MaxRAMPercentage=80.0 -jar app.jar'
+
+    assert 'MaxRAMPercentage' not in describe({**config, 'jdk_version': 8}, [])
+
+    np = import_numpy()
+    assert generic.encode_ordinals(np.array([[5, 200]]), list) == [expected]
+
+
+def test_size_value_encoder():
+    heap_encoder = IntToGbValueEncoder()
+    for data, expected in (('4g', 4), ('4G', 4), ('3072m', 3), ('524288k', .5), ('1073741824', 1), ('1t', 1024)):
+        assert heap_encoder.decode(data) == expected
+    for data in ('5.2g', '4x', 'g', '', 'abc'):
+        with pytest.raises(ValueError):
+            heap_encoder.decode(data)
+    assert heap_encoder.encode(1.5) == '1536m'
+
+    encoder = SizeValueEncoder(1024, 'k', flag_unit=1)
+    assert encoder.encode(512) == '512k'
+    assert encoder.decode('1m') == 1024
+    assert encoder.encode_source('value') == "str(int(round(value * 1))) + 'k'"
+    assert SizeValueEncoder(1024, '').encode(2) == '2048'
+
+
+def test_off_heap_settings():
+    config = {'settings': {'MaxMetaspaceSize': None,
+                           'MetaspaceSize': {'default': 64},
+                           'ReservedCodeCacheSize': None,
+                           'MaxDirectMemorySize': {'max': 1024},
+                           'ThreadStackSize': None}}
+    descriptor = describe(config, ['-Xss512k', '-XX:MaxMetaspaceSize=1g', '-XX:ReservedCodeCacheSize=268435456',
+                                   '-XX:MaxDirectMemorySize=512M'])
+    assert descriptor['ThreadStackSize'] == {'type': 'range', 'min': 256, 'max': 8192, 'step': 128, 'unit': 'KiB',
+                                             'value': 512}
+    assert descriptor['MaxMetaspaceSize']['value'] == 1024
+    assert descriptor['MetaspaceSize']['value'] == 64
+    assert descriptor['MetaspaceSize']['constraints'] == [{'operator': '<=', 'setting': 'MaxMetaspaceSize'}]
+    assert descriptor['ReservedCodeCacheSize']['value'] == 256
+    assert descriptor['MaxDirectMemorySize'] == {'type': 'range', 'min': 64, 'max': 1024, 'step': 64, 'unit': 'MiB',
+                                                 'value': 512}
+
+    values = {'MaxMetaspaceSize': 512, 'MetaspaceSize': 128, 'ReservedCodeCacheSize': 240,
+              'MaxDirectMemorySize': 256, 'ThreadStackSize': 1024}
+    expected = ['-XX:MaxMetaspaceSize=512m', '-XX:MetaspaceSize=128m', '-XX:ReservedCodeCacheSize=240m',
+                '-XX:MaxDirectMemorySize=256m', '-Xss1024k']
+    generic = Encoder({**config_base, **config})
+    generated = Encoder({**config_base, **config, 'codegen': True})
+    assert generic.encode_multi(values, list) == generated.encode_multi(values, list) == expected
+    assert generic.decode_multi(expected) == generated.decode_multi(expected) == values
+    with pytest.raises(EncoderRuntimeException):
+        generic.encode_multi(dict(values, MetaspaceSize=1024))
+    with pytest.raises(SettingRuntimeException):
+        generic.encode_multi(dict(values, ThreadStackSize=200))
+    with pytest.raises(SettingConfigException):
+        describe({'settings': {'MaxDirectMemorySize': None}}, [])
+
+    np = import_numpy()
+    assert generic.encode_ordinals(np.array([[7, 7, 13, 3, 6]]), list) == [expected]
+
+
+def make_cpu_cgroup_tree(root, quota, period=100000, version=2):
+    if version == 2:
+        path = root / 'fs' / 'cgroup'
+        path.mkdir(parents=True)
+        (path / 'cpu.max').write_text('{} {}\n'.format(quota, period))
+    else:
+        path = root / 'fs' / 'cgroup' / 'cpu,cpuacct'
+        path.mkdir(parents=True)
+        (path / 'cpu.cfs_quota_us').write_text('{}\n'.format(quota))
+        (path / 'cpu.cfs_period_us').write_text('{}\n'.format(period))
+    return str(root)
+
+
+def test_read_cgroup_cpu_limit(tmp_path):
+    assert read_cgroup_cpu_limit(make_cpu_cgroup_tree(tmp_path / 'v2', 250000)) == 2.5
+    assert read_cgroup_cpu_limit(make_cpu_cgroup_tree(tmp_path / 'v1', 400000, version=1)) == 4
+    assert read_cgroup_cpu_limit(make_cpu_cgroup_tree(tmp_path / 'v2max', 'max')) is None
+    assert read_cgroup_cpu_limit(make_cpu_cgroup_tree(tmp_path / 'v1max', -1, version=1)) is None
+    assert read_cgroup_cpu_limit(str(tmp_path / 'missing')) is None
+
+
+def test_thread_count_settings(tmp_path):
+    config = {'settings': {'GCType': {'values': ['G1GC', 'SerialGC']},
+                           'ParallelGCThreads': None,
+                           'ConcGCThreads': {'max': 2},
+                           'CICompilerCount': {'step': 2},
+                           'ActiveProcessorCount': None},
+              'container_cpu': True,
+              'sysfs_root': make_cpu_cgroup_tree(tmp_path, 250000)}
+    descriptor = describe(config, ['-XX:+UseG1GC', '-XX:ParallelGCThreads=3', '-XX:ConcGCThreads=1',
+                                   '-XX:CICompilerCount=2', '-XX:ActiveProcessorCount=3'])
+    assert descriptor['ParallelGCThreads'] == {'type': 'range', 'min': 1, 'max': 3, 'step': 1, 'unit': '',
+                                               'value': 3, 'parent': 'GCType', 'active_when': ['G1GC'],
+                                               'derived': {'max': 3, 'cpu_limit': 2.5}}
+    assert descriptor['ConcGCThreads']['max'] == 2
+    assert 'derived' not in descriptor['ConcGCThreads']
+    assert descriptor['CICompilerCount']['max'] == 2
+    assert descriptor['ActiveProcessorCount']['derived'] == {'max': 3, 'cpu_limit': 2.5}
+
+    values = {'GCType': 'G1GC', 'ParallelGCThreads': 2, 'ConcGCThreads': 1, 'CICompilerCount': 2,
+              'ActiveProcessorCount': 3}
+    expected = ['-XX:+UseG1GC', '-XX:ParallelGCThreads=2', '-XX:ConcGCThreads=1', '-XX:CICompilerCount=2',
+                '-XX:ActiveProcessorCount=3']
+    encoder = Encoder({**config_base, **config})
+    assert encoder.encode_multi(values, list) == expected
+    assert encoder.decode_multi(expected) == values
+    with pytest.raises(SettingRuntimeException):
+        encoder.encode_multi(dict(values, ParallelGCThreads=4))
+
+    descriptor = describe({**config, 'container_cpu': {'threads_per_cpu': 2}}, expected)
+    assert descriptor['ParallelGCThreads']['max'] == 6
+    with pytest.raises(SettingConfigException):
+        describe({**config, 'settings': {'ParallelGCThreads': {'max': 4}}}, [])
+
+    # Thread counts are kept at min of the settings below it
+    descriptor = describe({**config, 'settings': {'ParallelGCThreads': None, 'CICompilerCount': None},
+                           'sysfs_root': make_cpu_cgroup_tree(tmp_path / 'half', 50000)},
+                          ['-XX:ParallelGCThreads=1', '-XX:CICompilerCount=2'])
+    assert (descriptor['ParallelGCThreads']['min'], descriptor['ParallelGCThreads']['max']) == (1, 1)
+    assert (descriptor['CICompilerCount']['min'], descriptor['CICompilerCount']['max']) == (2, 2)
+    assert descriptor['CICompilerCount']['derived'] == {'max': 2, 'cpu_limit': .5}
+    with pytest.raises(SettingConfigException):
+        describe({**config, 'sysfs_root': make_cpu_cgroup_tree(tmp_path / 'unlimited', 'max')}, [])
+
+
+def test_jit_settings():
+    config = {'settings': {'TieredCompilation': None,
+                           'TieredStopAtLevel': {'min': 1, 'max': 4, 'step': 3},
+                           'CompileThreshold': None,
+                           'InlineSmallCode': None,
+                           'MaxInlineSize': None,
+                           'FreqInlineSize': None,
+                           'UseCountedLoopSafepoints': None}}
+    descriptor = describe(config, ['-XX:-TieredCompilation', '-XX:CompileThreshold=1500', '-XX:MaxInlineSize=70'])
+    assert {name: descr['value'] for name, descr in descriptor.items()} == {
+        'TieredCompilation': 0, 'TieredStopAtLevel': 4, 'CompileThreshold': 1500, 'InlineSmallCode': 2000,
+        'MaxInlineSize': 70, 'FreqInlineSize': 325, 'UseCountedLoopSafepoints': 0}
+
+    # Defaults follow the JDK unless configured
+    descriptor = describe({**config, 'jdk_version': 17}, [])
+    assert descriptor['InlineSmallCode']['value'] == 2500
+    assert descriptor['UseCountedLoopSafepoints']['value'] == 1
+    descriptor = describe({'settings': {'InlineSmallCode': {'default': 3000}}, 'jdk_version': 17}, [])
+    assert descriptor['InlineSmallCode']['value'] == 3000
+    assert describe({**config, 'jdk_version': 11}, [])['InlineSmallCode']['value'] == 2000
+
+    values = {'TieredCompilation': 1, 'TieredStopAtLevel': 1, 'CompileThreshold': 20000, 'InlineSmallCode': 3000,
+              'MaxInlineSize': 100, 'FreqInlineSize': 500, 'UseCountedLoopSafepoints': 1}
+    expected = ['-XX:+TieredCompilation', '-XX:TieredStopAtLevel=1', '-XX:CompileThreshold=20000',
+                '-XX:InlineSmallCode=3000', '-XX:MaxInlineSize=100', '-XX:FreqInlineSize=500',
+                '-XX:+UseCountedLoopSafepoints']
+    generic = Encoder({**config_base, **config})
+    generated = Encoder({**config_base, **config, 'codegen': True})
+    assert generic.encode_multi(values, list) == generated.encode_multi(values, list) == expected
+    assert generic.decode_multi(expected) == generated.decode_multi(expected) == values
+    with pytest.raises(SettingRuntimeException):
+        generic.encode_multi(dict(values, TieredStopAtLevel=2))
+
+
+def make_host_memory_tree(root, page_pools=None, thp_mode=None, numa_nodes=1):
+    for size, pages in (page_pools or {}).items():
+        pool = root / 'kernel' / 'mm' / 'hugepages' / 'hugepages-{}kB'.format(size)
+        pool.mkdir(parents=True)
+        (pool / 'nr_hugepages').write_text('{}\n'.format(pages))
+    if thp_mode is not None:
+        path = root / 'kernel' / 'mm' / 'transparent_hugepage'
+        path.mkdir(parents=True)
+        modes = ' '.join('[{}]'.format(mode) if mode == thp_mode else mode for mode in ('always', 'madvise', 'never'))
+        (path / 'enabled').write_text(modes + '\n')
+    for node in range(numa_nodes):
+        (root / 'devices' / 'system' / 'node' / 'node{}'.format(node)).mkdir(parents=True)
+    (root / 'devices' / 'system' / 'node' / 'possible').write_text('0-{}\n'.format(numa_nodes - 1))
+    return str(root)
+
+
+def test_read_host_memory(tmp_path):
+    sysfs_root = make_host_memory_tree(tmp_path / 'large', {2048: 512, 1048576: 4, 64: 0}, 'madvise', 2)
+    assert read_host_memory(sysfs_root) == {'large_page_sizes': ['2m', '1g'], 'transparent_huge_pages': True,
+                                            'numa_nodes': 2}
+    sysfs_root = make_host_memory_tree(tmp_path / 'small', {2048: 0}, 'never')
+    assert read_host_memory(sysfs_root) == {'large_page_sizes': [], 'transparent_huge_pages': False,
+                                            'numa_nodes': 1}
+    assert read_host_memory(str(tmp_path / 'missing')) == {'large_page_sizes': [], 'transparent_huge_pages': False,
+                                                           'numa_nodes': 0}
+
+
+def test_host_memory_settings(tmp_path):
+    config = {'settings': {'UseLargePages': None,
+                           'UseTransparentHugePages': None,
+                           'LargePageSizeInBytes': {'default': '2m'},
+                           'UseNUMA': None,
+                           'AlwaysPreTouch': None},
+              'host_memory': True,
+              'sysfs_root': make_host_memory_tree(tmp_path / 'large', {2048: 512, 1048576: 4}, 'madvise', 2)}
+    descriptor = describe(config, ['-XX:+UseLargePages', '-XX:LargePageSizeInBytes=1G', '-XX:+UseNUMA'])
+    assert descriptor['LargePageSizeInBytes'] == {'type': 'enum', 'unit': '', 'values': ['2m', '1g'], 'value': '1g'}
+    assert descriptor['UseLargePages']['value'] == 1
+    assert descriptor['UseNUMA']['value'] == 1
+    assert describe(config, ['-XX:LargePageSizeInBytes=2097152'])['LargePageSizeInBytes']['value'] == '2m'
+
+    values = {'UseLargePages': 1, 'UseTransparentHugePages': 0, 'LargePageSizeInBytes': '1g', 'UseNUMA': 1,
+              'AlwaysPreTouch': 1}
+    expected = ['-XX:+UseLargePages', '-XX:-UseTransparentHugePages', '-XX:LargePageSizeInBytes=1g', '-XX:+UseNUMA',
+                '-XX:+AlwaysPreTouch']
+    generic = Encoder({**config_base, **config})
+    generated = Encoder({**config_base, **config, 'codegen': True})
+    assert generic.encode_multi(values, list) == generated.encode_multi(values, list) == expected
+    assert generic.decode_multi(expected) == generated.decode_multi(expected) == values
+
+    # Settings the host can not honour are left out
+    small_config = {**config, 'sysfs_root': make_host_memory_tree(tmp_path / 'small', {2048: 0}, 'never')}
+    assert set(describe(small_config, [])) == {'AlwaysPreTouch'}
+    assert Encoder({**config_base, **small_config}).encode_multi(values, list) == ['-XX:+AlwaysPreTouch']
+    thp_config = {**config, 'sysfs_root': make_host_memory_tree(tmp_path / 'thp', {}, 'always')}
+    assert set(describe(thp_config, [])) == {'UseLargePages', 'UseTransparentHugePages', 'AlwaysPreTouch'}
+    assert set(describe({**small_config, 'host_memory': False}, [])) == set(config['settings'])
+
+    with pytest.raises(EncoderConfigException):
+        describe({**config, 'settings': {'LargePageSizeInBytes': {'values': ['2m', '16g']}}}, [])
+    with pytest.raises(SettingConfigException):
+        describe({**config, 'settings': {'LargePageSizeInBytes': {'values': ['2m'], 'default': '1g'}}}, [])
+    with pytest.raises(EncoderConfigException):
+        describe({**config, 'host_memory': 'yes'}, [])
+
+
+NATIVE_MEMORY_SUMMARY = """
+Native Memory Tracking:
+
+Total: reserved=3561537KB, committed=1463129KB
+-                 Java Heap (reserved=1048576KB, committed=1048576KB)
+                            (mmap: reserved=1048576KB, committed=1048576KB)
+
+-                     Class (reserved=1089536KB, committed=45056KB)
+                            (classes #7512)
+
+-                    Thread (reserved=41216KB, committed=41216KB)
+                            (thread #40)
+                            (stack: reserved=41040KB, committed=41040KB)
+
+-                      Code (reserved=251904KB, committed=52224KB)
+                            (malloc=2304KB #5987)
+
+-                        GC (reserved=52429KB, committed=52429KB)
+                            (malloc=13389KB #2133)
+
+-                  Compiler (reserved=1024KB, committed=1024KB)
+
+-                  Internal (reserved=10240KB, committed=10240KB)
+
+-                     Other (reserved=102400KB, committed=102400KB)
+
+-                    Symbol (reserved=10240KB, committed=10240KB)
+"""
+
+
+def test_parse_native_memory():
+    categories, threads = parse_native_memory(NATIVE_MEMORY_SUMMARY)
+    assert categories['Java Heap'] == (1024 ** 3, 1024 ** 3)
+    assert categories['Thread'] == (41216 * 1024, 41216 * 1024)
+    assert len(categories) == 9
+    assert threads == 40
+    assert parse_native_memory('-  Java Heap (reserved=2GB, committed=512MB)') == \
+        ({'Java Heap': (2 * 1024 ** 3, 512 * 1024 ** 2)}, None)
+    with pytest.raises(ValueError):
+        parse_native_memory('Native memory tracking is not enabled')
+
+
+def test_footprint(tmp_path):
+    native_memory_path = tmp_path / 'nmt.txt'
+    native_memory_path.write_text(NATIVE_MEMORY_SUMMARY)
+    config = {'settings': {'MaxHeapSize': {'max': 4, 'step': .5},
+                           'MaxDirectMemorySize': {'max': 1024},
+                           'ThreadStackSize': None},
+              'footprint': {'memory_limit': 4, 'native_memory': str(native_memory_path)}}
+    encoder = Encoder({**config_base, **config})
+    values = {'MaxHeapSize': 2, 'MaxDirectMemorySize': 256, 'ThreadStackSize': 1024}
+    estimate = encoder.footprint_model.estimate(values)
+    assert estimate['heap'] == 2
+    assert estimate['gc'] == pytest.approx(2 * 52429 / 1048576)
+    assert estimate['direct'] == .25
+    assert estimate['threads'] == pytest.approx(40 / 1024)
+    assert estimate['metaspace'] == pytest.approx(45056 / 1024 ** 2)
+    assert estimate['other'] == pytest.approx(21504 / 1024 ** 2)
+    assert estimate['total'] == pytest.approx(sum(value for name, value in estimate.items() if name != 'total'))
+    assert encoder.encode_multi(values, list) == encoder.encode_batch([values], list)[0] == \
+        ['-XX:MaxHeapSize=2048m', '-XX:MaxDirectMemorySize=256m', '-Xss1024k']
+
+    # Candidates exceeding the limit are rejected before they are deployed
+    for candidate in (dict(values, MaxHeapSize=3.5), dict(values, MaxHeapSize=3, MaxDirectMemorySize=768)):
+        with pytest.raises(EncoderRuntimeException):
+            encoder.encode_multi(candidate)
+        with pytest.raises(EncoderRuntimeException):
+            encoder.encode_batch([values, candidate])
+    with pytest.raises(SettingRuntimeException):
+        encoder.encode_multi(dict(values, MaxHeapSize='2'))
+
+    # Arrays of ordinals are screened at once, patches along with the values in the command line
+    np = import_numpy()
+    rows = [[encoder.settings[name].get_lattice_ordinal(row[name]) for name in encoder.settings]
+            for row in (values, dict(values, MaxHeapSize=3, MaxDirectMemorySize=768))]
+    assert encoder.encode_ordinals(np.array(rows[:1]), list) == [encoder.encode_multi(values, list)]
+    with pytest.raises(EncoderRuntimeException) as e:
+        encoder.encode_ordinals(np.array(rows))
+    assert 'row 1' in str(e.value)
+    existing = 'java -Xmx2g -XX:MaxDirectMemorySize=768m -jar app.jar'
+    assert encoder.encode_patch(existing, {'MaxHeapSize': 2.5}) == \
+        'java -Xmx2560m -XX:MaxDirectMemorySize=768m -jar app.jar'
+    with pytest.raises(EncoderRuntimeException):
+        encoder.encode_patch(existing, {'MaxHeapSize': 3})
+    with pytest.raises(EncoderRuntimeException):
+        encoder.encode_patch('java -Xmx3g -jar app.jar', {'MaxDirectMemorySize': 768})
+
+    # Without a summary the model falls back to the defaults and percentages of the limit
+    encoder = Encoder({**config_base, 'settings': {'MaxRAMPercentage': None}, 'footprint': {'memory_limit': 2}})
+    assert encoder.footprint_model.estimate({'MaxRAMPercentage': 50})['heap'] == 1
+    assert encoder.encode_multi({'MaxRAMPercentage': 60}, list) == ['-XX:MaxRAMPercentage=60.0']
+    with pytest.raises(EncoderRuntimeException):
+        encoder.encode_multi({'MaxRAMPercentage': 90})
+
+    encoder = Encoder({**config_base, 'settings': {'MaxRAMPercentage': None}, 'footprint': True,
+                       'sysfs_root': make_cgroup_tree(tmp_path / 'cgroup', 2 * 1024 ** 3)})
+    assert encoder.footprint_model.memory_limit == 2
+
+    for footprint in ({'memory_limit': 0}, {'limit': 4}, {'native_memory': str(tmp_path / 'missing.txt'),
+                                                          'memory_limit': 4}, 'on'):
+        with pytest.raises(EncoderConfigException):
+            describe({**config, 'footprint': footprint}, [])
+    with pytest.raises(EncoderConfigException):
+        describe({**config, 'footprint': True, 'sysfs_root': str(tmp_path / 'missing')}, [])
+
+
+UNIFIED_GC_LOG = """[0.012s][info][gc,init] Version: 17.0.1+12 (release)
+[0.015s][info][gc     ] Using G1
+[1.000s][info][gc,start    ] GC(0) Pause Young (Normal) (G1 Evacuation Pause)
+[1.000s][info][gc,phases   ] GC(0)   Pre Evacuate Collection Set: 0.1ms
+[1.000s][info][gc          ] GC(0) Pause Young (Normal) (G1 Evacuation Pause) 24M->4M(256M) 2.000ms
+[1.000s][info][gc,cpu      ] GC(0) User=0.01s Sys=0.00s Real=0.00s
+[2.000s][info][gc          ] GC(1) Pause Young (Normal) (G1 Evacuation Pause) 104M->6M(256M) 4.000ms
+[2.500s][info][gc          ] GC(2) Concurrent Mark Cycle 12.345ms
+[3.000s][info][gc          ] GC(3) Pause Remark 20M->20M(256M) 1.000ms
+[11.000s][info][gc,phases  ] GC(4) Pause Mark Start 0.500ms
+"""
+
+LEGACY_GC_LOG = """Java HotSpot(TM) 64-Bit Server VM (25.292-b10) for linux-amd64 JRE (1.8.0_292-b10)
+2023-01-01T00:00:01.000+0000: 1.000: [GC (Allocation Failure) [PSYoungGen: 65536K->10720K(76288K)] \
+65536K->10744K(251392K), 0.0020000 secs] [Times: user=0.01 sys=0.00, real=0.00 secs]
+2023-01-01T00:00:02.000+0000: 2.000: [GC (Allocation Failure) [PSYoungGen: 76256K->10720K(76288K)] \
+76280K->20000K(251392K), 0.0040000 secs] [Times: user=0.01 sys=0.00, real=0.00 secs]
+3.000: [Full GC (Ergonomics) [PSYoungGen: 10720K->0K(76288K)] [ParOldGen: 9280K->19000K(175104K)] \
+20000K->19000K(251392K), [Metaspace: 3000K->3000K(1056768K)], 0.0100000 secs] \
+[Times: user=0.01 sys=0.00, real=0.01 secs]
+4.000: [GC pause (G1 Evacuation Pause) (young), 0.0050000 secs]
+"""
+
+NESTED_LEGACY_GC_LOG = """1.000: [GC (Allocation Failure) 1.000: [ParNew: 65536K->8192K(73728K), 0.0100000 secs] \
+165536K->108192K(253952K), 0.0110000 secs] [Times: user=0.02 sys=0.00, real=0.01 secs]
+1.500: [GC (CMS Initial Mark) [1 CMS-initial-mark: 100000K(174784K)] 120000K(253952K), 0.0010000 secs] \
+[Times: user=0.00 sys=0.00, real=0.00 secs]
+1.600: [CMS-concurrent-mark-start]
+1.700: [GC (CMS Final Remark) [YG occupancy: 20000 K (73728 K)]1.700: [Rescan (parallel) , 0.0020000 secs]\
+1.700: [weak refs processing, 0.0000100 secs][1 CMS-remark: 100000K(174784K)] 120000K(253952K), 0.0030000 secs] \
+[Times: user=0.00 sys=0.00, real=0.00 secs]
+1.800: [GC (Allocation Failure) 1.800: [DefNew: 65536K->8192K(73728K), 0.0110000 secs] \
+175536K->118192K(253952K), 0.0120000 secs]
+2.000: [Full GC (Allocation Failure) 2.000: [Tenured: 100000K->90000K(174784K), 0.0500000 secs] \
+175536K->90000K(253952K), [Metaspace: 3000K->3000K(1056768K)], 0.0510000 secs] \
+[Times: user=0.05 sys=0.00, real=0.05 secs]
+"""
+
+
+def test_pause_histogram():
+    histogram = PauseHistogram()
+    assert histogram.percentile(50) is None
+    for value in range(1, 1001):
+        histogram.record(value / 10)
+    for percent in (50, 90, 99):
+        assert histogram.percentile(percent) == pytest.approx(percent, rel=.01)
+    assert histogram.percentile(100) == 100
+    assert len(histogram.counts) < 3000
+
+
+def test_analyze_gc_log():
+    stats = analyze_gc_log(UNIFIED_GC_LOG.encode())
+    assert stats['pauses'] == 4
+    assert stats['pause_p50'] == pytest.approx(1, rel=.01)
+    assert stats['pause_p99'] == stats['pause_max'] == 4
+    assert stats['pause_total'] == 7.5
+    assert stats['duration'] == 10
+    assert stats['gc_overhead'] == pytest.approx(.00075)
+    assert stats['allocation_rate'] == 57
+
+    stats = analyze_gc_log(LEGACY_GC_LOG.encode())
+    assert stats['pauses'] == 4
+    assert stats['pause_total'] == pytest.approx(21)
+    assert stats['pause_max'] == 10
+    assert stats['gc_overhead'] == pytest.approx(.007)
+    assert stats['allocation_rate'] == 32
+
+    # Records of generations nested in the pause are not taken for it
+    stats = analyze_gc_log(NESTED_LEGACY_GC_LOG.encode())
+    assert stats['pauses'] == 5
+    assert stats['pause_max'] == 51
+    assert stats['pause_total'] == pytest.approx(11 + 12 + 51 + 1 + 3)
+    assert stats['allocation_rate'] == pytest.approx((175536 - 108192 + 175536 - 118192) / 1024 / 1)
+
+    stats = analyze_gc_log(b'')
+    assert stats['pauses'] == 0
+    assert stats['pause_p50'] is stats['gc_overhead'] is stats['allocation_rate'] is None
+
+
+def test_describe_gc_log(tmp_path):
+    log_path = tmp_path / 'gc.log'
+    log_path.write_text(LEGACY_GC_LOG)
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir()
+    config = {'settings': {'MaxGCPauseMillis': None, 'GCTimeRatio': None, 'NewRatio': None},
+              'gc_log': str(log_path), 'gc_log_cache_dir': str(cache_dir)}
+    descriptor = describe(config, ['-XX:MaxGCPauseMillis=8', '-XX:GCTimeRatio=80'])
+    assert (descriptor['MaxGCPauseMillis']['min'], descriptor['MaxGCPauseMillis']['max']) == (4, 10)
+    assert descriptor['MaxGCPauseMillis']['derived']['max'] == 10
+    assert descriptor['MaxGCPauseMillis']['derived']['pause_p99'] == 10
+    assert (descriptor['GCTimeRatio']['min'], descriptor['GCTimeRatio']['max']) == (70, 99)
+    assert descriptor['GCTimeRatio']['derived']['gc_overhead'] == pytest.approx(.007)
+    assert 'derived' not in descriptor['NewRatio']
+    assert len(list(cache_dir.iterdir())) == 1
+    assert describe(config, ['-XX:MaxGCPauseMillis=8', '-XX:GCTimeRatio=80']) == descriptor
+
+    # Configured bounds are kept
+    descriptor = describe({**config, 'settings': {'MaxGCPauseMillis': {'max': 500, 'step': 2}}}, [])
+    assert (descriptor['MaxGCPauseMillis']['min'], descriptor['MaxGCPauseMillis']['max']) == (4, 500)
+    assert 'max' not in descriptor['MaxGCPauseMillis']['derived']
+
+    with pytest.raises(EncoderConfigException):
+        describe({**config, 'gc_log': str(tmp_path / 'missing.log')}, [])
+    with pytest.raises(EncoderConfigException):
+        describe({**config, 'gc_log': ['gc.log']}, [])